@@ -0,0 +1,626 @@
+# -*- coding: utf-8 -*-
+"""STSOAPS.ipynb
+
+Automatically generated by Colab.
+
+Original file is located at
+    https://colab.research.google.com/drive/13R78aJ74Kel9nvp6Xpw6BgJGchCLZuW0
+
+# Speech -> Text -> SOAP -> Search Notebook
+
+***A proof of concept for automated veterinary scribing technology.***
+
+## 1. Install dependencies
+
+We will leverage OpenAI's Whisper model for transcription and GPT-4 transformer model for SOAP note generation via their API. See https://platform.openai.com/docs/introduction for general API information. For examples of calling Whisper in Python, see https://github.com/openai/openai-python#audio-whisper. For calling GPT-4 in Python, see https://github.com/openai/openai-python#chat-completions.
+
+For a vector database and embeddings (used to test search functionality over the generated notes), we will leverage [qdrant-python](https://github.com/qdrant/qdrant-client) in conjunction with their newly released [fastembed](https://github.com/qdrant/fastembed) library. This leverages BAAI's general embedding model which is more performant and accurate than Ada and free. In production, this would mean huge memory and speed savings and moderate cost savings (embeddings are cheap) in comparison to using OpenAI. For examples on how to use the search/embedding functionality, see: https://github.com/qdrant/qdrant-client#fast-embeddings--simpler-api.
+"""
+
+!pip install "stsoaps[audio,search] @ git+https://github.com/beriganr/blue-links-ai"
+
+"""# 2. Import libraries"""
+
+# configuration (securely access secret keys)
+import os
+from google.colab import userdata
+from google.colab import drive
+drive.mount('/content/drive')
+
+# NOTE: you must first create an OpenAI account and get an API key. Then, you
+# must click on the key icon in the left margin of this page (directly under
+# "{x}") and create a secret with name "OPENAI_API_KEY" and value equal to your
+# newly created API key. Then, you need to toggle "NotebookAccess" on for the
+# secret.
+# stsoaps reads its settings from the environment when it is first imported
+# (see stsoaps/config.py), so everything is set here, before any imports. The
+# caches, traces and lexicon live on the mounted drive so they survive Colab
+# restarts.
+os.environ["OPENAI_API_KEY"] = userdata.get("OPENAI_API_KEY")
+os.environ["STSOAPS_CACHE_PATH"] = "/content/drive/MyDrive/stsoaps_cache/cache.sqlite"
+os.environ["STSOAPS_TRACE_DIR"] = "/content/drive/MyDrive/stsoaps_traces"
+os.environ["STSOAPS_LEXICON_DIR"] = "/content/drive/MyDrive/lexicon"
+# NOTE: by default we are running an in-memory qdrant test client. Set
+# QDRANT_PATH to keep the collection on disk (qdrant's local mode), e.g.
+# "/content/drive/MyDrive/qdrant", or QDRANT_URL to use a Qdrant server, which
+# is what we want for the full note archive.
+os.environ.setdefault("QDRANT_PATH", ":memory:")
+
+# core imports
+from stsoaps import clients, config
+
+"""# 3. Initialize clients"""
+
+# This is `qdrant` rather than `client` since `client` is OpenAI. Both are
+# created on first use and shared with everything in the stsoaps package.
+client = clients.openai_client()
+qdrant = clients.qdrant_client()
+# You can now use the qdrant client API and call OpenAI completion/audio
+# transcription endpoints...
+
+"""## Tracing
+
+When a note is slow we can't tell whether the time went to the upload, Whisper, the GPT-4 call or embedding, and we can't see what an appointment actually cost. The pipeline stages below open spans on `tracer`. A span is a name, a start and an end, a parent (tracked with a contextvar, so it follows asyncio tasks and `to_thread` calls), and attributes: audio bytes and seconds, transcript length, prompt and completion tokens from `response.usage`, cache hits and misses, and retries. Token and audio usage is priced with `PRICES`, and the cost is added up on the root span of each appointment. Whisper bills by the minute, so `atranscribe` measures each recording's length (with ffprobe, or by decoding it when the container doesn't say) unless the caller already knows it. The span of a streamed chat call ends when the stream is used up, not when the response headers arrive.
+
+- `tracer.export_spans(path)` appends the finished spans as one line of OTLP/JSON (the `ExportTraceServiceRequest` shape). An OpenTelemetry collector's file receiver, or anything else that reads OTLP, can ingest it.
+- `tracer.export_metrics(path)` writes counters and a span-duration histogram in Prometheus text format (for node_exporter's textfile collector).
+
+A span costs a few microseconds and the spans are kept in a bounded buffer, so this can stay on in production.
+"""
+
+from stsoaps.tracing import export, tracer
+
+"""## Caching
+
+Uploading audio to Whisper is the slowest and most expensive stage of the pipeline, and every re-run of the notebook (or of a batch after tweaking the SOAP prompt) pays for it again even though nothing about the transcription has changed. Transcripts are cached on local disk keyed on a hash of the audio bytes plus the model and prompt, so the same recording is only ever uploaded once per (model, prompt). The cache lives in a single SQLite file with a size cap; when it fills up the least recently used entries are dropped first.
+
+The SOAP generation calls all run at `temperature=0`, so they are deterministic enough to memoize the same way. When we iterate on downstream formatting or search we keep sending identical requests; those are answered from the same SQLite file, keyed on a canonical hash of the request (model, messages, functions/response_format, temperature). Completions also expire after a TTL so a model update eventually shows up. Pass `bypass=True` to force a fresh call.
+"""
+
+from stsoaps.cache import cached_completion, cached_transcription
+
+"""# 4. Audio -> SOAP Demo
+
+We will first need an audio file for transcription. We will transcribe it with Whisper. Then we will transform the raw transcription to SOAP notes with GPT-4 and a descriptive prompt explaining what SOAP notes are. We can probably simply get away with literally copying and pasting a document like [this](https://www.vetmed.wisc.edu/wp-content/uploads/2019/07/soapwriting.pdf) into the prompt and perhaps providing a single example (I bet the example is unnecessary, so I wouldn't waste time on it for this PoC unless the quality of generated notes is empirically bad). Afterwards, we will need to review the quality of the generated SOAP notes. If it's not good, we need to collect more examples and manually edit the generated notes for each sample until the model is able to produce high quality notes.
+"""
+
+# Import openai library and use the transcribe() function to convert sample
+# audio clip into text using whisper-1 model.
+
+# import openai
+# NOTE: prompting with a limited dictionary of words that it is observed to
+# transcribe incorrectly aids the model in recognizing them at transcription
+# time. See https://platform.openai.com/docs/guides/speech-to-text/improving-reliability.
+# This is a bit finnicky and doesn't work too well but we can test further post
+# processing with GPT-4 or using semantic/lexical search and matching (fuzzy
+# match or Levenshtein distance). For PoC, this is fine. Section 16 does the
+# Levenshtein post-processing.
+transcript = cached_transcription(client.audio.transcriptions.create, "/content/Remy.m4a", model="whisper-1", prompt="Hobin, lymph nodes, distemper, lepto")
+print(transcript.text)
+
+# TO-DO: Use text output from transcription to generate SOAP notes
+# by sending into GPT.
+# Other model option is gpt-4
+
+import openai
+
+MODEL = "gpt-3.5-turbo"
+
+response = cached_completion(
+    client.chat.completions.create,
+    model=MODEL,
+    messages=[
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "Please convert the following text into SOAP notes for a veterinary appointment:" + transcript.text},
+    ],
+    temperature=0,
+)
+
+print(response.choices[0].message.content)
+
+# Experimental Section
+# TODO: pass template in system message
+# NOTE: section 8 generates each section in a separate request with its own
+# slice of these instructions.
+from stsoaps.prompts import VMTH_SYSTEM_MESSAGE
+
+response = cached_completion(
+    client.chat.completions.create,
+    model="gpt-4-1106-preview",
+    messages=[
+        {"role": "system", "content": VMTH_SYSTEM_MESSAGE},
+        {"role": "user", "content": "Please convert the following transcription of a veterinary appointment into SOAP notes."+
+                                    "Please keep in mind that there may be some transcription errors, so using context will be important.\n\n" + transcript.text},
+    ],
+    temperature=0,
+)
+
+print(response.choices[0].message.content)
+
+"""## SOAP note schema
+
+The JSON structure of a SOAP note used to be written out four times (a skeleton, the function spec as a docstring, the live `functions` list and the skeleton in the function description prompt in section 5), and they drifted. Now there is one definition, `SOAP_NOTE`, and everything else is generated from it: the OpenAI function spec, the blank JSON skeleton, and `SOAPNote`, a compact class for holding lots of parsed notes in memory.
+
+`SOAPNote` uses `__slots__` with every text field in its own slot and all of the numeric vitals packed into a single float64 `array` (NaN for null). That keeps a parsed note to a couple of small objects instead of a tree of dicts, which matters once we hold hundreds of thousands of them for analytics and re-indexing. It is built from the `json.loads` result of the function call arguments and writes JSON straight from its slots.
+"""
+
+import json
+
+from stsoaps.schema import SOAP_NOTE, SOAPNote, functions, json_skeleton
+
+system_message = """Don't make assumptions about what values to plug into functions. Do not provide values for parameters not specified in the request. If a required value is not provided, provide the JSON value 'null'."""
+
+response = cached_completion(
+    client.chat.completions.create,
+    # response_format= {"type": "json_object"},
+    model="gpt-4-1106-preview",
+    messages=[
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": "Generate SOAP notes for the following patient interaction:\n\n" + transcript.text},
+    ],
+    functions=functions,
+    temperature=0,
+)
+
+json.loads(response.choices[0].message.function_call.arguments)
+
+# The same arguments as a compact note object.
+note = SOAPNote.from_json(response.choices[0].message.function_call.arguments)
+print(note.temperature, note.bodyConditionScore, note.HL_heart)
+
+"""# 5. SOAP Search Demo
+
+At this point, we will want to test searching over SOAP notes. We will have to upload generated notes to our in-memory Qdrant test database[0] and then test running some sample search queries using the Qdrant test client. We will need Elena's input for generating the sample queries.
+
+[0] I would start by essentially storing no additional metadata other than an ID and the original text along with the vector. But, we can play around with this later to improve search functionality. My guess is the basic (id, text, embedding) schema will blow current search functionality out of the water so that's good enough for a PoC.
+"""
+
+system_message = """You are a helpful assistant designed to generate OpenAI function descriptions that will be used to assist function calling with GPT-4. For example, given the following function name, description, and sample parameters
+
+get_current_weather: gets the weather in the specified location in either degrees farenheit or celsius.
+
+{
+  "location": "Glasgow, Scotland",
+  "format": "celsius"
+}
+
+you would return
+
+[
+    {
+        "name": "get_current_weather",
+        "description": "Get the current weather",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "location": {
+                    "type": "string",
+                    "description": "The city and state, e.g. San Francisco, CA",
+                },
+                "format": {
+                    "type": "string",
+                    "enum": ["celsius", "fahrenheit"],
+                    "description": "The temperature unit to use. Infer this from the users location.",
+                },
+            },
+            "required": ["location", "format"],
+        },
+    },
+]
+"""
+
+user_message = "generate_SOAP_notes: generates human readable SOAP notes from JSON notes.\n\n" + json.dumps(json_skeleton(SOAP_NOTE), indent=2)
+
+response = cached_completion(
+    client.chat.completions.create,
+    response_format= {"type": "json_object"},
+    model="gpt-4-1106-preview",
+    messages=[
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ],
+    temperature=0,
+)
+
+import json
+
+json.loads(response.choices[0].message.content)
+
+"""# 6. Validating Generated Notes
+
+Nothing checks the model's output against the `generate_SOAP_notes` schema; whatever `json.loads` returns is taken as-is. The validator below walks `functions[0]["parameters"]` once and compiles it into a tree of small check functions, so checking a note is just a few function calls per field with no schema interpretation at run time. While checking, it also fixes the slips the model commonly makes with numbers ("100.1F" -> 100.1, "5/9" -> 5, "< 2 sec" -> 2) and returns everything it couldn't fix as a list of errors with the path of the offending field. Each field's check is also indexed by path, so streamed fields (section 9) can be checked as they arrive, and the whole thing is quick enough to re-validate the historical note archive in bulk.
+
+Fields set to `null` are accepted (the function calling instructions tell the model to do that when a value isn't in the transcript). Missing required fields are errors.
+"""
+
+import json
+import time
+from pathlib import Path
+
+from stsoaps.validation import validate_field, validate_note
+
+# Re-validate every note the batch pipeline has written so far, and time it.
+archive = [json.loads(p.read_text())["soap_note"] for p in Path("/content/drive/MyDrive/soap_notes").glob("*.json")]
+start = time.perf_counter()
+checked = [validate_note(note) for note in archive]
+elapsed = time.perf_counter() - start
+print(f"{len(archive)} notes in {elapsed * 1000:.1f} ms, {sum(bool(errors) for _, errors in checked)} with errors")
+
+"""# 7. Batch Processing
+
+Section 4 handles one hard-coded recording and blocks on each API call in turn. A clinic records 150+ appointments a day, so we need to push a whole day's recordings through transcription and SOAP generation at once. Nearly all of the time is spent waiting on OpenAI, so an asyncio pipeline with a bounded number of appointments in flight overlaps that waiting across recordings. A token bucket per endpoint keeps us under the account's rate limits (see https://platform.openai.com/docs/guides/rate-limits), and each recording gets its own result record so one bad file doesn't take down the batch.
+"""
+
+from stsoaps.batch import run_batch, write_results
+
+# NOTE: point this at a folder of recordings on the mounted drive (or at a
+# manifest file listing them). Colab lets us `await` at the top level.
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8)
+write_results(results, "/content/drive/MyDrive/soap_notes")
+print(f"{export(config.TRACE_DIR)} spans exported")
+
+"""# 8. Per-Section SOAP Generation
+
+Generating the whole note in one request means the model writes S, O, A and P serially, and the latency is that of the full note. Here each section is requested on its own, all four at once, with only the part of the VMTH instructions that applies to that section and a function spec for just that part of the `generate_SOAP_notes` schema. The answers are merged back into one note with the same shape as the single-call version. Wall-clock time is then set by the slowest section (usually O), and every prompt is a fraction of the size of the full one.
+"""
+
+from stsoaps.sections import agenerate_soap_sections
+
+note = await agenerate_soap_sections(transcript.text)
+print(json.dumps(note, indent=2))
+
+# The same mode works for a whole batch.
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8, generate=agenerate_soap_sections)
+
+"""# 9. Streaming SOAP Generation
+
+The function calling request in section 4 waits for the whole response before `json.loads` sees any of it, so clinicians stare at a spinner for 20-40 seconds. With `stream=True` the function call arguments arrive as a stream of text deltas instead. We feed those deltas through a small incremental JSON parser that reports each field as soon as its closing quote/brace/bracket arrives: `subjective`, every `objective` entry (the vitals and sub-objects like `EENT` or `H/L`), each `assessment` item and `plan`. The UI can render the note section by section while the rest is still being generated.
+"""
+
+from stsoaps.streaming import astream_soap
+
+# Check and print each field as soon as it's done.
+async for path, value in astream_soap(transcript.text):
+    if path:
+        value, errors = validate_field(path, value)
+        print("/".join(map(str, path)), "->", json.dumps(value), *[e.message for e in errors])
+    else:
+        note, errors = validate_note(value)
+
+"""# 10. Indexing SOAP Notes
+
+Section 5 sets up Qdrant and fastembed but never indexes anything. This is the ingestion side: every note is flattened to text, embedded with fastembed's BGE model and upserted into a collection with the basic (id, text, embedding) schema from section 5. Notes are streamed through in fixed-size batches (read a batch, embed it, upsert it, move on), so memory stays flat no matter how big the archive is, and the upserts don't wait for Qdrant to finish indexing before the next batch is embedded. That is what it takes to load our ~2M historical notes in hours. For that volume, point `QDRANT_URL` (section 3) at a real Qdrant server; the in-memory and local-path modes are fine for a few hundred thousand notes.
+"""
+
+from stsoaps.index import NOTES_COLLECTION, index_notes, iter_notes
+
+embedder = clients.embedder()
+index_notes(iter_notes("/content/drive/MyDrive/soap_notes"), batch_size=256)
+
+hits = qdrant.query_points(NOTES_COLLECTION, query=next(iter(embedder.query_embed("vomiting and diarrhea"))).tolist(), limit=5).points
+for hit in hits:
+    print(f"{hit.score:.3f} {hit.payload['note_id']}")
+
+"""# 11. Section-Level Search
+
+Vets almost always search within one section ("plan mentions dolasetron", "assessment R/O pancreatitis"), and a single embedding of the whole note blurs the sections together. Here every section gets its own point: the subjective, the objective findings, each assessment item on its own, and the plan. Each point carries the section name plus the species, patient, clinic and visit date of its note as payload, and those fields get payload indexes. `search_sections` turns the section and any of those fields into a Qdrant filter, so the index narrows the candidates before any vectors are scored. Queries get more precise, and faster on a big collection, because only the matching slice is scored.
+
+The species/patient/clinic/visit_date values come from the note's metadata, i.e. extra columns in the batch manifest .csv (section 7) or the `metadata` object of archive records. Visit dates are ISO 8601 strings.
+"""
+
+from stsoaps.index import index_sections, search_sections
+
+index_sections(iter_notes("/content/drive/MyDrive/soap_notes"))
+
+for hit in search_sections("dolasetron", section="plan", species="canine"):
+    print(f"{hit.score:.3f} {hit.payload['note_id']}: {hit.payload['text'][:80]}")
+for hit in search_sections("R/O pancreatitis", section="assessment", since="2024-01-01"):
+    print(f"{hit.score:.3f} {hit.payload['note_id']}: {hit.payload['text'][:80]}")
+
+"""# 12. Hybrid Search
+
+The Whisper prompt hack in section 4 exists because words like "lepto", "distemper" and "Hobin" are rare, and rare words are exactly what dense embeddings handle badly too: "lepto" lands near every other infectious disease. So next to its fastembed vector, every section point also gets a BM25 sparse vector: one weight per term, the term frequency saturated and normalized by section length. Qdrant multiplies in each term's IDF over the whole collection at query time. `search(query, k)` runs the vector search and the BM25 search in parallel and merges the two rankings with reciprocal rank fusion (RRF, https://plg.uwaterloo.ca/~gvcormac/cormacksigir09-rrf.pdf). A document ranked highly by either side comes out near the top without having to calibrate BM25 scores against cosine similarities.
+
+Because the lexical side lives in the collection, it is written by the same upserts as the vectors (`index_sections`, `sync_sections` in section 13), persists with the collection, and needs nothing rebuilt when a new process starts. The same filters as `search_sections` apply to both sides inside Qdrant before ranking, and `stsoaps search` on the command line goes through here too. A sections collection created before the sparse vectors existed has to be deleted and indexed again.
+
+The benchmark at the end builds a synthetic corpus where we know exactly which sections mention each jargon term, and reports recall@10 and latency for vector-only, BM25-only and hybrid search.
+"""
+
+from stsoaps.hybrid import search
+
+for score, payload in search("lepto titer", k=5):
+    print(f"{score:.4f} {payload['note_id']} [{payload['section']}] {payload['text'][:80]}")
+
+"""## Hybrid search benchmark
+
+A synthetic corpus of routine notes where a known subset of sections mention rare jargon. For each term, the relevant set is every section whose text contains it, so recall@10 is exact.
+"""
+
+from stsoaps.bench import benchmark_search
+
+benchmark_search()
+
+"""# 13. Incremental Re-Indexing
+
+Whenever we change the SOAP prompt or re-run generation, sections 10 and 11 re-embed every note, even though most of the text hasn't changed. Two things fix that:
+
+1. An embedding store: vectors are cached in the SQLite cache from section 3, keyed on a hash of the section text plus the embedding model name, so any text we have embedded before is never embedded again (even if it was deleted from the collection in between).
+2. An incremental indexer: every section point carries a hash of its text and payload. For each batch of notes, `sync_sections` pulls the (id, hash) pairs of just those notes out of the collection with a filtered, payload-only scroll (no vectors), and only embeds and upserts the sections whose hash is new or different. Sections of those notes that no longer exist get deleted. Notes that aren't in the input are left alone, so syncing one day's folder never touches the others; `prune=True` (`stsoaps index --prune`) additionally deletes every note that isn't in the input, at the cost of scanning the whole collection.
+
+Hashing text and scrolling the ids of a batch is cheap; embedding and upserting is what costs time, and now those only touch the churn. A nightly sync of a day's notes takes time in proportion to that day, not to the whole collection.
+"""
+
+from stsoaps.index import sync_sections
+
+# Nightly: re-sync the section index with whatever the batch pipeline wrote.
+sync_sections(iter_notes("/content/drive/MyDrive/soap_notes"))
+# Now and then: also drop the sections of notes that were deleted from the archive.
+sync_sections(iter_notes("/content/drive/MyDrive/soap_notes"), prune=True)
+
+"""# 14. Quantized Vector Storage
+
+Section 1 pitches fastembed/BGE for its "huge memory and speed savings", but the collections still hold full float32 vectors in RAM. `ensure_collection` can now create a quantized collection instead (set `SECTIONS_QUANTIZATION` in section 11 before the collection is first created):
+
+- `"scalar"`: int8 per dimension, 4x smaller, usually with recall close to float32.
+- `"binary"`: 1 bit per dimension, 32x smaller and very fast to compare. It's lossy for a 384-d model like BGE-small, so it leans on rescoring.
+
+Either way only the quantized vectors stay in RAM. The float32 originals move to disk and are only read to rescore the top `oversampling * k` candidates, which `search_sections` does by default (`rescore=False` turns it off).
+
+NOTE: qdrant's local mode (`:memory:` / `QDRANT_PATH`) accepts the config but does brute force search over float32 anyway, so run this against a Qdrant server (`QDRANT_URL`). The RAM figures are estimates worked out from the storage layout (vectors kept in RAM plus the HNSW links), not measurements, since the server doesn't report per-collection memory; the output labels them "(estimated)".
+
+The benchmark indexes the same synthetic sections into one collection per mode and reports estimated RAM per million notes, p50/p99 query latency, and recall@10 against exact float32 search.
+"""
+
+from stsoaps.bench import benchmark_quantization
+
+benchmark_quantization()
+
+"""# 15. Multi-Core Embedding
+
+fastembed runs ONNX inference in a single process, and during a backfill that is the bottleneck: Qdrant can take upserts much faster than one process can embed. `EmbeddingWorkers` shards batches of section text across a pool of worker processes, one model per worker. Each worker gets its own slice of the cores (both the ONNX thread count and, on Linux, the CPU affinity), so N workers don't each spin up a thread per core and fight over them. Vectors come back through one shared memory block split into slots: a worker writes its batch straight into a slot and only sends back the slot number, so no vectors get pickled. The parent upserts from a NumPy view of the slot and then hands the slot back. There are two slots per worker, so at most that many batches are in flight; that bounded queue is what keeps embedding from running ahead of the Qdrant upserts.
+
+(fastembed's own `parallel=` option also uses multiple processes, but it pickles every vector back to the parent and can't overlap with the upserts.)
+
+NOTE: workers are spawned, not forked, because onnxruntime is not fork-safe (and section 10 has already loaded the model in this process). Each worker loads its own model, and a worker that dies raises an error instead of hanging the backfill.
+"""
+
+from stsoaps.bench import benchmark_embedding
+from stsoaps.parallel import index_sections_parallel
+
+benchmark_embedding()
+index_sections_parallel(iter_notes("/content/drive/MyDrive/soap_notes"))
+
+"""# 16. Transcript Vocabulary Correction
+
+The NOTE above the Whisper call in section 4 says the `prompt=` word list "doesn't work too well" and suggests post-processing with fuzzy matching / Levenshtein distance instead. This is that stage: a lexicon of veterinary terms (drug names, breeds, exam terms, clinic-specific names like "Hobin") is loaded into an index, and every word of `transcript.text` that is a near miss for a lexicon term gets replaced with the term. No extra GPT-4 round trip needed.
+
+The index is a symmetric-delete index (the SymSpell trick, https://github.com/wolfgarbe/SymSpell) rather than a BK-tree. A BK-tree lookup in pure Python still computes thousands of edit distances per word against a 100k-term lexicon, which is far too slow for the budget. Here every term is stored under each string you get by deleting up to `max_distance` characters from its prefix, so a lookup only generates the same deletes for the word, does a handful of dict lookups, and verifies the few candidates it finds with a bounded Levenshtein distance. Lookups are memoized per distinct word, so a 15-minute transcript is corrected in one linear pass with only a few hundred real lookups. Against a 100k-term lexicon that is about 10 ms with a cold memo and around 1 ms once the memo has seen a few transcripts.
+
+To avoid "fixing" ordinary speech, only words of 4+ letters are considered, a 1-edit miss is allowed up to 7 letters and 2 edits beyond that, and a word that is in a general English word list (`STSOAPS_DICTIONARY`, /usr/share/dict/words by default) is never rewritten: "notes", "noses" and "Robin" stay as they are. Multi-word lexicon entries like "lymph nodes" are matched as whole phrases, so "lymph nodez" is fixed but "nodes" on its own never pulls in a neighbouring word. Without a word list only exact matches are normalized.
+"""
+
+!apt-get -qq install -y wamerican
+
+from stsoaps.vocabulary import lexicon_corrector
+
+# NOTE: the lexicon lives on the drive (STSOAPS_LEXICON_DIR, section 2) as plain
+# text files so anyone at the clinic can add terms. It is seeded with the words
+# from the Whisper prompt.
+vocabulary = lexicon_corrector(config.LEXICON_DIR)
+print(vocabulary.correct(transcript.text))
+
+# Timing on a 15 minute (~2,500 word) transcript.
+long_transcript = " ".join([transcript.text] * max(1, 2500 // max(1, len(transcript.text.split()))))
+vocabulary.memo.clear()
+start = time.perf_counter()
+vocabulary.correct(long_transcript)
+print(f"{len(long_transcript.split())} words corrected in {(time.perf_counter() - start) * 1000:.1f} ms against {len(vocabulary.terms)} terms")
+
+# Correct transcripts in the batch pipeline before they reach the SOAP stage.
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8, clean=vocabulary.correct)
+
+"""# 17. Deterministic Vitals Extraction
+
+The numeric `objective` fields (temperature, pulse, respiration, weight, bodyConditionScore, capillaryRefillTime) are almost always dictated in stock phrasings like "T 100.1, P 80, R pant, BW 24.5 kg, BCS 5/9, CRT < 2 sec". A few compiled regexes pick those out of the transcript locally, and the extracted values are then simply not asked of the model: `agenerate_soap_prefilled` removes them from the function spec for that call and writes them into the note itself. That means fewer output tokens, a bit less latency, and no hallucinated numbers for the fields we're sure about.
+
+A value only counts as extracted when the transcript is unambiguous: every mention of the field that falls in a plausible range gives the same value. Out-of-range matches are ignored rather than treated as a conflict, so "T4 of 3.2, temp 102" still gives a temperature of 102. Anything else (two different temperatures, "R pant", a 300 kg dog) is left for the model. Weights in pounds are converted to kg, since kg is what the VMTH example uses.
+
+The labeled corpus at the end checks precision/recall per field and measures throughput.
+"""
+
+from stsoaps.vitals import agenerate_soap_prefilled, evaluate_vitals, extract_vitals
+
+evaluate_vitals()
+print(extract_vitals(transcript.text))
+
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8, generate=agenerate_soap_prefilled, clean=vocabulary.correct)
+
+"""# 18. Audio Preprocessing
+
+Recordings go to Whisper exactly as they came off the phone, long stretches of silence included (the vet steps out to get a drug, the tech goes to weigh the patient). Whisper bills by duration and our clinic uplinks are slow, so this stage trims that silence locally before anything is uploaded:
+
+1. ffmpeg decodes the file to 16 kHz mono PCM. That is what Whisper resamples to anyway, so nothing it uses gets lost.
+2. A NumPy energy VAD scores 30 ms frames in dB against the recording's own noise floor (10th percentile). Frames more than `threshold_db` above the floor count as speech. Each speech run gets `padding` seconds added on both sides, and gaps shorter than `min_silence` are kept so normal pauses between sentences survive.
+3. The kept samples are re-encoded to 24 kbit/s Opus in a .webm file. That is roughly 180 KB per minute, against about 1 MB for a typical m4a.
+
+`PreparedAudio.segments` maps the trimmed file back to the original: for each kept piece it stores where that piece starts in the trimmed audio, where it started in the original, and how long it is. `original_time` uses the map to turn a Whisper segment timestamp back into a position in the original recording, and `atranscribe_preprocessed(path, timestamps=True)` returns the segments already mapped.
+"""
+
+import tempfile
+
+from stsoaps.audio import atranscribe_preprocessed, preprocess_audio
+
+with tempfile.TemporaryDirectory() as out_dir:
+    prepared = preprocess_audio("/content/Remy.m4a", out_dir)
+    print(f"{prepared.original_seconds:.0f}s -> {prepared.seconds:.0f}s of audio, "
+          f"{Path(prepared.original_path).stat().st_size / 1e6:.2f} MB -> {Path(prepared.path).stat().st_size / 1e6:.2f} MB")
+
+# Whisper segment timestamps are relative to the trimmed file; these are mapped back to the original.
+for start, end, text in (await atranscribe_preprocessed("/content/Remy.m4a", timestamps=True))[:5]:
+    print(f"[{start:7.1f}s] {text}")
+
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8, transcribe=atranscribe_preprocessed, clean=vocabulary.correct)
+
+"""# 19. Chunked Parallel Transcription
+
+Whisper rejects uploads over 25 MB, and even below that limit a 60-minute surgery or inpatient recording goes out as one serial call. This mode decodes the recording once and cuts it into chunks of about `chunk_seconds`. Each cut lands at the quietest point (by smoothed frame energy, from section 18) in the `search_seconds` before the chunk mark, so cuts fall between sentences whenever there is any pause. Every chunk is re-encoded with `overlap` seconds of audio borrowed from its neighbours, and all chunks are transcribed concurrently. With `concurrency` at least as large as the number of chunks, total latency is about one chunk's worth. A recording shorter than one chunk goes up as is, unless it is over 25 MB (a long WAV, say); then it is re-encoded to Opus first.
+
+Chunks are transcribed in parallel, so a chunk can't wait for the text before it: every chunk gets the plain glossary prompt, and the overlap carries the context across each cut. That also keeps each chunk's transcription cache key the same from run to run. The stitched transcript is cached on the source recording as well, and the chunk files live in a temporary folder that is deleted afterwards.
+
+Each chunk's transcript repeats the words spoken in the overlap, so stitching drops the longest run of words (normalized) at the start of a chunk that matches the end of the text so far.
+"""
+
+from stsoaps.audio import atranscribe_chunked, atranscribe_long
+
+start = time.perf_counter()
+long_text = await atranscribe_chunked("/content/drive/MyDrive/recordings/inpatient_rounds.m4a")
+print(f"{len(long_text.split())} words in {time.perf_counter() - start:.1f}s")
+
+# Trim silence first (section 18), then chunk what's left.
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=4, transcribe=atranscribe_long, clean=vocabulary.correct)
+
+"""# 20. Resilient API Transport
+
+Until now every call went through a default `OpenAI(...)` client: the SDK's generic 600 s timeout and its built-in 2 retries, and nothing to help when a single slow request holds up a whole appointment. This section swaps in a transport layer under both clients:
+
+- **Connection pool.** A keep-alive pool per client (`POOL_LIMITS`), so batch runs reuse TLS connections rather than opening a new one for each call.
+- **Per-endpoint timeouts.** `ENDPOINT_TIMEOUTS` is matched on the request path. Transcription uploads get a long write/read timeout, embeddings a short one.
+- **Retries.** 429, 408 and 5xx responses and connection errors are retried up to `attempts` times with full-jitter exponential backoff. If the server sends `Retry-After` or `retry-after-ms`, we wait at least that long. The SDK's own retries are turned off (`max_retries=0`) so there is only one policy.
+- **Hedged requests.** `hedged_completion` starts a duplicate of a SOAP generation call once the first one has been outstanding longer than the recent p95 latency, and takes whichever answers first. SOAP calls run at temperature 0, so both answers are equivalent. `LatencyTracker` caps the duplicates at 5% of calls and only learns the p95 from calls that were never hedged, so the threshold doesn't drift down to meet the hedges. The cost is at most 5% extra requests, and in return the slow tail is cut off.
+
+`StubServer` is a small local HTTP server that speaks just enough of the API to test all of this. It injects latency and errors.
+"""
+
+import functools
+import random
+import statistics
+import time
+
+from stsoaps.batch import agenerate_soap, hedged_completion, soap_latency, throttled_completion
+from stsoaps.prompts import SOAP_SYSTEM_MESSAGE
+from stsoaps.stub import STUB_TRANSCRIPT, StubServer
+
+# 20% injected errors and a 5% tail of 2 s responses: every call should still succeed,
+# and hedging should cut the tail. The calls skip the completion cache on purpose.
+tail_latency = lambda: 2.0 if random.random() < 0.05 else random.uniform(0.05, 0.15)
+request = dict(
+    model=config.SOAP_MODEL,
+    messages=[{"role": "system", "content": SOAP_SYSTEM_MESSAGE}, {"role": "user", "content": STUB_TRANSCRIPT}],
+    functions=functions,
+    temperature=0,
+)
+with StubServer(latency=tail_latency, error_rate=0.2) as stub, clients.using_openai(stub.url, "stub"):
+    for create in (throttled_completion, hedged_completion):
+        times = []
+        for _ in range(200):
+            start = time.perf_counter()
+            await create(**request)
+            times.append(time.perf_counter() - start)
+        q = statistics.quantiles(times, n=100)
+        print(f"{create.__name__:>20}: p50 {q[49]:.2f}s  p95 {q[94]:.2f}s  p99 {q[98]:.2f}s")
+    print("served:", dict(stub.requests), "hedges:", soap_latency.hedges)
+
+# Back on the real clients, with hedged SOAP calls.
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8, generate=functools.partial(agenerate_soap, create=hedged_completion))
+
+"""# 21. Pipeline Benchmark
+
+Until now the only way to time this pipeline was to run it against OpenAI from Colab, which is slow, costs money and is too noisy to catch regressions. `benchmark_pipeline` runs every stage against `MockOpenAI`, a version of section 20's stub server that:
+
+- answers `/audio/transcriptions` and `/chat/completions` with synthetic visits (section 12),
+- handles both plain and streamed (`stream=True`) function-call responses,
+- draws latency for each endpoint from its own log-normal distribution, set by a median and a p95.
+
+It then runs each stage over the same synthetic visits, each one a real Opus recording of speech-like noise: transcription → SOAP (plain and streamed) → whole appointments through `process_recording` → validation → embedding + Qdrant upsert → section search. For every stage it prints throughput, p50/p95/p99 latency per call, and peak RSS, and it returns the same numbers as rows so a run can be compared against an earlier baseline.
+
+The API stages are the pipeline's own functions (`atranscribe`, `agenerate_soap`, `astream_soap`, `process_recording`), so a regression in any of them shows up here. They run inside `bypass_caches()`, so every call reaches the mock instead of measuring cache hits. The rate limiters from section 7 stay on the path but are opened up, since the tier 1 Whisper limit (50/min) would otherwise dominate the numbers. Pass `rate_limits=True` to keep them.
+"""
+
+from stsoaps.bench import benchmark_pipeline
+
+baseline = await benchmark_pipeline()
+
+# A slow Whisper day with 5% errors: retries (section 20) should keep every call succeeding.
+slow = await benchmark_pipeline(latency={"/audio/transcriptions": (10.0, 40.0)}, error_rate=0.05)
+for before, after in zip(baseline, slow):
+    print(f"{before['stage']:>12}: p95 {before['p95_ms']:8.1f}ms -> {after['p95_ms']:8.1f}ms")
+
+"""# 22. Model Cascade
+
+Section 4 tries `gpt-3.5-turbo` and `gpt-4-1106-preview` by hand. `agenerate_soap_cascade` does that per transcript: the fast model (`STSOAPS_FAST_SOAP_MODEL`) writes the note first, and the note is checked against the `generate_SOAP_notes` schema (section 6) plus a few completeness heuristics: `subjective` and `plan` filled in, at least one assessment item, and every vital the transcript states unambiguously (section 17) actually in `objective`. Only notes that fail, or responses without a usable function call, are regenerated with GPT-4.
+
+A routine wellness visit should finish on the fast path, at roughly a tenth of the price and with a much shorter wait. `cascade_paths` counts how often each path is taken (also exported as the `stsoaps_cascade_total` metric), and `escalation_reasons` counts why notes were escalated, which tells us where the fast model needs help.
+"""
+
+from stsoaps.cascade import agenerate_soap_cascade, cascade_summary
+
+results = await run_batch("/content/drive/MyDrive/recordings", concurrency=8, generate=agenerate_soap_cascade, clean=vocabulary.correct)
+print(json.dumps(cascade_summary(), indent=2))
+print(f"${sum(r.cost_usd for r in results):.2f} for {len(results)} notes")
+
+"""# 23. Inpatient Updates
+
+The VMTH guide says inpatient SOAPs are dynamic: "your S is compared to the last S, your O should focus on the changes in findings". Regenerating the whole note every day ignores the previous one and costs the same each day. `agenerate_soap_inpatient` keeps every hospitalized patient's latest note in a SQLite store (`STSOAPS_INPATIENT_PATH`). From the second day on it sends the model only the previous note and today's transcript, asks for a JSON patch of the fields that changed (`update_SOAP_notes`), and applies the patch locally. Prompt and output size stay roughly constant however long the stay is.
+
+The patient and the day come from the `patient` and `visit_date` columns of the manifest (section 7). Vitals are not carried over from the previous day. A patch that doesn't apply to the schema or doesn't validate falls back to a full note, and `update_paths` counts which path each note took. Run each day's rounds as its own batch.
+"""
+
+from stsoaps.inpatient import agenerate_soap_inpatient, update_paths
+
+results = await run_batch("/content/drive/MyDrive/rounds/2024-03-02.csv", concurrency=8, generate=agenerate_soap_inpatient, clean=vocabulary.correct)
+print(dict(update_paths))
+
+"""# 24. Live Scribing
+
+Everything so far starts once the appointment is over and the whole recording exists, and then the vet waits for a full transcription plus a full generation pass. A `LiveSession` does the work while the visit is still going. It is fed audio frames as they arrive, either from a recording that is still being written (`follow_file`) or from raw PCM sent to a local socket (`socket_frames`).
+
+Every ~30 s of audio is cut at a pause and transcribed in the background, with the transcript so far as the Whisper prompt, and then stitched on as in section 19. Each new piece only re-runs the SOAP sections it touches, using the per-section calls from section 8: vitals and exam findings update O, rule-outs update A, drugs and diagnostics update P, and everything else updates S. When the visit ends, only the last partial window and the sections it touches are left to do.
+
+A window whose upload fails twice is skipped and listed in `session.skipped`, so a network blip costs those 30 s of audio rather than the whole visit. Failed sections are retried at the end the same way. At most a few windows wait for transcription at once; if Whisper falls that far behind, `feed` waits and the frames back up in the recorder rather than in memory.
+
+From the command line: `stsoaps live visit.webm` or `stsoaps live --socket /tmp/stsoaps.sock`.
+"""
+
+import asyncio
+import time
+
+from stsoaps.live import LiveSession, follow_file
+
+# Stand-in for a recorder: replay a finished visit in real time.
+session = LiveSession(window_seconds=30, clean=vocabulary.correct, on_update=lambda section, draft: print(f"{section} updated"))
+async for samples in follow_file("/content/drive/MyDrive/recordings/visit.webm", idle_seconds=5):
+    await session.feed(samples)
+    await asyncio.sleep(len(samples) / 16_000)
+start = time.perf_counter()
+note = await session.finish()
+print(f"final note {time.perf_counter() - start:.1f}s after the visit ended")
+print(json.dumps(note, indent=2))
+
+"""# 25. Columnar Note Archive
+
+The structured notes parsed from `function_call.arguments` were only written out as one JSON file per visit, which is fine for reading a single note but useless for questions across the whole practice. `stsoaps.archive` appends them to a columnar archive of Arrow IPC files, with one row per note:
+
+- the `species`, `patient`, `clinic` and `visit_date` metadata,
+- one typed numeric column per vital (null where the note has none),
+- one string column per text field, named like the `SOAPNote` attributes,
+- `assessment` as a list of strings.
+
+The writer streams record batches of 10,000 notes, so memory use doesn't grow with the archive. `open_archive` memory-maps the uncompressed files, so opening even millions of notes is instant and nothing is copied or parsed until a query touches a column. The filters and group-bys run as pyarrow.compute kernels over whole columns, never through Python dicts.
+
+`stsoaps soap ... --archive` appends every batch as it is written. `export_parquet` produces a compressed Parquet copy for sharing.
+"""
+
+import datetime
+
+from stsoaps.archive import archive_notes, export_parquet, filter_notes, open_archive, vital_counts
+from stsoaps.batch import note_id
+
+archive_notes(iter_notes("/content/drive/MyDrive/soap_notes"))
+archive_notes((note_id(r.path), r.soap_note, r.metadata) for r in results if r.error is None)
+
+notes = open_archive()
+fevers = filter_notes(notes, species="canine", since=datetime.date.today().replace(day=1), above={"temperature": 103})
+print(fevers.select(["note_id", "patient", "visit_date", "temperature", "assessment"]).to_pandas())
+print(vital_counts(notes, "bodyConditionScore", by="clinic").to_pandas())
+
+export_parquet("/content/drive/MyDrive/soap_notes.parquet")
@@ -0,0 +1,12 @@
+"""Speech -> Text -> SOAP -> Search.
+
+Automated veterinary scribing: Whisper transcription, GPT-4 SOAP notes and
+section-level search over the notes. `notebooks/STSOAPS.py` walks through every
+stage; `stsoaps.cli` runs them from the command line.
+
+NOTE: keep this module empty of imports. Worker processes start `stsoaps soap`
+per job, and each submodule pulls in only what it needs (Qdrant, fastembed and
+ONNX only load for indexing and search).
+"""
+
+__version__ = "0.1.0"
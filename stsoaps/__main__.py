@@ -0,0 +1,8 @@
+import sys
+
+from .cli import main
+
+# NOTE: guarded because spawned worker processes (`stsoaps.parallel`) re-import
+# the main module.
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Columnar archive of structured notes for analytics.
+
+Notes are appended to a folder of Arrow IPC files (`ARCHIVE_DIR`), one table
+row per note: `note_id`, the `species`, `patient`, `clinic` and `visit_date`
+metadata, one typed numeric column per vital (float64, int8 for
+`bodyConditionScore`, null where the note has none), one string column per
+text field, named like the `SOAPNote` attributes (`subjective`, `EENT_dental`,
+`HL_heart`, ...), and `assessment` as a list of strings.
+
+`ArchiveWriter` writes `batch_size` rows at a time as record batches, so only
+one batch is ever held in memory, and renames its file into place on close.
+Readers only see finished files; if writing fails, the file is discarded. `open_archive` memory-maps every file: the
+files are uncompressed, so the table's columns point straight into the page
+cache and nothing is parsed or copied until a query touches it. `filter_notes`
+and `vital_counts` run as pyarrow.compute kernels over whole columns, with no
+per-note Python objects.
+
+`export_parquet` writes the archive as one compressed Parquet file for sharing
+or cold storage. That is smaller on disk, but has to be decoded to be read.
+"""
+
+import math
+import uuid
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from . import config
+from .schema import TEXTS, VITALS, as_float, attribute_name, dig
+from .validation import validate_field
+
+METADATA_FIELDS = [
+    pa.field("note_id", pa.string(), nullable=False),
+    pa.field("species", pa.string()),
+    pa.field("patient", pa.string()),
+    pa.field("clinic", pa.string()),
+    pa.field("visit_date", pa.timestamp("s")),
+]
+ARCHIVE_SCHEMA = pa.schema(
+    METADATA_FIELDS
+    + [pa.field(attribute_name(path), pa.int8() if field.type == "integer" else pa.float64()) for path, field in VITALS]
+    + [pa.field(attribute_name(path), pa.list_(pa.string()) if field.type == "array" else pa.string()) for path, field in TEXTS]
+)
+
+def parse_date(value):
+    """An ISO 8601 date or datetime as a naive UTC datetime, or None."""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def vital_value(path, value, integer):
+    # Coerced the same way as validation, so "101.5 F" is stored as 101.5, and
+    # anything validation rejects (a BCS of 200) is stored as null.
+    value, errors = validate_field(path, value)
+    if errors:
+        return None
+    value = as_float(value)
+    if math.isnan(value) or (integer and value != int(value)):
+        return None
+    return int(value) if integer else value
+
+def text_value(value, array):
+    if value is None:
+        return None
+    if array:
+        return [str(item) for item in (value if isinstance(value, list) else [value]) if item is not None]
+    return value if isinstance(value, str) else str(value)
+
+class ArchiveWriter:
+    """Append notes to a new file in the archive, `batch_size` rows per record batch. Use as a context manager."""
+
+    def __init__(self, directory=None, batch_size=10_000):
+        directory = Path(directory or config.ARCHIVE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"notes-{uuid.uuid4().hex[:16]}.arrow"
+        self.partial = self.path.with_suffix(".partial")
+        self.batch_size = batch_size
+        self.columns = {name: [] for name in ARCHIVE_SCHEMA.names}
+        self.rows = 0
+        self.writer = None
+
+    def append(self, note_id, note, metadata=None):
+        metadata = metadata or {}
+        self.columns["note_id"].append(str(note_id))
+        for name in ("species", "patient", "clinic"):
+            self.columns[name].append(None if metadata.get(name) is None else str(metadata[name]))
+        self.columns["visit_date"].append(parse_date(metadata["visit_date"]) if metadata.get("visit_date") else None)
+        for path, field in VITALS:
+            self.columns[attribute_name(path)].append(vital_value(path, dig(note, path), field.type == "integer"))
+        for path, field in TEXTS:
+            self.columns[attribute_name(path)].append(text_value(dig(note, path), field.type == "array"))
+        self.rows += 1
+        if len(self.columns["note_id"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.columns["note_id"]:
+            return
+        if self.writer is None:
+            self.writer = pa.ipc.new_file(str(self.partial), ARCHIVE_SCHEMA)
+        self.writer.write_batch(pa.record_batch([pa.array(self.columns[f.name], f.type) for f in ARCHIVE_SCHEMA], schema=ARCHIVE_SCHEMA))
+        for values in self.columns.values():
+            values.clear()
+
+    def close(self):
+        try:
+            self.flush()
+        except BaseException:
+            self.abort()
+            raise
+        if self.writer is not None:
+            self.writer.close()
+            self.partial.rename(self.path)
+
+    def abort(self):
+        """Discard everything written so far. Readers never see the file."""
+        for values in self.columns.values():
+            values.clear()
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        finally:
+            self.writer = None
+            self.partial.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # NOTE: after an error don't flush again: the rows that failed would
+        # just fail again, and the .partial file would be left behind.
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def archive_notes(notes, directory=None, batch_size=10_000):
+    """Append (note_id, note, metadata) records, e.g. from `stsoaps.index.iter_notes`. Returns the number of notes written."""
+    with ArchiveWriter(directory, batch_size) as writer:
+        for note_id, note, metadata in notes:
+            writer.append(note_id, note, metadata)
+    return writer.rows
+
+def open_archive(directory=None):
+    """The whole archive as one table, memory-mapped rather than read."""
+    paths = sorted(Path(directory or config.ARCHIVE_DIR).glob("*.arrow"))
+    if not paths:
+        return ARCHIVE_SCHEMA.empty_table()
+    # NOTE: concat_tables only chains the per-file chunks together; nothing is copied.
+    return pa.concat_tables([pa.ipc.open_file(pa.memory_map(str(path))).read_all() for path in paths])
+
+def filter_notes(table, species=None, clinic=None, patient=None, since=None, until=None, above=None, below=None):
+    """Rows matching every given condition. `above` / `below` map vital columns to exclusive bounds, e.g. `above={"temperature": 103}`.
+
+    Species, clinic and patient match case-insensitively; `since` and `until`
+    are inclusive ISO dates (or dates / datetimes).
+    """
+    conditions = []
+    for name, value in [("species", species), ("clinic", clinic), ("patient", patient)]:
+        if value is not None:
+            conditions.append(pc.equal(pc.utf8_lower(table[name]), str(value).lower()))
+    if since is not None:
+        conditions.append(pc.greater_equal(table["visit_date"], pa.scalar(parse_date(since), pa.timestamp("s"))))
+    if until is not None:
+        until = parse_date(until)
+        if until.time() == datetime.min.time():
+            # A bare date includes the whole day.
+            until = until.replace(hour=23, minute=59, second=59)
+        conditions.append(pc.less_equal(table["visit_date"], pa.scalar(until, pa.timestamp("s"))))
+    for name, bound in (above or {}).items():
+        conditions.append(pc.greater(table[name], bound))
+    for name, bound in (below or {}).items():
+        conditions.append(pc.less(table[name], bound))
+    if not conditions:
+        return table
+    mask = conditions[0]
+    for condition in conditions[1:]:
+        mask = pc.and_kleene(mask, condition)
+    # Nulls (no temperature, no visit date, ...) never match.
+    return table.filter(pc.fill_null(mask, False))
+
+def vital_counts(table, vital="bodyConditionScore", by="clinic"):
+    """Number of notes per (`by`, `vital`) value, e.g. the BCS distribution per clinic. Notes without the vital are left out."""
+    table = table.select([by, vital]).filter(pc.is_valid(table[vital]))
+    return table.group_by([by, vital]).aggregate([([], "count_all")]).rename_columns([by, vital, "notes"]).sort_by([(by, "ascending"), (vital, "ascending")])
+
+def export_parquet(path, directory=None, compression="zstd"):
+    """Write the whole archive to one Parquet file, a record batch at a time."""
+    table = open_archive(directory)
+    with pq.ParquetWriter(str(path), ARCHIVE_SCHEMA, compression=compression) as writer:
+        for batch in table.to_batches():
+            writer.write_batch(batch)
+    return table.num_rows
@@ -0,0 +1,228 @@
+"""Audio preprocessing before upload: silence trimming and chunked transcription.
+
+`preprocess_audio` decodes a recording to 16 kHz mono PCM with ffmpeg, drops the
+long silences with a NumPy energy VAD, and re-encodes what's left to 24 kbit/s
+Opus. `PreparedAudio.segments` maps the trimmed file back to the original, and
+`atranscribe_preprocessed(timestamps=True)` uses it to return Whisper's segments
+in original-recording time.
+Every call works in its own temporary folder, deleted once the upload is done,
+and transcripts are cached on the source recording, so a cache hit skips the
+decode and encode entirely.
+
+`atranscribe_chunked` cuts long recordings (over Whisper's 25 MB limit, or just
+slow as one serial call) at the quietest point near every `chunk_seconds`,
+transcribes the chunks concurrently with `overlap` seconds of shared audio, and
+stitches the texts back together, dropping the words repeated in the overlap.
+A recording too short to cut but still over the limit is re-encoded whole.
+Every chunk gets the same prompt, so its cache key doesn't depend on the order
+the chunks finish in.
+"""
+
+import asyncio
+import bisect
+import json
+import re
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from . import config
+from .batch import atranscribe
+from .cache import transcription_cache, transcription_key
+from .tracing import tracer
+
+SAMPLE_RATE = 16_000
+WHISPER_MAX_BYTES = 25 * 1024**2
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode anything ffmpeg can read to mono float32 samples at `sample_rate`."""
+    pcm = subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", str(path), "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        capture_output=True, check=True,
+    ).stdout
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768
+
+def encode_audio(samples, path, sample_rate=SAMPLE_RATE, bitrate="24k"):
+    pcm = (np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes()
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-y", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "-",
+         "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", str(path)],
+        input=pcm, capture_output=True, check=True,
+    )
+    return path
+
+def frame_energy(samples, frame):
+    """Energy in dB of each whole `frame`-sample frame."""
+    n = len(samples) // frame
+    frames = samples[:n * frame].reshape(n, frame)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+def speech_segments(samples, sample_rate=SAMPLE_RATE, frame_ms=30, threshold_db=12, min_silence=1.0, padding=0.3):
+    """(start, end) sample ranges of `samples` that contain speech."""
+    frame = sample_rate * frame_ms // 1000
+    energy = frame_energy(samples, frame)
+    n = len(energy)
+    if n == 0:
+        return [(0, len(samples))] if len(samples) else []
+    floor = np.percentile(energy, 10)
+    if np.percentile(energy, 90) - floor < threshold_db:
+        # No clear silence to cut (wall-to-wall talking, or all noise).
+        return [(0, len(samples))]
+    active = np.r_[0, (energy > floor + threshold_db).astype(np.int8), 0]
+    edges = np.flatnonzero(np.diff(active))
+    pad = int(padding * 1000 / frame_ms)
+    gap = int(min_silence * 1000 / frame_ms)
+    segments = []
+    for start, end in zip(edges[0::2] - pad, edges[1::2] + pad):
+        start, end = max(start, 0), min(end, n)
+        if segments and start - segments[-1][1] < gap:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+    return [(int(start) * frame, len(samples) if end == n else int(end) * frame) for start, end in segments]
+
+@dataclass
+class PreparedAudio:
+    path: str
+    original_path: str
+    segments: list  # (trimmed start, original start, duration) in seconds
+    original_seconds: float
+    seconds: float
+
+    def original_time(self, t):
+        """Map a timestamp in the trimmed audio back to the original recording."""
+        i = max(bisect.bisect_right([s[0] for s in self.segments], t) - 1, 0)
+        trimmed, original, duration = self.segments[i]
+        return original + min(t - trimmed, duration)
+
+def preprocess_audio(path, out_dir=None, **vad):
+    """Trim silence from `path` and re-encode it for upload. `vad` is passed to `speech_segments`.
+
+    Without an `out_dir` the file goes to a new temporary folder; delete it once uploaded.
+    """
+    with tracer.span("decode"):
+        samples = decode_audio(path)
+    ranges = speech_segments(samples, **vad) or [(0, len(samples))]
+    segments = []
+    kept = 0
+    for start, end in ranges:
+        segments.append((kept / SAMPLE_RATE, start / SAMPLE_RATE, (end - start) / SAMPLE_RATE))
+        kept += end - start
+    out_dir = Path(out_dir or tempfile.mkdtemp(prefix="stsoaps_audio_"))
+    with tracer.span("encode"):
+        out = encode_audio(np.concatenate([samples[start:end] for start, end in ranges]), out_dir / (Path(path).stem + ".webm"))
+    tracer.set(original_seconds=len(samples) / SAMPLE_RATE, seconds=kept / SAMPLE_RATE)
+    return PreparedAudio(str(out), str(path), segments, len(samples) / SAMPLE_RATE, kept / SAMPLE_RATE)
+
+async def atranscribe_source_cached(path, variant, transcribe):
+    """Transcript of `path` cached on the source audio and `variant`, or `await transcribe(out_dir)` on a miss.
+
+    `out_dir` is a temporary folder private to this call, deleted afterwards, so
+    recordings with the same name never share files and no audio is left behind.
+    """
+    audio = await asyncio.to_thread(Path(path).read_bytes)
+    key = transcription_key(audio, f"{config.WHISPER_MODEL}+{variant}", config.WHISPER_PROMPT)
+    text = transcription_cache.get(key)
+    if text is None:
+        with tempfile.TemporaryDirectory(prefix="stsoaps_audio_") as out_dir:
+            text = await transcribe(Path(out_dir))
+        transcription_cache.put(key, text)
+    return text
+
+async def atranscribe_preprocessed(path, timestamps=False):
+    """Drop-in for `atranscribe` in `run_batch(transcribe=...)` that uploads the trimmed audio instead.
+
+    With `timestamps`, returns Whisper's segments as [start, end, text] lists, with
+    the times mapped back to the original recording through `PreparedAudio.segments`.
+    """
+
+    async def transcribe(out_dir):
+        with tracer.span("preprocess"):
+            prepared = await asyncio.to_thread(preprocess_audio, path, out_dir)
+        if not timestamps:
+            return await atranscribe(prepared.path, seconds=prepared.seconds)
+        segments = await atranscribe(prepared.path, seconds=prepared.seconds, timestamps=True)
+        return json.dumps([[prepared.original_time(start), prepared.original_time(end), text] for start, end, text in segments])
+
+    text = await atranscribe_source_cached(path, "trim+segments" if timestamps else "trim", transcribe)
+    return json.loads(text) if timestamps else text
+
+def split_points(samples, chunk_seconds=300, search_seconds=30, sample_rate=SAMPLE_RATE, frame_ms=30):
+    """Sample offsets to cut `samples` at, about every `chunk_seconds`, at the quietest nearby point."""
+    frame = sample_rate * frame_ms // 1000
+    # Smooth over ~0.3 s so a cut lands in a real pause, not the gap inside a word.
+    energy = np.convolve(frame_energy(samples, frame), np.ones(10) / 10, "same")
+    per_chunk = int(chunk_seconds * 1000 / frame_ms)
+    search = min(int(search_seconds * 1000 / frame_ms), per_chunk - 1)
+    cuts = []
+    start = 0
+    while len(energy) - start > per_chunk:
+        window = start + per_chunk - search
+        start = window + int(np.argmin(energy[window:start + per_chunk]))
+        cuts.append(start * frame)
+    return cuts
+
+def normalize_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+def stitch(previous, text, max_words=40, min_match=2):
+    """Append `text` to `previous`, dropping its leading words that repeat the end of `previous`."""
+    words = text.split()
+    tail = [normalize_word(w) for w in previous.split()[-max_words:]]
+    head = [normalize_word(w) for w in words[:max_words]]
+    # The chunk may start mid-word, so the match can begin a word or two in.
+    for skip in range(3):
+        for k in range(min(len(tail), len(head) - skip), min_match - 1, -1):
+            if tail[-k:] == head[skip:skip + k]:
+                words = words[skip + k:]
+                return " ".join(filter(None, [previous, " ".join(words)]))
+    return " ".join(filter(None, [previous, text]))
+
+def prompt_after(text, words=40):
+    """Glossary prompt plus the last `words` words of `text`, well under Whisper's 224-token prompt limit."""
+    return config.WHISPER_PROMPT + ". " + " ".join(text.split()[-words:])
+
+async def atranscribe_chunked(path, chunk_seconds=300, overlap=2.0, concurrency=8):
+    """Drop-in for `atranscribe` in `run_batch(transcribe=...)` that splits long recordings into parallel chunks."""
+
+    async def transcribe(out_dir):
+        samples = await asyncio.to_thread(decode_audio, path)
+        cuts = split_points(samples, chunk_seconds)
+        if not cuts:
+            if Path(path).stat().st_size <= WHISPER_MAX_BYTES:
+                return await atranscribe(path, seconds=len(samples) / SAMPLE_RATE)
+            # Short but too big to upload (e.g. a WAV): one chunk, re-encoded like the others.
+            # At 24 kbit/s Opus, 25 MB is over two hours of audio.
+            single = await asyncio.to_thread(encode_audio, samples, out_dir / "000.webm")
+            return await atranscribe(single, seconds=len(samples) / SAMPLE_RATE)
+        pad = int(overlap * SAMPLE_RATE)
+        chunks = [samples[max(start - pad, 0):end + pad] for start, end in zip([0] + cuts, cuts + [len(samples)])]
+        paths = await asyncio.gather(*[asyncio.to_thread(encode_audio, chunk, out_dir / f"{i:03d}.webm") for i, chunk in enumerate(chunks)])
+        limit = asyncio.Semaphore(concurrency)
+
+        async def transcribe_chunk(i):
+            # NOTE: every chunk gets the same glossary prompt. Prompting with
+            # the previous chunk's text would make each chunk's cache key depend
+            # on which chunks happened to finish first; the overlap already
+            # carries the context across each cut.
+            async with limit:
+                return await atranscribe(paths[i], seconds=len(chunks[i]) / SAMPLE_RATE)
+
+        transcript = ""
+        for text in await asyncio.gather(*[transcribe_chunk(i) for i in range(len(paths))]):
+            transcript = stitch(transcript, text)
+        return transcript
+
+    return await atranscribe_source_cached(path, f"chunked:{chunk_seconds}:{overlap}", transcribe)
+
+async def atranscribe_long(path):
+    """Trim silence first, then chunk what's left."""
+
+    async def transcribe(out_dir):
+        prepared = await asyncio.to_thread(preprocess_audio, path, out_dir)
+        return await atranscribe_chunked(prepared.path)
+
+    return await atranscribe_source_cached(path, "trim+chunked", transcribe)
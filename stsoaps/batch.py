@@ -0,0 +1,278 @@
+"""Batch transcription and SOAP generation.
+
+Nearly all of the time is spent waiting on OpenAI, so an asyncio pipeline with a
+bounded number of appointments in flight overlaps that waiting across
+recordings. A token bucket per endpoint keeps us under the account's rate limits
+(see https://platform.openai.com/docs/guides/rate-limits), and each recording
+gets its own result record so one bad file doesn't take down the batch.
+"""
+
+import asyncio
+import contextvars
+import csv
+import hashlib
+import json
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from . import clients, config
+from .cache import acached_completion, transcription_cache, transcription_key
+from .prompts import SOAP_SYSTEM_MESSAGE
+from .schema import functions
+from .tracing import tracer
+from .transport import LatencyTracker, hedged
+from .validation import validate_note
+
+AUDIO_EXTENSIONS = {".flac", ".m4a", ".mp3", ".mp4", ".mpeg", ".mpga", ".oga", ".ogg", ".wav", ".webm"}
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens refill per second, up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.loop = None
+        self.loop_lock = None
+
+    @property
+    def lock(self):
+        # An asyncio.Lock only works on one event loop (on 3.9, the one that was
+        # current when it was created), and the buckets are shared by every
+        # `asyncio.run` in the process: make a fresh lock for each new loop.
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.loop_lock = loop, asyncio.Lock()
+        return self.loop_lock
+
+    async def acquire(self, amount=1):
+        # NOTE: requests bigger than the bucket would never be admitted, so cap
+        # them at a full bucket (the API will still accept them, just rarely).
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+def per_minute(limit):
+    return TokenBucket(rate=limit / 60, capacity=limit)
+
+# NOTE: the limits come from STSOAPS_WHISPER_RPM / STSOAPS_CHAT_RPM /
+# STSOAPS_CHAT_TPM (see `stsoaps.config`).
+whisper_requests = per_minute(config.WHISPER_RPM)
+chat_requests = per_minute(config.CHAT_RPM)
+chat_tokens = per_minute(config.CHAT_TPM)
+
+# Rough token estimate for the chat TPM bucket (~4 characters per token) plus
+# the function schema and an allowance for the generated note.
+SOAP_PROMPT_TOKEN_OVERHEAD = 1_500
+SOAP_COMPLETION_TOKEN_ESTIMATE = 1_000
+
+def estimate_tokens(text):
+    return len(text) // 4 + SOAP_PROMPT_TOKEN_OVERHEAD + SOAP_COMPLETION_TOKEN_ESTIMATE
+
+def load_recordings(source):
+    """List (path, metadata) for the recordings in a directory or a manifest.
+
+    A manifest is either a .txt file with one path per line or a .csv with a
+    `path` column; any other .csv columns (species, patient, clinic,
+    visit_date, ...) become that recording's metadata.
+    """
+    source = Path(source)
+    if source.is_dir():
+        return [(p, {}) for p in sorted(source.iterdir()) if p.suffix.lower() in AUDIO_EXTENSIONS]
+    if source.suffix.lower() == ".csv":
+        with open(source, newline="") as f:
+            rows = [(row.pop("path"), row) for row in csv.DictReader(f)]
+    else:
+        rows = [(line.strip(), {}) for line in source.read_text().splitlines()]
+    # Relative paths in a manifest are relative to the manifest itself.
+    return [(source.parent / p, metadata) for p, metadata in rows if p and not p.startswith("#")]
+
+def note_id(path):
+    """Id for a recording's note: its file name plus a hash of its full path, so recordings that share a name don't collide."""
+    path = Path(path)
+    return f"{path.stem}-{hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:8]}"
+
+@dataclass
+class RecordingResult:
+    path: str
+    metadata: dict = None
+    transcript: str = None
+    soap_note: dict = None
+    validation_errors: list = None
+    error: str = None
+    seconds: float = 0.0
+    cost_usd: float = 0.0
+
+def audio_seconds(path):
+    """Length of a recording in seconds: the container's duration, or the decoded length if it has none (e.g. WebM from a browser)."""
+    try:
+        probe = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+            capture_output=True, text=True, check=True,
+        )
+        return float(probe.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pcm = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", str(path), "-f", "s16le", "-ac", "1", "-ar", "16000", "-"],
+            capture_output=True, check=True,
+        ).stdout
+        return len(pcm) / 32_000
+
+async def atranscribe(path, prompt=config.WHISPER_PROMPT, seconds=None, timestamps=False):
+    """Transcript text for `path`. Whisper bills by the minute, so `seconds` (the audio length) is measured if not given.
+
+    With `timestamps`, returns Whisper's segments instead, as [start, end, text] lists.
+    """
+    with tracer.span("transcribe", model=config.WHISPER_MODEL):
+        audio = await asyncio.to_thread(Path(path).read_bytes)
+        tracer.set(audio_bytes=len(audio))
+        key = transcription_key(audio, config.WHISPER_MODEL + ("+segments" if timestamps else ""), prompt)
+        cached = transcription_cache.get(key)
+        if cached is not None:
+            return json.loads(cached) if timestamps else cached
+        with tracer.span("rate_limit"):
+            await whisper_requests.acquire()
+        with tracer.span("whisper"):
+            transcript = await clients.async_openai_client().audio.transcriptions.create(
+                file=(Path(path).name, audio), model=config.WHISPER_MODEL, prompt=prompt,
+                **({"response_format": "verbose_json"} if timestamps else {}),
+            )
+        if seconds is None:
+            try:
+                seconds = await asyncio.to_thread(audio_seconds, path)
+            except (OSError, subprocess.CalledProcessError) as e:
+                # Whisper took the file, so only the cost is lost; don't fail the transcript over it.
+                tracer.set(audio_seconds_error=f"{type(e).__name__}: {e}")
+        if seconds is not None:
+            tracer.record_audio(config.WHISPER_MODEL, seconds)
+        tracer.set(transcript_chars=len(transcript.text))
+        if not timestamps:
+            transcription_cache.put(key, transcript.text)
+            return transcript.text
+        segments = [[segment.start, segment.end, segment.text.strip()] for segment in transcript.segments or []]
+        transcription_cache.put(key, json.dumps(segments))
+        return segments
+
+async def traced_stream(stream, span):
+    # The chat span of a streamed call ends when the stream does, not when the request returns.
+    try:
+        async for chunk in stream:
+            yield chunk
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        tracer.end(span)
+
+async def throttled_completion(**kwargs):
+    with tracer.span("chat", model=kwargs["model"], stream=bool(kwargs.get("stream"))) as span:
+        with tracer.span("rate_limit"):
+            await chat_requests.acquire()
+            await chat_tokens.acquire(estimate_tokens(json.dumps(kwargs["messages"])))
+        response = await clients.async_openai_client().chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            # NOTE: streamed responses don't report usage.
+            span.deferred = True
+            return traced_stream(response, span)
+        tracer.record_usage(kwargs["model"], getattr(response, "usage", None))
+        return response
+
+async def agenerate_soap(transcript_text, create=throttled_completion, model=config.SOAP_MODEL):
+    response = await acached_completion(
+        create,
+        model=model,
+        messages=[
+            {"role": "system", "content": SOAP_SYSTEM_MESSAGE},
+            {"role": "user", "content": "Generate SOAP notes for the following patient interaction:\n\n" + transcript_text},
+        ],
+        functions=functions,
+        temperature=0,
+    )
+    return json.loads(response.choices[0].message.function_call.arguments)
+
+# The `RecordingResult` being processed, for `generate` hooks that need the
+# recording's metadata (e.g. the patient, see `stsoaps.inpatient`).
+current_recording = contextvars.ContextVar("current_recording", default=None)
+
+async def process_recording(path, metadata, limit, transcribe, generate, clean):
+    result = RecordingResult(path=str(path), metadata=metadata)
+    current_recording.set(result)
+    start = time.perf_counter()
+    async with limit:
+        with tracer.span("appointment", path=str(path)) as span:
+            try:
+                result.transcript = await transcribe(path)
+                if clean is not None:
+                    with tracer.span("clean"):
+                        result.transcript = clean(result.transcript)
+                with tracer.span("generate"):
+                    note = await generate(result.transcript)
+                with tracer.span("validate"):
+                    result.soap_note, result.validation_errors = validate_note(note)
+                    tracer.set(validation_errors=len(result.validation_errors))
+            except Exception as e:
+                # NOTE: keep going on failure. The error is reported with the rest of
+                # the results and the file can be re-run on its own later.
+                result.error = f"{type(e).__name__}: {e}"
+                span.error = result.error
+            result.cost_usd = span.attributes.get("cost_usd", 0.0)
+    result.seconds = time.perf_counter() - start
+    return result
+
+async def run_batch(source, concurrency=8, transcribe=atranscribe, generate=agenerate_soap, clean=None):
+    """Transcribe and SOAP every recording in `source` with at most `concurrency` appointments in flight.
+
+    `generate` turns a transcript into a SOAP note dict (see `stsoaps.sections`
+    and `stsoaps.vitals` for other modes). `clean`, if given, post-processes each
+    transcript first (`stsoaps.vocabulary`). `transcribe` turns a recording path
+    into transcript text (see `stsoaps.audio`).
+    """
+    recordings = load_recordings(source)
+    limit = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    results = []
+    for done in asyncio.as_completed([process_recording(p, metadata, limit, transcribe, generate, clean) for p, metadata in recordings]):
+        result = await done
+        results.append(result)
+        status = "FAILED " + result.error if result.error else "ok"
+        print(f"[{len(results)}/{len(recordings)}] {Path(result.path).name} ({result.seconds:.1f}s) {status}")
+    failed = sum(r.error is not None for r in results)
+    print(f"{len(results) - failed} succeeded, {failed} failed in {time.perf_counter() - start:.1f}s")
+    return sorted(results, key=lambda r: r.path)
+
+def write_results(results, out_dir):
+    """Write one JSON file per recording, named by `note_id`, plus a summary.csv of every outcome."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for r in results:
+        if r.error is None:
+            (out_dir / (note_id(r.path) + ".json")).write_text(
+                json.dumps({
+                    "path": r.path,
+                    "metadata": r.metadata,
+                    "transcript": r.transcript,
+                    "soap_note": r.soap_note,
+                    "validation_errors": [{"path": e.path, "message": e.message} for e in r.validation_errors],
+                    "cost_usd": r.cost_usd,
+                }, indent=2)
+            )
+    with open(out_dir / "summary.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "status", "seconds", "cost_usd", "validation_errors", "error"])
+        for r in results:
+            writer.writerow([r.path, "failed" if r.error else "ok", f"{r.seconds:.2f}", f"{r.cost_usd:.4f}", len(r.validation_errors or []), r.error or ""])
+
+soap_latency = LatencyTracker()
+
+async def hedged_completion(**kwargs):
+    return await hedged(lambda: throttled_completion(**kwargs), soap_latency)
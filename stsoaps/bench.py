@@ -0,0 +1,252 @@
+"""Benchmarks: search quality and latency, quantization, embedding throughput and the end-to-end pipeline.
+
+Everything runs on synthetic notes (`stsoaps.synthetic`), and the API stages of
+`benchmark_pipeline` run against a local `MockOpenAI` with generated audio, so
+none of this needs an OpenAI key or real recordings.
+"""
+
+import asyncio
+import contextlib
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import models
+
+from . import clients
+from .audio import SAMPLE_RATE, encode_audio
+from .batch import agenerate_soap, atranscribe, chat_requests, chat_tokens, process_recording, whisper_requests
+from .cache import bypass_caches
+from .hybrid import dense_ranking, hybrid_ranking, lexical_ranking
+from .index import batched, cached_embeddings, ensure_collection, ensure_sections_collection, index_sections, search_sections, section_points
+from .parallel import EmbeddingWorkers
+from .streaming import astream_soap
+from .stub import MockOpenAI
+from .synthetic import JARGON, synthetic_notes
+from .validation import validate_note
+
+def benchmark_search(n_notes=2000, k=10, repeats=5):
+    """recall@k and p50/p95 latency for vector-only, BM25-only and hybrid search over synthetic notes."""
+    qdrant = clients.qdrant_client()
+    collection = "bench_sections"
+    if qdrant.collection_exists(collection):
+        qdrant.delete_collection(collection)
+    index_sections(synthetic_notes(n_notes), collection=collection)
+    relevant = defaultdict(set)
+    for point, text, _ in section_points(synthetic_notes(n_notes)):
+        for term in JARGON:
+            if term.lower() in text.lower():
+                relevant[term].add(point)
+    methods = {
+        "vector": lambda q: dense_ranking(q, k, collection),
+        "bm25": lambda q: lexical_ranking(q, k, collection),
+        "hybrid": lambda q: [doc_id for doc_id, _ in hybrid_ranking(q, k, 50, collection)],
+    }
+    for name, run in methods.items():
+        latencies, recalls = [], []
+        for _ in range(repeats):
+            for term in JARGON:
+                start = time.perf_counter()
+                hits = run(term)
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(set(hits) & relevant[term]) / max(1, min(k, len(relevant[term]))))
+        latencies.sort()
+        p50, p95 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+        print(f"{name:>6}: recall@{k} {sum(recalls) / len(recalls):.3f}  p50 {p50 * 1000:.1f} ms  p95 {p95 * 1000:.1f} ms")
+
+def ram_per_million(quantization, dim=None, m=16):
+    """Approximate resident bytes per million points: the in-RAM vectors plus ~2*m 4-byte HNSW links each."""
+    dim = dim or clients.embedding_dim()
+    vector_bytes = {None: dim * 4, "scalar": dim, "binary": dim // 8}[quantization]
+    return 1_000_000 * (vector_bytes + 2 * m * 4)
+
+def wait_until_indexed(collection, timeout=600):
+    # Searches against a collection that is still optimizing fall back to brute force.
+    deadline = time.monotonic() + timeout
+    while clients.qdrant_client().get_collection(collection).status != models.CollectionStatus.GREEN and time.monotonic() < deadline:
+        time.sleep(1)
+
+def benchmark_quantization(n_notes=20_000, n_queries=200, k=10):
+    """Estimated RAM per million notes, p50/p99 latency and recall@k against exact float32 search, per quantization mode.
+
+    The RAM figure comes from `ram_per_million`, not a measurement: the server
+    doesn't report memory per collection.
+
+    NOTE: qdrant's local mode accepts the quantization config but does brute
+    force search over float32 anyway, so run this against a Qdrant server
+    (QDRANT_URL).
+    """
+    qdrant = clients.qdrant_client()
+    points = list(section_points(synthetic_notes(n_notes)))
+    sections_per_note = len(points) / n_notes
+    ids = [point for point, _, _ in points]
+    vectors = [vector.tolist() for vector in cached_embeddings([text for _, text, _ in points])]
+    sample = random.Random(1).sample([text for _, text, _ in points], n_queries)
+    queries = [vector.tolist() for vector in clients.embedder().query_embed(sample)]
+
+    for mode in [None, "scalar", "binary"]:
+        collection = f"bench_{mode or 'float32'}"
+        if qdrant.collection_exists(collection):
+            qdrant.delete_collection(collection)
+        ensure_collection(collection, quantization=mode)
+        for batch in batched(range(len(ids)), 1024):
+            qdrant.upsert(collection, points=models.Batch(ids=[ids[i] for i in batch], vectors=[vectors[i] for i in batch]))
+        wait_until_indexed(collection)
+
+    exact = [
+        {str(hit.id) for hit in qdrant.query_points("bench_float32", query=query, limit=k, search_params=models.SearchParams(exact=True)).points}
+        for query in queries
+    ]
+    runs = [
+        ("float32", None, None),
+        ("int8", "scalar", False),
+        ("int8 + rescore", "scalar", True),
+        ("binary", "binary", False),
+        ("binary + rescore", "binary", True),
+    ]
+    for label, mode, rescore in runs:
+        params = None if rescore is None else models.SearchParams(quantization=models.QuantizationSearchParams(rescore=rescore, oversampling=2.0))
+        latencies, recalls = [], []
+        for query, truth in zip(queries, exact):
+            start = time.perf_counter()
+            hits = qdrant.query_points(f"bench_{mode or 'float32'}", query=query, limit=k, search_params=params).points
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len({str(hit.id) for hit in hits} & truth) / k)
+        latencies.sort()
+        ram = ram_per_million(mode) * sections_per_note / 1024**2
+        print(
+            f"{label:>16}: ~{ram:,.0f} MB RAM / 1M notes (estimated)  "
+            f"p50 {latencies[len(latencies) // 2] * 1000:.2f} ms  p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms  "
+            f"recall@{k} {sum(recalls) / len(recalls):.3f}"
+        )
+
+def benchmark_embedding(n_notes=5_000, batch_size=256):
+    """Notes/sec for the single-process embedder and for 1, 2, 4, ... worker processes (embedding only, no upserts)."""
+    texts = [text for _, text, _ in section_points(synthetic_notes(n_notes))]
+    start = time.perf_counter()
+    for _ in clients.embedder().embed(texts, batch_size=batch_size):
+        pass
+    print(f"single process: {n_notes / (time.perf_counter() - start):.0f} notes/s")
+    counts = sorted({1, 2, 4, 8, os.cpu_count()} & set(range(1, os.cpu_count() + 1)))
+    for workers in counts:
+        with EmbeddingWorkers(workers, batch_size=batch_size) as pool:
+            start = time.perf_counter()
+            for _ in pool.embed((None, batch) for batch in batched(texts, batch_size)):
+                pass
+            elapsed = time.perf_counter() - start
+        print(f"{workers:>2} workers x {max(1, os.cpu_count() // workers)} threads: {n_notes / elapsed:.0f} notes/s")
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux but in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+async def run_stage(name, items, call, concurrency, report):
+    """Run `call` over `items` with up to `concurrency` in flight, and add a row to `report`."""
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(item):
+        async with limit:
+            start = time.perf_counter()
+            result = await call(item)
+            latencies.append(time.perf_counter() - start)
+            return result
+
+    rss = peak_rss_mb()
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one(item) for item in items])
+    seconds = time.perf_counter() - start
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    row = {
+        "stage": name, "calls": len(items), "per_second": len(items) / seconds,
+        "p50_ms": q[49] * 1000, "p95_ms": q[94] * 1000, "p99_ms": q[98] * 1000,
+        "peak_rss_mb": peak_rss_mb(), "rss_growth_mb": peak_rss_mb() - rss,
+    }
+    report.append(row)
+    print(f"{name:>12}: {row['per_second']:8.1f}/s  p50 {row['p50_ms']:8.1f}ms  p95 {row['p95_ms']:8.1f}ms  "
+          f"p99 {row['p99_ms']:8.1f}ms  peak RSS {row['peak_rss_mb']:.0f} MB (+{row['rss_growth_mb']:.0f})")
+    return results
+
+def synthetic_recording(path, seconds=20, seed=0):
+    """An encoded recording of `seconds` of speech-like noise bursts with short pauses, like `encode_audio` would upload."""
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * SAMPLE_RATE), np.float32)
+    for start in range(0, len(samples), 2 * SAMPLE_RATE):
+        burst = rng.standard_normal(int(1.5 * SAMPLE_RATE)).astype(np.float32)
+        samples[start:start + len(burst)] = (0.2 * burst * np.hanning(len(burst)))[:len(samples) - start]
+    return encode_audio(samples, path)
+
+@contextlib.contextmanager
+def unthrottled(*buckets):
+    # The mock has no rate limits: leave the limiter on the path, but let every request straight through.
+    saved = [(bucket.rate, bucket.capacity, bucket.tokens) for bucket in buckets]
+    for bucket in buckets:
+        bucket.rate = bucket.capacity = bucket.tokens = 1e12
+    try:
+        yield
+    finally:
+        for bucket, (rate, capacity, tokens) in zip(buckets, saved):
+            bucket.rate, bucket.capacity, bucket.tokens = rate, capacity, tokens
+
+async def benchmark_pipeline(n=200, concurrency=32, scale=0.05, batch_size=64, queries=200, collection="bench_pipeline", rate_limits=False, **mock):
+    """End-to-end timings for `n` synthetic visits against a local `MockOpenAI`. Extra keyword arguments go to the mock.
+
+    The API stages run the pipeline's own `atranscribe`, `agenerate_soap`,
+    `astream_soap` and `process_recording` on encoded recordings, inside
+    `bypass_caches()` so every call reaches the mock. The rate limiters stay on
+    the path but let everything through, unless `rate_limits` is set to keep
+    the account's limits from `stsoaps.config`.
+    """
+    qdrant = clients.qdrant_client()
+    embedder = clients.embedder()
+    report = []
+    if qdrant.collection_exists(collection):
+        qdrant.delete_collection(collection)
+    ensure_sections_collection(collection)
+    buckets = [] if rate_limits else [whisper_requests, chat_requests, chat_tokens]
+    with tempfile.TemporaryDirectory(prefix="stsoaps_bench_") as folder, bypass_caches(), unthrottled(*buckets):
+        clip = synthetic_recording(Path(folder) / "visit.webm")
+        recordings = [shutil.copyfile(clip, Path(folder) / f"visit{i:04d}.webm") for i in range(n)]
+        with MockOpenAI(scale=scale, n_notes=n, **mock) as server, clients.using_openai(server.url, "mock"):
+
+            async def soap_stream(text):
+                async for path, value in astream_soap(text):
+                    if not path:
+                        return value
+
+            async def validate(note):
+                return validate_note(note)
+
+            async def appointment(path):
+                result = await process_recording(path, {}, asyncio.Semaphore(1), atranscribe, agenerate_soap, None)
+                if result.error:
+                    raise RuntimeError(f"{path.name}: {result.error}")
+                return result
+
+            async def embed_and_upsert(batch):
+                ids, texts, payloads = zip(*batch)
+                vectors = [vector.tolist() for vector in embedder.embed(list(texts), batch_size=batch_size)]
+                qdrant.upsert(collection, points=models.Batch(ids=list(ids), vectors=vectors, payloads=list(payloads)))
+
+            async def search_one(query):
+                return search_sections(query, k=10, collection=collection)
+
+            transcripts = await run_stage("transcribe", recordings, atranscribe, concurrency, report)
+            notes = await run_stage("soap", transcripts, agenerate_soap, concurrency, report)
+            await run_stage("soap_stream", transcripts, soap_stream, concurrency, report)
+            await run_stage("appointment", recordings, appointment, concurrency, report)
+            checked = await run_stage("validate", notes, validate, 1, report)
+            records = [(f"bench-{i}", note, metadata) for i, ((note, _), (_, _, metadata)) in enumerate(zip(checked, synthetic_notes(n)))]
+            await run_stage("embed+index", list(batched(section_points(records), batch_size)), embed_and_upsert, 1, report)
+            rng = random.Random(0)
+            await run_stage("search", [rng.choice(JARGON) for _ in range(queries)], search_one, 1, report)
+    return report
@@ -0,0 +1,241 @@
+"""Disk caches for transcripts, chat completions and embeddings.
+
+Transcripts are keyed on a hash of the audio bytes plus the model and prompt,
+so the same recording is only ever uploaded once per (model, prompt).
+Deterministic (`temperature=0`) completions are keyed on a canonical hash of
+the request and expire after a TTL so a model update eventually shows up. All
+of them share one SQLite file with a size cap per table; when a table fills up
+the least recently used entries are dropped first, in batches, until it is back
+down to `LOW_WATER` of the cap.
+
+Inside `bypass_caches()` every cache misses and stores nothing, e.g. to time the
+real pipeline without measuring cache hits.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from . import config
+from .tracing import tracer
+
+# Eviction frees space down to this fraction of `max_bytes`, so a full cache
+# evicts once every few thousand puts rather than on every put.
+LOW_WATER = 0.9
+EVICT_BATCH = 1000
+
+cache_bypass = contextvars.ContextVar("cache_bypass", default=False)
+
+@contextlib.contextmanager
+def bypass_caches():
+    """Make every cache miss and store nothing for the duration of the block (and the tasks and threads started in it)."""
+    token = cache_bypass.set(True)
+    try:
+        yield
+    finally:
+        cache_bypass.reset(token)
+
+class SQLiteCache:
+    """Key -> text cache in a SQLite table, evicting least recently used entries beyond `max_bytes`.
+
+    Entries older than `ttl` seconds (if given) are treated as misses. The
+    database is opened on first use, so defining a cache costs nothing. One
+    connection is shared by every thread, one call at a time.
+    """
+
+    def __init__(self, path, table, max_bytes, ttl=None):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.connection = None
+        # Reentrant: put_many holds it around its puts.
+        self.lock = threading.RLock()
+
+    @property
+    def db(self):
+        if self.connection is None:
+            with self.lock:
+                if self.connection is None:
+                    self.connection = self.connect()
+        return self.connection
+
+    def connect(self):
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # NOTE: check_same_thread=False so the cache can be used from
+        # asyncio.to_thread workers as well as the main thread; `lock`
+        # serializes them.
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        # It's a cache: losing the last few writes on a crash is fine, an fsync
+        # per write is not.
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)")
+        db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_used ON {self.table} (last_used)")
+        self.size, self.unchecked = self.stored_size(db), 0
+        return db
+
+    def stored_size(self, db):
+        return db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def get(self, key):
+        if cache_bypass.get():
+            return None
+        with self.lock:
+            row = self.db.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self.delete(key)
+                row = None
+            tracer.cache_lookup(self.table, row is not None, row is None)
+            if row is None:
+                return None
+            self.db.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def get_many(self, keys):
+        """`get` for a list of keys in one round trip. Returns values (or None) in the same order."""
+        if cache_bypass.get():
+            return [None] * len(keys)
+        with self.lock:
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.db.execute(f"SELECT key, value, created FROM {self.table} WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((key, (value, created)) for key, value, created in rows)
+            now = time.time()
+            if self.ttl is not None:
+                for key in [key for key, (_, created) in found.items() if now - created > self.ttl]:
+                    self.delete(key)
+                    del found[key]
+            self.db.execute("BEGIN")
+            with self.db:
+                self.db.executemany(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        hits = sum(key in found for key in keys)
+        tracer.cache_lookup(self.table, hits, len(keys) - hits)
+        return [found[key][0] if key in found else None for key in keys]
+
+    def put(self, key, value):
+        # Values are text or bytes (e.g. packed embeddings).
+        if cache_bypass.get():
+            return
+        size = len(value) if isinstance(value, bytes) else len(value.encode())
+        with self.lock:
+            old = self.db.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            self.db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+            self.size += size - (old[0] if old else 0)
+            self.unchecked += size
+            # `size` only counts this process's writes, and other processes may
+            # share the file: recount the table before evicting, and after every
+            # (1 - LOW_WATER) of the cap written, so their writes can't push it
+            # past the cap unnoticed.
+            if self.size > self.max_bytes or self.unchecked > self.max_bytes * (1 - LOW_WATER):
+                self.size, self.unchecked = self.stored_size(self.db), 0
+                if self.size > self.max_bytes:
+                    self.evict()
+
+    def put_many(self, items):
+        """`put` for an iterable of (key, value) pairs in a single transaction."""
+        if cache_bypass.get():
+            return
+        with self.lock:
+            self.db.execute("BEGIN")
+            with self.db:
+                for key, value in items:
+                    self.put(key, value)
+
+    def delete(self, key):
+        # NOTE: no DELETE ... RETURNING, which needs SQLite 3.35+.
+        with self.lock:
+            row = self.db.execute(f"SELECT size FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.size -= row[0]
+
+    def evict(self):
+        # Drop the least recently used entries, at most EVICT_BATCH per query
+        # (read off the last_used index), until we are down to the low-water mark.
+        target = self.max_bytes * LOW_WATER
+        while self.size > target:
+            rows = self.db.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used LIMIT ?", (EVICT_BATCH,)).fetchall()
+            if not rows:
+                self.size = 0
+                return
+            keys = []
+            for key, size in rows:
+                if self.size <= target:
+                    break
+                keys.append(key)
+                self.size -= size
+            self.db.execute(f"DELETE FROM {self.table} WHERE key IN ({','.join('?' * len(keys))})", keys)
+
+def transcription_key(audio, model, prompt):
+    return hashlib.sha256(json.dumps([hashlib.sha256(audio).hexdigest(), model, prompt]).encode()).hexdigest()
+
+transcription_cache = SQLiteCache(config.CACHE_PATH, "transcripts", max_bytes=512 * 1024**2)
+completion_cache = SQLiteCache(config.CACHE_PATH, "completions", max_bytes=256 * 1024**2, ttl=30 * 24 * 3600)
+# NOTE: a 384-d float32 BGE-small vector is 1.5 KB, so this holds ~2.7M
+# sections. Size it to the archive.
+embedding_cache = SQLiteCache(config.CACHE_PATH, "embeddings", max_bytes=4 * 1024**3)
+
+def cached_transcription(create, path, bypass=False, **kwargs):
+    """`client.audio.transcriptions.create` for the recording at `path`, answered from the cache when possible."""
+    from openai.types.audio import Transcription
+
+    audio = Path(path).read_bytes()
+    with tracer.span("transcribe", model=kwargs["model"], audio_bytes=len(audio)):
+        key = transcription_key(audio, kwargs["model"], kwargs.get("prompt", ""))
+        text = None if bypass else transcription_cache.get(key)
+        if text is None:
+            with tracer.span("whisper"):
+                text = create(file=(Path(path).name, audio), **kwargs).text
+            transcription_cache.put(key, text)
+        tracer.set(transcript_chars=len(text))
+    return Transcription(text=text)
+
+def completion_key(kwargs):
+    # Canonical JSON (sorted keys, no whitespace) so that equivalent requests
+    # hash the same regardless of how the dicts were built.
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def cacheable(kwargs):
+    # Only deterministic, non-streaming requests are safe to replay.
+    return kwargs.get("temperature") == 0 and not kwargs.get("stream")
+
+def cached_completion(create, bypass=False, **kwargs):
+    """Memoized `client.chat.completions.create`."""
+    from openai.types.chat import ChatCompletion
+
+    with tracer.span("chat", model=kwargs["model"]):
+        if bypass or not cacheable(kwargs):
+            response = create(**kwargs)
+            tracer.record_usage(kwargs["model"], getattr(response, "usage", None))
+            return response
+        key = completion_key(kwargs)
+        cached = completion_cache.get(key)
+        if cached is not None:
+            return ChatCompletion.model_validate_json(cached)
+        response = create(**kwargs)
+        tracer.record_usage(kwargs["model"], response.usage)
+        completion_cache.put(key, response.model_dump_json())
+        return response
+
+async def acached_completion(create, bypass=False, **kwargs):
+    """Async version of `cached_completion` for AsyncOpenAI."""
+    from openai.types.chat import ChatCompletion
+
+    if bypass or not cacheable(kwargs):
+        return await create(**kwargs)
+    key = completion_key(kwargs)
+    cached = completion_cache.get(key)
+    if cached is not None:
+        return ChatCompletion.model_validate_json(cached)
+    response = await create(**kwargs)
+    completion_cache.put(key, response.model_dump_json())
+    return response
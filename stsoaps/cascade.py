@@ -0,0 +1,74 @@
+"""Model cascade: the fast model first, GPT-4 only when its note doesn't check out.
+
+`agenerate_soap_cascade` asks `FAST_SOAP_MODEL` for the note and runs it
+through the schema validator plus a few completeness checks:
+
+- no validation errors,
+- `subjective` and `plan` filled in and at least one assessment item,
+- every vital the transcript states unambiguously (`extract_vitals`) is
+  present in `objective`. A vital the transcript never mentions may still be
+  null; that is what the function calling instructions ask for.
+
+A note that passes is returned as is. Anything else, including a response
+without a usable function call, is regenerated with `SOAP_MODEL`. The path each
+transcript took is counted in `cascade_paths` (and the
+`stsoaps_cascade_total` metric), and the failed checks in
+`escalation_reasons`.
+"""
+
+import json
+from collections import Counter
+
+from . import config
+from .batch import agenerate_soap, throttled_completion
+from .tracing import tracer
+from .validation import validate_note
+from .vitals import extract_vitals
+
+cascade_paths = Counter()
+escalation_reasons = Counter()
+
+def completeness_problems(note, transcript_text):
+    """Reasons `note` shouldn't be trusted, as short strings. Empty if it passes."""
+    note, errors = validate_note(note)
+    problems = [f"schema: {'/'.join(map(str, e.path))} {e.message}" for e in errors]
+    if not isinstance(note, dict):
+        return problems or ["schema: note is not an object"]
+    for section in ("subjective", "plan"):
+        if not note.get(section):
+            problems.append(f"empty {section}")
+    if not any(note.get("assessment") or []):
+        problems.append("no assessment items")
+    objective = note.get("objective") if isinstance(note.get("objective"), dict) else {}
+    for field in extract_vitals(transcript_text):
+        if objective.get(field) is None:
+            problems.append(f"missing stated vital {field}")
+    return problems
+
+async def agenerate_soap_cascade(transcript_text, create=throttled_completion):
+    """Drop-in for `agenerate_soap` in `run_batch(generate=...)` that only uses `SOAP_MODEL` when the fast model's note fails the checks."""
+    with tracer.span("cascade", model=config.FAST_SOAP_MODEL) as span:
+        try:
+            note = await agenerate_soap(transcript_text, create=create, model=config.FAST_SOAP_MODEL)
+            problems = completeness_problems(note, transcript_text)
+        except (AttributeError, TypeError, json.JSONDecodeError) as e:
+            # The fast model answered in prose instead of calling the function.
+            problems = [f"unparseable: {type(e).__name__}"]
+        path = "escalated" if problems else "fast"
+        cascade_paths[path] += 1
+        tracer.metrics.inc("stsoaps_cascade_total", path=path)
+        span.attributes.update(path=path, problems=len(problems))
+        if not problems:
+            return note
+        for problem in problems:
+            # Schema errors are counted together; the other reasons name their field.
+            escalation_reasons[problem.split(":")[0]] += 1
+        return await agenerate_soap(transcript_text, create=create)
+
+def cascade_summary():
+    """Share of transcripts that finished on each path, and the most common reasons for escalating."""
+    total = sum(cascade_paths.values()) or 1
+    return {
+        "paths": {path: count / total for path, count in cascade_paths.items()},
+        "escalation_reasons": dict(escalation_reasons.most_common()),
+    }
@@ -0,0 +1,201 @@
+"""`stsoaps` command line: transcribe, soap, live, index and search.
+
+    stsoaps transcribe visit.m4a [--trim] [--chunked] [--lexicon DIR]
+    stsoaps soap RECORDINGS --out NOTES [--mode full|sections|prefilled|hedged|cascade|inpatient] [--archive]
+    stsoaps live (RECORDING | --socket PATH) [--window SECONDS] [--lexicon DIR]
+    stsoaps index NOTES [--prune | --workers N]
+    stsoaps search "R/O pancreatitis" --section assessment --since 2024-01-01
+
+Configuration and secrets come from the environment (see `stsoaps.config`).
+Each subcommand imports only the modules it uses, so a short-lived worker running
+`stsoaps soap` never loads Qdrant, fastembed or ONNX.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import sys
+from pathlib import Path
+
+from . import __version__, config
+
+def transcriber(args):
+    """The `run_batch(transcribe=...)` hook for --trim / --chunked."""
+    if args.trim or args.chunked:
+        from . import audio
+
+        if args.trim and args.chunked:
+            return audio.atranscribe_long
+        return audio.atranscribe_preprocessed if args.trim else audio.atranscribe_chunked
+    from .batch import atranscribe
+
+    return atranscribe
+
+def cleaner(args):
+    """The `run_batch(clean=...)` hook: vocabulary correction when there is a lexicon."""
+    lexicon = args.lexicon or config.LEXICON_DIR
+    if not lexicon:
+        return None
+    from .vocabulary import lexicon_corrector
+
+    return lexicon_corrector(lexicon).correct
+
+def generator(mode):
+    if mode == "sections":
+        from .sections import agenerate_soap_sections
+
+        return agenerate_soap_sections
+    if mode == "prefilled":
+        from .vitals import agenerate_soap_prefilled
+
+        return agenerate_soap_prefilled
+    if mode == "cascade":
+        from .cascade import agenerate_soap_cascade
+
+        return agenerate_soap_cascade
+    if mode == "inpatient":
+        from .inpatient import agenerate_soap_inpatient
+
+        return agenerate_soap_inpatient
+    from .batch import agenerate_soap, hedged_completion
+
+    return functools.partial(agenerate_soap, create=hedged_completion) if mode == "hedged" else agenerate_soap
+
+def transcribe(args):
+    from .batch import AUDIO_EXTENSIONS, load_recordings
+
+    paths = []
+    for path in map(Path, args.paths):
+        paths += [path] if path.suffix.lower() in AUDIO_EXTENSIONS else [p for p, _ in load_recordings(path)]
+    transcribe, clean = transcriber(args), cleaner(args)
+
+    async def run():
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def one(path):
+            async with limit:
+                text = await transcribe(path)
+            return clean(text) if clean else text
+
+        return await asyncio.gather(*[one(path) for path in paths])
+
+    for path, text in zip(paths, asyncio.run(run())):
+        print(json.dumps({"path": str(path), "transcript": text}) if args.json else text)
+    return 0
+
+def soap(args):
+    from .batch import note_id, run_batch, write_results
+
+    results = asyncio.run(run_batch(
+        args.source, concurrency=args.concurrency, transcribe=transcriber(args), generate=generator(args.mode), clean=cleaner(args),
+    ))
+    write_results(results, args.out)
+    if args.archive:
+        from .archive import archive_notes
+
+        archive_notes((note_id(r.path), r.soap_note, r.metadata) for r in results if r.error is None)
+    return 1 if any(r.error for r in results) else 0
+
+def live(args):
+    from .live import follow_file, live_scribe, socket_frames
+
+    frames = socket_frames(args.socket) if args.socket else follow_file(args.recording, idle_seconds=args.idle)
+
+    def show(section, draft):
+        print(f"draft: {section} updated", file=sys.stderr)
+
+    note = asyncio.run(live_scribe(frames, window_seconds=args.window, clean=cleaner(args), on_update=show))
+    print(json.dumps(note, indent=2))
+    return 0
+
+def index(args):
+    from .index import SECTIONS_COLLECTION, iter_notes, sync_sections
+
+    notes = iter_notes(args.source)
+    collection = args.collection or SECTIONS_COLLECTION
+    if args.workers:
+        from .parallel import index_sections_parallel
+
+        index_sections_parallel(notes, collection=collection, workers=args.workers, batch_size=args.batch_size)
+    else:
+        sync_sections(notes, collection=collection, batch_size=args.batch_size, prune=args.prune)
+    return 0
+
+def search(args):
+    from .hybrid import search as hybrid_search
+    from .index import SECTIONS_COLLECTION
+
+    hits = hybrid_search(
+        args.query, k=args.k, collection=args.collection or SECTIONS_COLLECTION,
+        section=args.section, species=args.species, patient=args.patient, clinic=args.clinic, since=args.since, until=args.until,
+    )
+    for score, payload in hits:
+        if args.json:
+            print(json.dumps({"score": score, **payload}))
+        else:
+            print(f"{score:.4f} {payload['note_id']} [{payload['section']}] {payload['text'][:80]}")
+    return 0
+
+def parser():
+    parser = argparse.ArgumentParser(prog="stsoaps", description="Speech -> Text -> SOAP -> Search.")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    audio = argparse.ArgumentParser(add_help=False)
+    audio.add_argument("--trim", action="store_true", help="trim silence before upload")
+    audio.add_argument("--chunked", action="store_true", help="transcribe long recordings as parallel chunks")
+    audio.add_argument("--lexicon", help="folder of lexicon .txt files for vocabulary correction (default: $STSOAPS_LEXICON_DIR)")
+    audio.add_argument("--concurrency", type=int, default=8, help="recordings in flight at once")
+
+    command = commands.add_parser("transcribe", parents=[audio], help="transcribe recordings and print the text")
+    command.add_argument("paths", nargs="+", help="audio files, folders of recordings or manifests")
+    command.add_argument("--json", action="store_true", help="one JSON object per recording")
+    command.set_defaults(run=transcribe)
+
+    command = commands.add_parser("soap", parents=[audio], help="transcribe and write a SOAP note for every recording")
+    command.add_argument("source", help="folder of recordings, or a .txt / .csv manifest")
+    command.add_argument("--out", required=True, help="folder for the notes and summary.csv")
+    command.add_argument("--mode", choices=["full", "sections", "prefilled", "hedged", "cascade", "inpatient"], default="full", help="how each note is generated")
+    command.add_argument("--archive", action="store_true", help="also append the notes to the columnar archive ($STSOAPS_ARCHIVE_DIR)")
+    command.set_defaults(run=soap)
+
+    command = commands.add_parser("live", help="scribe a visit while it is being recorded and print the final note")
+    source = command.add_mutually_exclusive_group(required=True)
+    source.add_argument("recording", nargs="?", help="recording that is still being written (WAV, WebM, MP3 or ADTS AAC)")
+    source.add_argument("--socket", help="Unix socket to receive raw 16 kHz mono s16le PCM on")
+    command.add_argument("--idle", type=float, default=10, help="seconds without new audio that end the visit (recording only)")
+    command.add_argument("--window", type=float, default=30, help="seconds of audio per transcription window")
+    command.add_argument("--lexicon", help="folder of lexicon .txt files for vocabulary correction (default: $STSOAPS_LEXICON_DIR)")
+    command.set_defaults(run=live)
+
+    command = commands.add_parser("index", help="embed note sections into Qdrant")
+    command.add_argument("source", help="folder of notes written by `soap`, or a .jsonl archive")
+    command.add_argument("--collection", help="Qdrant collection (default: soap_sections)")
+    command.add_argument("--batch-size", type=int, default=256)
+    command.add_argument("--prune", action="store_true", help="also delete the sections of notes that aren't in NOTES (scans the whole collection)")
+    command.add_argument("--workers", type=int, help="re-embed everything with this many processes instead of syncing changes")
+    command.set_defaults(run=index)
+
+    command = commands.add_parser("search", help="hybrid vector + BM25 search of note sections")
+    command.add_argument("query")
+    command.add_argument("-k", type=int, default=10, help="number of hits")
+    command.add_argument("--collection", help="Qdrant collection (default: soap_sections)")
+    command.add_argument("--section", choices=["subjective", "objective", "assessment", "plan"])
+    for name in ["species", "patient", "clinic"]:
+        command.add_argument(f"--{name}")
+    command.add_argument("--since", help="earliest visit date (ISO 8601)")
+    command.add_argument("--until", help="latest visit date (ISO 8601)")
+    command.add_argument("--json", action="store_true", help="one JSON object per hit")
+    command.set_defaults(run=search)
+    return parser
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    try:
+        return args.run(args)
+    finally:
+        if config.TRACE_DIR and "stsoaps.tracing" in sys.modules:
+            from .tracing import export
+
+            export(config.TRACE_DIR)
@@ -0,0 +1,72 @@
+"""Shared OpenAI, Qdrant and embedding model clients, each created on first use.
+
+Nothing here is imported or loaded until something asks for it: `stsoaps soap`
+never touches `qdrant_client` or fastembed, and importing the package doesn't
+open any connections.
+"""
+
+import contextlib
+import functools
+
+from . import config
+
+# (sync, async) OpenAI clients, see `openai_pair`.
+active = None
+
+def openai_pair():
+    """The shared (OpenAI, AsyncOpenAI) pair on the pooled, retrying transport."""
+    global active
+    if active is None:
+        from .transport import openai_clients
+
+        active = openai_clients()
+    return active
+
+def openai_client():
+    return openai_pair()[0]
+
+def async_openai_client():
+    return openai_pair()[1]
+
+@contextlib.contextmanager
+def using_openai(base_url, api_key, **retry):
+    """Send every OpenAI call to `base_url` (e.g. a `StubServer`) for the duration of the block."""
+    global active
+    from .transport import openai_clients
+
+    saved = active
+    active = openai_clients(base_url=base_url, api_key=api_key, **retry)
+    try:
+        yield active
+    finally:
+        active = saved
+
+@functools.cache
+def qdrant_client():
+    """Qdrant server at QDRANT_URL, else local mode at QDRANT_PATH (":memory:" for a throwaway instance)."""
+    from qdrant_client import QdrantClient
+
+    if config.QDRANT_URL:
+        return QdrantClient(url=config.QDRANT_URL, api_key=config.QDRANT_API_KEY)
+    if config.QDRANT_PATH == ":memory:":
+        return QdrantClient(":memory:")
+    return QdrantClient(path=config.QDRANT_PATH)
+
+@functools.cache
+def embedder():
+    # fastembed pulls in onnxruntime and loads the model weights: by far the
+    # slowest thing to start, so only the indexing and search paths call this.
+    from fastembed import TextEmbedding
+
+    return TextEmbedding(config.EMBEDDING_MODEL)
+
+@functools.cache
+def embedding_dim():
+    """Vector size of EMBEDDING_MODEL, from fastembed's model list so the model isn't loaded just to ask."""
+    from fastembed import TextEmbedding
+
+    for info in TextEmbedding.list_supported_models():
+        info = info if isinstance(info, dict) else vars(info)
+        if info.get("model") == config.EMBEDDING_MODEL:
+            return info["dim"]
+    return len(next(iter(embedder().embed(["probe"]))))
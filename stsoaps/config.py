@@ -0,0 +1,49 @@
+"""Settings, read from the environment when the package is first imported.
+
+The OpenAI SDK reads `OPENAI_API_KEY` (and `OPENAI_BASE_URL`) itself. In Colab,
+copy the notebook secrets into `os.environ` before importing anything from
+`stsoaps`.
+"""
+
+import os
+from pathlib import Path
+
+def env(name, default=None, cast=str):
+    value = os.environ.get(name)
+    return default if value in (None, "") else cast(value)
+
+DATA_DIR = Path(env("STSOAPS_DATA_DIR", Path.home() / ".local" / "share" / "stsoaps", Path))
+
+# Transcripts, completions and embeddings (see `stsoaps.cache`).
+CACHE_PATH = env("STSOAPS_CACHE_PATH", str(DATA_DIR / "cache.sqlite"))
+# Each hospitalized patient's latest structured note (see `stsoaps.inpatient`).
+INPATIENT_PATH = env("STSOAPS_INPATIENT_PATH", str(DATA_DIR / "inpatient.sqlite"))
+# Columnar archive of every generated note (see `stsoaps.archive`).
+ARCHIVE_DIR = env("STSOAPS_ARCHIVE_DIR", str(DATA_DIR / "archive"))
+# Spans and metrics are only exported when this is set (see `stsoaps.tracing`).
+TRACE_DIR = env("STSOAPS_TRACE_DIR")
+
+# NOTE: QDRANT_URL wins over QDRANT_PATH. The default local path keeps the
+# collections between `stsoaps index` and `stsoaps search` runs; set
+# QDRANT_PATH=":memory:" for a throwaway in-memory instance.
+QDRANT_URL = env("QDRANT_URL")
+QDRANT_API_KEY = env("QDRANT_API_KEY")
+QDRANT_PATH = env("QDRANT_PATH", str(DATA_DIR / "qdrant"))
+
+WHISPER_MODEL = env("STSOAPS_WHISPER_MODEL", "whisper-1")
+WHISPER_PROMPT = env("STSOAPS_WHISPER_PROMPT", "Hobin, lymph nodes, distemper, lepto")
+SOAP_MODEL = env("STSOAPS_SOAP_MODEL", "gpt-4-1106-preview")
+# First try for `--mode cascade`; notes that fail the checks go to SOAP_MODEL.
+FAST_SOAP_MODEL = env("STSOAPS_FAST_SOAP_MODEL", "gpt-3.5-turbo-1106")
+EMBEDDING_MODEL = env("STSOAPS_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+
+# NOTE: these are the tier 1 limits at the time of writing. Bump them to match
+# the limits page of the account you are running under.
+WHISPER_RPM = env("STSOAPS_WHISPER_RPM", 50, int)
+CHAT_RPM = env("STSOAPS_CHAT_RPM", 500, int)
+CHAT_TPM = env("STSOAPS_CHAT_TPM", 150_000, int)
+
+# Folder of lexicon .txt files for transcript vocabulary correction.
+LEXICON_DIR = env("STSOAPS_LEXICON_DIR")
+# General English word list: words in it are never "corrected" to a lexicon term.
+DICTIONARY_PATH = env("STSOAPS_DICTIONARY", "/usr/share/dict/words")
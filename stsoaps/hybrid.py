@@ -0,0 +1,57 @@
+"""Hybrid vector + BM25 search.
+
+Rare words like "lepto", "distemper" and "Hobin" are exactly what dense
+embeddings handle badly, so next to the fastembed vector every section point in
+Qdrant also has a BM25 sparse vector (see `stsoaps.index.sparse_vector`).
+`search(query, k)` runs the vector search and the BM25 search in parallel and
+merges the two rankings with reciprocal rank fusion
+(https://plg.uwaterloo.ca/~gvcormac/cormacksigir09-rrf.pdf).
+
+Both sides live in the collection, so they are written by the same upserts,
+persist with it, and apply payload filters inside Qdrant before ranking.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import clients
+from .index import SECTIONS_COLLECTION, SPARSE_VECTOR, search_sections, section_filter, sparse_query
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+search_pool = ThreadPoolExecutor(max_workers=2)
+
+def dense_ranking(query, k, collection, **filters):
+    return [str(hit.id) for hit in search_sections(query, k=k, collection=collection, **filters)]
+
+def lexical_ranking(query, k, collection, **filters):
+    """Point ids of the top `k` sections by BM25, restricted by the `search_sections` filters."""
+    query_vector = sparse_query(query)
+    if not query_vector.indices:
+        return []
+    hits = clients.qdrant_client().query_points(
+        collection, query=query_vector, using=SPARSE_VECTOR, query_filter=section_filter(**filters), limit=k, with_payload=False,
+    ).points
+    return [str(hit.id) for hit in hits]
+
+def hybrid_ranking(query, k, candidates, collection, **filters):
+    # Vector and BM25 rankings of `candidates` each, run in parallel and fused with RRF.
+    dense = search_pool.submit(dense_ranking, query, candidates, collection, **filters)
+    lexical = search_pool.submit(lexical_ranking, query, candidates, collection, **filters)
+    return reciprocal_rank_fusion([dense.result(), lexical.result()])[:k]
+
+def search(query, k=10, candidates=50, collection=SECTIONS_COLLECTION, **filters):
+    """Hybrid vector + BM25 search. Returns (score, payload) for the top `k` sections.
+
+    `filters` are the `search_sections` ones (`section`, `species`, `patient`,
+    `clinic`, `since`, `until`) and apply to both sides.
+    """
+    fused = hybrid_ranking(query, k, candidates, collection, **filters)
+    payloads = {str(point.id): point.payload for point in clients.qdrant_client().retrieve(collection, ids=[doc_id for doc_id, _ in fused])}
+    return [(score, payloads[doc_id]) for doc_id, score in fused if doc_id in payloads]
@@ -0,0 +1,313 @@
+"""Indexing SOAP notes into Qdrant, and section-level search.
+
+Every note is split into sections (the subjective, the objective findings, each
+assessment item on its own, and the plan), and each section is embedded with
+fastembed's BGE model and upserted as its own point. Each point carries the
+section name plus the species, patient, clinic and visit date of its note as
+indexed payload, so `search_sections` can narrow the candidates with a filter
+before any vectors are scored. Next to the dense vector, each section point has
+a BM25 sparse vector (`SPARSE_VECTOR`) for the lexical side of
+`stsoaps.hybrid`.
+
+Notes are streamed through in fixed-size batches, so memory stays flat no matter
+how big the archive is. `sync_sections` only embeds and upserts the sections
+whose text or payload changed since the last run, and vectors are cached by
+content hash.
+"""
+
+import hashlib
+import itertools
+import json
+import re
+import time
+from collections import Counter
+import uuid
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import models
+
+from . import clients, config
+from .cache import embedding_cache
+from .schema import note_text
+from .tracing import tracer
+
+NOTES_COLLECTION = "soap_notes"
+
+def iter_notes(source):
+    """Yield (note_id, note, metadata) from a folder of batch results (`stsoaps.batch.write_results`) or a .jsonl archive of {"id", "soap_note", "metadata"} records."""
+    source = Path(source)
+    if source.is_dir():
+        for path in sorted(source.glob("*.json")):
+            record = json.loads(path.read_text())
+            yield path.stem, record["soap_note"], record.get("metadata") or {}
+        return
+    with open(source) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield str(record["id"]), record["soap_note"], record.get("metadata") or {}
+
+def content_hash(text, model=config.EMBEDDING_MODEL):
+    # What a point's vector depends on: the text and the model that embedded it.
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+def point_id(note_id):
+    # Qdrant ids must be integers or UUIDs; a name-based UUID keeps re-runs idempotent.
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, note_id))
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+def quantization_config(quantization):
+    # Quantized vectors are kept in RAM; the float32 originals go to disk and
+    # are only read for rescoring. See `stsoaps.bench.benchmark_quantization`.
+    if quantization == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def ensure_collection(name, size=None, quantization=None):
+    """Create `name` if it doesn't exist. `quantization` is None (float32 in RAM), "scalar" (int8) or "binary".
+
+    `size` defaults to the embedding model's dimension.
+    """
+    qdrant = clients.qdrant_client()
+    if not qdrant.collection_exists(name):
+        qdrant.create_collection(
+            name,
+            vectors_config=models.VectorParams(size=size or clients.embedding_dim(), distance=models.Distance.COSINE, on_disk=quantization is not None),
+            quantization_config=quantization_config(quantization),
+        )
+
+def index_notes(notes, collection=NOTES_COLLECTION, batch_size=256):
+    """Embed and upsert (note_id, note, metadata) records `batch_size` at a time. Only one batch is held in memory."""
+    ensure_collection(collection)
+    start = time.perf_counter()
+    total = 0
+    for batch in batched(notes, batch_size):
+        ids = [note_id for note_id, _, _ in batch]
+        texts = [note_text(note) for _, note, _ in batch]
+        vectors = [vector.tolist() for vector in clients.embedder().embed(texts, batch_size=batch_size)]
+        clients.qdrant_client().upsert(
+            collection,
+            points=models.Batch(
+                ids=[point_id(note_id) for note_id in ids],
+                vectors=vectors,
+                payloads=[{"note_id": note_id, "text": text} for note_id, text in zip(ids, texts)],
+            ),
+            wait=False,
+        )
+        total += len(batch)
+        if total // batch_size % 100 == 0:
+            print(f"{total} notes, {total / (time.perf_counter() - start):.0f} notes/s")
+    print(f"indexed {total} notes in {time.perf_counter() - start:.1f}s")
+    return total
+
+SECTIONS_COLLECTION = "soap_sections"
+PAYLOAD_FIELDS = {
+    "section": models.PayloadSchemaType.KEYWORD,
+    "species": models.PayloadSchemaType.KEYWORD,
+    "patient": models.PayloadSchemaType.KEYWORD,
+    "clinic": models.PayloadSchemaType.KEYWORD,
+    "visit_date": models.PayloadSchemaType.DATETIME,
+}
+
+def section_chunks(note):
+    """(section, item, text) for each searchable piece of a note. `item` numbers the assessment items."""
+    if note.get("subjective"):
+        yield "subjective", 0, note["subjective"]
+    objective = note_text({"objective": note.get("objective")})
+    if objective:
+        yield "objective", 0, objective
+    assessments = note.get("assessment") or []
+    # A lone string is one assessment, as in `stsoaps.validation`.
+    for i, assessment in enumerate([assessments] if isinstance(assessments, str) else assessments):
+        if assessment:
+            yield "assessment", i, assessment
+    if note.get("plan"):
+        yield "plan", 0, note["plan"]
+
+# None, "scalar" or "binary" (see `quantization_config`). Only applies when the
+# collection is first created.
+SECTIONS_QUANTIZATION = None
+
+# BM25 as Qdrant sparse vectors: each section stores the saturated,
+# length-normalized frequency of its terms, and Qdrant multiplies in each
+# term's IDF over the whole collection at query time (`Modifier.IDF`). The
+# length norm uses a fixed average section length, as fastembed's Bm25 does,
+# so a point's vector doesn't change whenever other points are added.
+SPARSE_VECTOR = "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_AVERAGE_LENGTH = 20
+TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+def term_id(term):
+    # Stable across processes, unlike hash().
+    return int.from_bytes(hashlib.blake2b(term.encode(), digest_size=4).digest(), "little")
+
+def sparse_vector(text):
+    """The BM25 document vector of `text`."""
+    terms = tokenize(text)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / BM25_AVERAGE_LENGTH)
+    weights = {}
+    for term, tf in Counter(terms).items():
+        # NOTE: two terms hashing to the same id share a weight; at 32 bits that's rare enough not to matter.
+        key = term_id(term)
+        weights[key] = weights.get(key, 0) + tf * (BM25_K1 + 1) / (tf + norm)
+    return models.SparseVector(indices=list(weights), values=list(weights.values()))
+
+def sparse_query(text):
+    """The BM25 query vector of `text`: each distinct term once."""
+    ids = sorted({term_id(term) for term in tokenize(text)})
+    return models.SparseVector(indices=ids, values=[1.0] * len(ids))
+
+def section_vectors(texts, vectors):
+    """The named vectors of a batch of section points, for `models.Batch`."""
+    return {"": vectors, SPARSE_VECTOR: [sparse_vector(text) for text in texts]}
+
+def ensure_sections_collection(name=SECTIONS_COLLECTION, quantization=SECTIONS_QUANTIZATION):
+    qdrant = clients.qdrant_client()
+    if qdrant.collection_exists(name):
+        if SPARSE_VECTOR not in (qdrant.get_collection(name).config.params.sparse_vectors or {}):
+            # Qdrant can't add a vector to an existing collection.
+            raise ValueError(
+                f"collection {name!r} predates the BM25 sparse vectors: delete it and run `stsoaps index` again "
+                "(the embeddings come from the cache)"
+            )
+        return
+    qdrant.create_collection(
+        name,
+        vectors_config=models.VectorParams(size=clients.embedding_dim(), distance=models.Distance.COSINE, on_disk=quantization is not None),
+        sparse_vectors_config={SPARSE_VECTOR: models.SparseVectorParams(modifier=models.Modifier.IDF)},
+        quantization_config=quantization_config(quantization),
+    )
+    for field, schema in PAYLOAD_FIELDS.items():
+        clients.qdrant_client().create_payload_index(name, field_name=field, field_schema=schema)
+    # `sync_sections` looks up the existing points of each batch of notes by id.
+    clients.qdrant_client().create_payload_index(name, field_name="note_id", field_schema=models.PayloadSchemaType.KEYWORD)
+
+def point_hash(payload):
+    # What a point depends on: its text (and so its vector) plus the rest of
+    # its payload, so edited metadata gets re-upserted too.
+    return content_hash(json.dumps(payload, sort_keys=True, default=str))
+
+def section_points(notes):
+    for note_id, note, metadata in notes:
+        for section, item, text in section_chunks(note):
+            payload = {key: metadata[key] for key in PAYLOAD_FIELDS if metadata.get(key)}
+            payload.update(note_id=note_id, section=section, item=item, text=text)
+            payload["hash"] = point_hash(payload)
+            yield point_id(f"{note_id}/{section}/{item}"), text, payload
+
+def index_sections(notes, collection=SECTIONS_COLLECTION, batch_size=256):
+    """Embed and upsert one point per section of each (note_id, note, metadata) record, `batch_size` points at a time."""
+    ensure_sections_collection(collection)
+    start = time.perf_counter()
+    total = 0
+    for batch in batched(section_points(notes), batch_size):
+        ids, texts, payloads = zip(*batch)
+        with tracer.span("embed", texts=len(texts)):
+            vectors = [vector.tolist() for vector in clients.embedder().embed(list(texts), batch_size=batch_size)]
+        with tracer.span("upsert", points=len(ids)):
+            clients.qdrant_client().upsert(collection, points=models.Batch(ids=list(ids), vectors=section_vectors(texts, vectors), payloads=list(payloads)), wait=False)
+        total += len(batch)
+    print(f"indexed {total} sections in {time.perf_counter() - start:.1f}s")
+    return total
+
+def section_filter(section=None, species=None, patient=None, clinic=None, since=None, until=None):
+    must = [
+        models.FieldCondition(key=key, match=models.MatchValue(value=value))
+        for key, value in [("section", section), ("species", species), ("patient", patient), ("clinic", clinic)]
+        if value is not None
+    ]
+    if since is not None or until is not None:
+        must.append(models.FieldCondition(key="visit_date", range=models.DatetimeRange(gte=since, lte=until)))
+    return models.Filter(must=must) if must else None
+
+def search_sections(query, k=10, collection=SECTIONS_COLLECTION, rescore=True, oversampling=2.0, **filters):
+    """Top `k` section hits for `query`, restricted by `section`, `species`, `patient`, `clinic`, `since` and `until`.
+
+    `rescore` and `oversampling` only matter for quantized collections (see `quantization_config`).
+    """
+    return clients.qdrant_client().query_points(
+        collection,
+        query=next(iter(clients.embedder().query_embed(query))).tolist(),
+        query_filter=section_filter(**filters),
+        search_params=models.SearchParams(quantization=models.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)),
+        limit=k,
+    ).points
+
+def cached_embeddings(texts, batch_size=256):
+    """Embeddings for `texts`, only running fastembed on the ones not in the embedding cache."""
+    keys = [content_hash(text) for text in texts]
+    vectors = [None if blob is None else np.frombuffer(blob, dtype=np.float32) for blob in embedding_cache.get_many(keys)]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        with tracer.span("embed", texts=len(missing)):
+            fresh = [vector.astype(np.float32) for vector in clients.embedder().embed([texts[i] for i in missing], batch_size=batch_size)]
+        embedding_cache.put_many((keys[i], vector.tobytes()) for i, vector in zip(missing, fresh))
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    return vectors
+
+def indexed_points(collection, note_ids=None, fields=("hash",)):
+    """(point id, payload `fields`) for the points of `note_ids`, or for every point in `collection` if None."""
+    scroll_filter = None
+    if note_ids is not None:
+        scroll_filter = models.Filter(must=[models.FieldCondition(key="note_id", match=models.MatchAny(any=list(note_ids)))])
+    offset = None
+    while True:
+        points, offset = clients.qdrant_client().scroll(
+            collection, scroll_filter=scroll_filter, limit=10_000, offset=offset, with_payload=list(fields), with_vectors=False,
+        )
+        for point in points:
+            yield str(point.id), point.payload or {}
+        if offset is None:
+            return
+
+def sync_sections(notes, collection=SECTIONS_COLLECTION, batch_size=256, prune=False):
+    """Make `collection` match `notes`, `batch_size` notes at a time: upsert new or changed sections and delete the notes' sections that no longer exist.
+
+    Only the notes passed in are touched, so syncing one day's folder leaves the
+    other days alone. With `prune`, points of notes that aren't in `notes` at
+    all are deleted afterwards, which scans the whole collection.
+    """
+    ensure_sections_collection(collection)
+    start = time.perf_counter()
+    seen = set()
+    upserted = deleted = unchanged = 0
+    for records in batched(notes, batch_size):
+        note_ids = [note_id for note_id, _, _ in records]
+        seen.update(note_ids)
+        existing = {point: payload.get("hash") for point, payload in indexed_points(collection, note_ids)}
+        changed = []
+        for point, text, payload in section_points(records):
+            # Popping as we go leaves only the notes' stale sections in `existing`.
+            if existing.pop(point, None) == payload["hash"]:
+                unchanged += 1
+            else:
+                changed.append((point, text, payload))
+        for batch in batched(changed, batch_size):
+            ids, texts, payloads = zip(*batch)
+            vectors = [vector.tolist() for vector in cached_embeddings(list(texts), batch_size)]
+            clients.qdrant_client().upsert(collection, points=models.Batch(ids=list(ids), vectors=section_vectors(texts, vectors), payloads=list(payloads)), wait=False)
+        upserted += len(changed)
+        if existing:
+            clients.qdrant_client().delete(collection, points_selector=models.PointIdsList(points=list(existing)), wait=False)
+            deleted += len(existing)
+    if prune:
+        # Collected first so the scroll never runs over points being deleted.
+        orphans = [point for point, payload in indexed_points(collection, fields=["note_id"]) if payload.get("note_id") not in seen]
+        for stale in batched(orphans, 10_000):
+            clients.qdrant_client().delete(collection, points_selector=models.PointIdsList(points=stale), wait=False)
+            deleted += len(stale)
+    print(f"{upserted} upserted, {deleted} deleted, {unchanged} unchanged in {time.perf_counter() - start:.1f}s")
+    return upserted, deleted
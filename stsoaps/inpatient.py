@@ -0,0 +1,232 @@
+"""Day-over-day SOAP updates for hospitalized patients.
+
+`agenerate_soap_inpatient` keeps each patient's latest note in a small SQLite
+store (`NoteStore`). On the first day of a stay it writes the full note as
+usual. On every later day it sends the model only the previous note and the
+new transcript and asks for a JSON patch (RFC 6902) of the fields that changed,
+which `apply_patch` applies locally. The prompt and the answer stay about the
+same size each day however long the stay gets.
+
+The patient and the day come from the recording's metadata (`patient` and
+`visit_date` columns of the manifest). Recordings without a patient are written
+from scratch and not stored. Vitals are never carried over: the previous day's
+values are cleared before the patch is applied, so today's note only has the
+ones measured today. A patch that doesn't apply or validate falls back to full
+generation, and `update_paths` counts which way each note went.
+
+NOTE: run each day's rounds as its own batch (or sort the manifest by date with
+`--concurrency 1`); two days of the same patient in one concurrent batch may
+not see each other.
+"""
+
+import asyncio
+import contextlib
+import copy
+import json
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date
+from pathlib import Path
+
+from . import config
+from .batch import agenerate_soap, current_recording, throttled_completion
+from .cache import acached_completion
+from .prompts import INPATIENT_SYSTEM_MESSAGE
+from .schema import VITALS
+from .tracing import tracer
+from .validation import SOAP_FIELD_CHECKS, validate_note
+
+update_paths = Counter()
+
+class NoteStore:
+    """(patient, day) -> note JSON in a SQLite table. Opened on first use, like `SQLiteCache`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+        self.lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self.connection is None:
+            with self.lock:
+                if self.connection is None:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    db.execute("PRAGMA journal_mode=WAL")
+                    db.execute("CREATE TABLE IF NOT EXISTS notes (patient TEXT NOT NULL, day TEXT NOT NULL, note TEXT NOT NULL, PRIMARY KEY (patient, day))")
+                    self.connection = db
+        return self.connection
+
+    def previous(self, patient, day):
+        """The patient's latest note from before `day`, as `(day, note)`, or None on the first day of a stay."""
+        row = self.db.execute("SELECT day, note FROM notes WHERE patient = ? AND day < ? ORDER BY day DESC LIMIT 1", (patient, day)).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def save(self, patient, day, note):
+        self.db.execute("INSERT OR REPLACE INTO notes VALUES (?, ?, ?)", (patient, day, json.dumps(note)))
+
+note_store = NoteStore(config.INPATIENT_PATH)
+
+PATCH_FUNCTION = {
+    "name": "update_SOAP_notes",
+    "description": "Updates the previous day's SOAP notes with a JSON patch of the fields that changed",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "patch": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "op": {"type": "string", "enum": ["add", "replace", "remove"]},
+                        "path": {"type": "string", "description": "JSON pointer to the field, e.g. /objective/temperature or /assessment/-"},
+                        "value": {"description": "The field's new value. Omitted for remove."},
+                    },
+                    "required": ["op", "path"],
+                },
+            },
+        },
+        "required": ["patch"],
+    },
+}
+
+class PatchError(ValueError):
+    pass
+
+def pointer_keys(pointer):
+    if not pointer.startswith("/"):
+        raise PatchError(f"{pointer!r} is not a JSON pointer")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+def apply_patch(note, patch):
+    """`note` with the add / replace / remove operations of `patch` applied. The original is left alone.
+
+    Only paths that exist in the SOAP schema are accepted. Removing an object
+    field sets it to null rather than dropping the key, so the note keeps its
+    shape; removing an assessment item deletes it from the list.
+    """
+    note = copy.deepcopy(note)
+    for operation in patch:
+        op = operation.get("op")
+        if op not in ("add", "replace", "remove"):
+            raise PatchError(f"unsupported operation {op!r}")
+        keys = pointer_keys(operation.get("path", ""))
+        if tuple("*" if key.isdigit() or key == "-" else key for key in keys) not in SOAP_FIELD_CHECKS:
+            raise PatchError(f"{operation['path']} is not a field of the note")
+        if op != "remove" and "value" not in operation:
+            raise PatchError(f"{op} {operation['path']} has no value")
+        parent = note
+        for key, child in zip(keys, keys[1:]):
+            # Missing (null) sections are created on the way down.
+            if not isinstance(parent.get(key), (dict, list)):
+                parent[key] = [] if child.isdigit() or child == "-" else {}
+            parent = parent[key]
+        key, value = keys[-1], operation.get("value")
+        if isinstance(parent, dict):
+            parent[key] = None if op == "remove" else value
+        elif key == "-" and op == "add":
+            parent.append(value)
+        elif key.isdigit() and int(key) < len(parent) + (op == "add"):
+            if op == "add":
+                parent.insert(int(key), value)
+            elif op == "replace":
+                parent[int(key)] = value
+            else:
+                del parent[int(key)]
+        else:
+            raise PatchError(f"{op} {operation['path']}: index out of range")
+    return note
+
+def without_vitals(note):
+    note = copy.deepcopy(note)
+    for path, _ in VITALS:
+        parent = note
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if isinstance(parent, dict) and path[-1] in parent:
+            parent[path[-1]] = None
+    return note
+
+async def agenerate_patch(previous_day, previous, transcript_text, create=throttled_completion):
+    response = await acached_completion(
+        create,
+        model=config.SOAP_MODEL,
+        messages=[
+            {"role": "system", "content": INPATIENT_SYSTEM_MESSAGE},
+            {"role": "user", "content": (
+                f"Previous SOAP notes ({previous_day}):\n\n" + json.dumps(previous, separators=(",", ":"))
+                + "\n\nToday's patient interaction:\n\n" + transcript_text
+            )},
+        ],
+        functions=[PATCH_FUNCTION],
+        function_call={"name": PATCH_FUNCTION["name"]},
+        temperature=0,
+    )
+    return json.loads(response.choices[0].message.function_call.arguments)["patch"]
+
+class PatientLocks:
+    """One lock per patient, so a patient's note is read and saved by one recording at a time.
+
+    As with `TokenBucket.lock`, the locks belong to the running event loop (each
+    `asyncio.run` starts afresh), and a patient's lock is dropped once nothing
+    holds or waits on it.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.locks = {}
+        self.waiting = Counter()
+
+    @contextlib.asynccontextmanager
+    async def hold(self, patient):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop, self.locks, self.waiting = loop, {}, Counter()
+        locks, waiting = self.locks, self.waiting
+        lock = locks.setdefault(patient, asyncio.Lock())
+        waiting[patient] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            waiting[patient] -= 1
+            if not waiting[patient]:
+                del waiting[patient], locks[patient]
+
+patient_locks = PatientLocks()
+
+async def agenerate_soap_inpatient(transcript_text, create=throttled_completion, store=None):
+    """Drop-in for `agenerate_soap` in `run_batch(generate=...)` that patches the patient's previous note instead of rewriting it."""
+    store = store or note_store
+    recording = current_recording.get()
+    metadata = (recording.metadata if recording else None) or {}
+    patient = metadata.get("patient")
+    if not patient:
+        update_paths["untracked"] += 1
+        return await agenerate_soap(transcript_text, create=create)
+    day = (metadata.get("visit_date") or "")[:10] or date.today().isoformat()
+    async with patient_locks.hold(patient):
+        with tracer.span("inpatient", patient=patient, day=day) as span:
+            found = store.previous(patient, day)
+            note = None
+            if found is not None:
+                previous_day, previous = found
+                try:
+                    patch = await agenerate_patch(previous_day, previous, transcript_text, create=create)
+                    note, errors = validate_note(apply_patch(without_vitals(previous), patch))
+                    if errors:
+                        raise PatchError(f"{len(errors)} validation errors, e.g. {'/'.join(map(str, errors[0].path))} {errors[0].message}")
+                    span.attributes.update(patch_ops=len(patch))
+                except (PatchError, KeyError, AttributeError, TypeError, json.JSONDecodeError) as e:
+                    span.attributes.update(patch_error=f"{type(e).__name__}: {e}")
+                    note = None
+            mode = "first_day" if found is None else "patched" if note is not None else "fallback"
+            if note is None:
+                note = await agenerate_soap(transcript_text, create=create)
+            update_paths[mode] += 1
+            tracer.metrics.inc("stsoaps_inpatient_total", mode=mode)
+            span.attributes.update(mode=mode)
+            store.save(patient, day, note)
+            return note
@@ -0,0 +1,235 @@
+"""Live scribing: transcribe the visit while it happens and keep a draft note.
+
+A `LiveSession` is fed audio frames as they arrive: from a recording that is
+still being written (`follow_file`) or raw PCM sent to a local socket
+(`socket_frames`). Once a window's worth of audio has buffered (`window_seconds`,
+cut at the quietest point near the end, like `atranscribe_chunked`), it is
+transcribed in the background with the transcript so far as the Whisper
+prompt and stitched on.
+
+Each new piece of transcript only re-runs the sections it touches
+(`affected_sections`: vitals and exam findings -> objective, rule-outs ->
+assessment, drugs and diagnostics -> plan, anything else -> subjective), using
+the per-section calls from `stsoaps.sections`. A section that is touched while
+its update is still in flight runs once more when that update finishes, never
+twice at the same time. When the visit ends, `finish` only has the last partial
+window and the sections it touches left to do, so the final note is ready
+within seconds instead of a full transcription and generation pass.
+
+A window that can't be transcribed (after `WINDOW_ATTEMPTS` tries) is skipped
+and noted in `skipped`, so one bad upload costs those seconds of audio, not the
+visit. At most `backlog` windows wait for transcription; beyond that `feed`
+waits, which pushes back on the frame source.
+"""
+
+import asyncio
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .audio import SAMPLE_RATE, encode_audio, prompt_after, split_points, stitch
+from .batch import atranscribe
+from .sections import SOAP_SECTIONS, agenerate_section
+from .tracing import tracer
+from .vitals import VITAL_PATTERNS
+
+# Words that mean a piece of the conversation belongs in a section.
+SECTION_CUES = {
+    "subjective": re.compile(r"\b(?:owner|at home|since|eating|appetite|drinking|vomit\w*|diarrh\w*|cough\w*|letharg\w*|energy|yesterday|last night|\w+ (?:days|weeks) ago|history)\b", re.IGNORECASE),
+    "objective": re.compile(r"\b(?:mucous|membranes?|hydrat\w*|murmur|lungs?|heart|auscult\w*|palpat\w*|lymph|abdom\w*|eyes?|ears?|teeth|dental|nose|throat|gait|reflex\w*|mentation|skin|coat|mass(?:es)?)\b", re.IGNORECASE),
+    "assessment": re.compile(r"(?:\bR/O\b|\brule[ds]? out\b|\bdifferential\w*|\bsuspect\w*|\bconsistent with\b|\blikely\b|\bdiagnos\w*|\bproblem\w*)", re.IGNORECASE),
+    "plan": re.compile(r"\b(?:plan|recommend\w*|start\w*|give|giving|prescri\w*|mg|dose|recheck|radiographs?|x-?rays?|bloodwork|CBC|chem\w*|urinalysis|fluids?|discharge|follow[- ]?up|come back)\b", re.IGNORECASE),
+}
+
+WINDOW_ATTEMPTS = 2
+
+def affected_sections(text):
+    """The SOAP sections a new piece of transcript could change."""
+    sections = {section for section, cue in SECTION_CUES.items() if cue.search(text)}
+    if any(pattern.search(text) for pattern in VITAL_PATTERNS.values()):
+        sections.add("objective")
+    return sections or {"subjective"}
+
+class LiveSession:
+    """Rolling-window transcription and an incrementally updated draft note for one visit.
+
+    `await feed(samples)` with float32 mono samples at `SAMPLE_RATE`, then
+    `await finish()` for the final note. `draft` always holds the latest version
+    of each section (None until first written), and `on_update(section, draft)`,
+    if given, is called after every section update. `skipped` lists the
+    (start seconds, seconds, error) of windows that couldn't be transcribed.
+    """
+
+    def __init__(self, window_seconds=30, overlap=2.0, clean=None, on_update=None, backlog=4):
+        self.window = int(window_seconds * SAMPLE_RATE)
+        self.pad = int(overlap * SAMPLE_RATE)
+        self.clean = clean
+        self.on_update = on_update
+        self.pending = np.zeros(0, np.float32)
+        self.tail = np.zeros(0, np.float32)
+        self.seconds = 0.0
+        self.transcript = ""
+        self.draft = dict.fromkeys(SOAP_SECTIONS)
+        self.updates = {}
+        self.dirty = set()
+        self.failed = set()
+        self.windows = asyncio.Queue(maxsize=backlog)
+        self.worker = None
+        self.window_count = 0
+        self.skipped = []
+        self.out_dir = Path(tempfile.mkdtemp(prefix="stsoaps_live_"))
+
+    async def feed(self, samples):
+        """Buffer `samples`, queueing a window for transcription whenever one fills up."""
+        if self.worker is None:
+            self.worker = asyncio.create_task(self.transcribe_windows())
+        self.pending = np.concatenate([self.pending, samples])
+        # NOTE: split_points only cuts once there's more than a whole window,
+        # and looks for the pause in the last few seconds of it.
+        cuts = split_points(self.pending, self.window / SAMPLE_RATE, search_seconds=5)
+        if cuts:
+            await self.queue_window(cuts[0])
+
+    async def queue_window(self, end):
+        # Each window starts with the end of the previous one; `stitch` drops the repeated words.
+        window = np.concatenate([self.tail, self.pending[:end]])
+        self.tail = self.pending[max(end - self.pad, 0):end]
+        self.pending = self.pending[end:]
+        await self.windows.put(window)
+
+    async def transcribe_window(self, samples, seconds):
+        with tracer.span("live_window", seconds=seconds, window=self.window_count):
+            path = await asyncio.to_thread(encode_audio, samples, self.out_dir / f"{self.window_count:04d}.webm")
+            text = await atranscribe(path, prompt=prompt_after(self.transcript), seconds=seconds)
+            return text if self.clean is None else self.clean(text)
+
+    async def transcribe_windows(self):
+        while (samples := await self.windows.get()) is not None:
+            seconds = len(samples) / SAMPLE_RATE
+            text = error = None
+            for _ in range(WINDOW_ATTEMPTS):
+                try:
+                    text = await self.transcribe_window(samples, seconds)
+                    break
+                except Exception as e:
+                    # Already on the live_window span and in stsoaps_span_errors_total.
+                    error = f"{type(e).__name__}: {e}"
+            if text is None:
+                # Lose these seconds of audio rather than the whole visit.
+                self.skipped.append((self.seconds, seconds, error))
+                tracer.metrics.inc("stsoaps_live_windows_skipped_total")
+                print(f"live: skipped {seconds:.0f}s of audio at {self.seconds:.0f}s ({error})", file=sys.stderr)
+            else:
+                self.transcript = stitch(self.transcript, text)
+                self.touch(affected_sections(text))
+            self.window_count += 1
+            self.seconds += seconds
+
+    def touch(self, sections):
+        for section in sections:
+            task = self.updates.get(section)
+            if task is None or task.done():
+                self.updates[section] = asyncio.create_task(self.update(section))
+            else:
+                self.dirty.add(section)
+
+    async def update(self, section):
+        """Regenerate `section` from the latest transcript, again if it was touched in the meantime."""
+        while True:
+            self.dirty.discard(section)
+            with tracer.span("live_section", section=section, transcript_chars=len(self.transcript)):
+                try:
+                    self.draft[section] = await agenerate_section(section, self.transcript)
+                    self.failed.discard(section)
+                except Exception:
+                    # Keep the previous draft; `finish` retries the section.
+                    self.failed.add(section)
+            if self.on_update is not None:
+                self.on_update(section, self.draft)
+            if section not in self.dirty:
+                return
+
+    async def finish(self):
+        """Transcribe the rest of the audio, bring every section up to date and return the final note."""
+        start = time.perf_counter()
+        with tracer.span("live_finish") as span:
+            if self.worker is None:
+                self.worker = asyncio.create_task(self.transcribe_windows())
+            if len(self.pending):
+                await self.queue_window(len(self.pending))
+            await self.windows.put(None)
+            await self.worker
+            self.touch([s for s in SOAP_SECTIONS if self.draft[s] is None and s not in self.updates] + sorted(self.failed))
+            while pending := [task for task in self.updates.values() if not task.done()]:
+                await asyncio.gather(*pending)
+            for section in sorted(self.failed):
+                # A second failure is the caller's to handle.
+                self.draft[section] = await agenerate_section(section, self.transcript)
+            span.attributes.update(seconds=self.seconds, skipped_windows=len(self.skipped), finish_seconds=time.perf_counter() - start)
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        return dict(self.draft)
+
+async def pcm_frames(reader, chunk_seconds=0.5):
+    """float32 frames from a stream of 16-bit little-endian mono PCM at `SAMPLE_RATE`."""
+    size = int(chunk_seconds * SAMPLE_RATE) * 2
+    leftover = b""
+    while data := await reader.read(size):
+        data = leftover + data
+        whole = len(data) - len(data) % 2
+        leftover = data[whole:]
+        yield np.frombuffer(data[:whole], "<i2").astype(np.float32) / 32768
+
+async def follow_file(path, idle_seconds=10, chunk_seconds=0.5):
+    """Frames of a recording that is still being written, until it hasn't grown for `idle_seconds`.
+
+    NOTE: ffmpeg can only decode a growing file in a streamable format (WAV,
+    WebM/Opus, MP3, ADTS AAC). An .m4a with its index at the end can't be read
+    until the recorder closes it.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-v", "error", "-follow", "1", "-rw_timeout", str(int(idle_seconds * 1e6)), "-i", str(path),
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        async for frame in pcm_frames(process.stdout, chunk_seconds):
+            yield frame
+    finally:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+async def socket_frames(path, chunk_seconds=0.5):
+    """Frames sent as raw 16 kHz mono s16le PCM by the first client of a Unix socket at `path`, until it disconnects.
+
+    e.g. `ffmpeg -f pulse -i default -f s16le -ac 1 -ar 16000 - | nc -U /tmp/stsoaps.sock`
+    """
+    connected = asyncio.get_running_loop().create_future()
+
+    def accept(reader, writer):
+        if connected.done():
+            writer.close()
+        else:
+            connected.set_result((reader, writer))
+
+    server = await asyncio.start_unix_server(accept, path)
+    try:
+        reader, writer = await connected
+        async for frame in pcm_frames(reader, chunk_seconds):
+            yield frame
+        writer.close()
+    finally:
+        server.close()
+        Path(path).unlink(missing_ok=True)
+
+async def live_scribe(frames, **session):
+    """Run a `LiveSession` over an async iterable of frames and return the final note."""
+    session = LiveSession(**session)
+    async for samples in frames:
+        await session.feed(samples)
+    return await session.finish()
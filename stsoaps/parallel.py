@@ -0,0 +1,139 @@
+"""Multi-core embedding for backfills.
+
+fastembed runs ONNX inference in a single process, and during a backfill that is
+the bottleneck. `EmbeddingWorkers` shards batches of section text across a pool
+of worker processes, one model per worker, each pinned to its own slice of the
+cores. Vectors come back through one shared memory block split into slots, so no
+vectors get pickled, and two slots per worker bound how far embedding can run
+ahead of the Qdrant upserts. Workers are spawned, not forked, and the parent
+never loads the model: onnxruntime isn't fork-safe.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from qdrant_client import models
+
+from . import clients, config
+from .index import SECTIONS_COLLECTION, batched, ensure_sections_collection, section_points, section_vectors
+
+def embedding_worker(worker, tasks, done, shm_name, shape, threads):
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cores[worker * threads:(worker + 1) * threads] or cores)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    from fastembed import TextEmbedding
+
+    model = TextEmbedding(config.EMBEDDING_MODEL, threads=threads)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    while (task := tasks.get()) is not None:
+        slot, texts = task
+        try:
+            for i, vector in enumerate(model.embed(texts, batch_size=len(texts))):
+                slots[slot, i] = vector
+            done.put((slot, len(texts)))
+        except Exception as e:
+            done.put((slot, f"{type(e).__name__}: {e}"))
+    del slots
+    shm.close()
+
+class EmbeddingWorkers:
+    """Pool of fastembed worker processes returning vectors through shared memory.
+
+    Use as a context manager; `embed` takes (item, texts) batches of at most
+    `batch_size` texts and yields (item, vectors) as they finish, in whatever
+    order they finish.
+    """
+
+    def __init__(self, workers=os.cpu_count(), threads_per_worker=None, batch_size=256, dim=None):
+        threads = threads_per_worker or max(1, os.cpu_count() // workers)
+        # NOTE: spawned rather than forked. A forked child inherits whatever
+        # onnxruntime state the parent has (e.g. from `clients.embedder()`),
+        # and onnxruntime isn't fork-safe. Each worker loads its own model.
+        ctx = mp.get_context("spawn")
+        self.shape = (2 * workers, batch_size, dim or clients.embedding_dim())
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)) * 4)
+        self.slots = np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf)
+        self.tasks = ctx.Queue()
+        self.done = ctx.Queue()
+        self.processes = [
+            ctx.Process(target=embedding_worker, args=(i, self.tasks, self.done, self.shm.name, self.shape, threads), daemon=True)
+            for i in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def embed(self, batches):
+        """Yield (item, vectors) per batch. `vectors` is a view into shared memory, only valid until the next iteration."""
+        free = queue.Queue()
+        for slot in range(self.shape[0]):
+            free.put(slot)
+        items = {}
+
+        def feed():
+            count = 0
+            for item, texts in batches:
+                slot = free.get()
+                items[slot] = item
+                self.tasks.put((slot, list(texts)))
+                count += 1
+            self.done.put((None, count))
+
+        threading.Thread(target=feed, daemon=True).start()
+        expected, received = None, 0
+        while expected is None or received < expected:
+            slot, n = self.next_done()
+            if slot is None:
+                expected = n
+                continue
+            if isinstance(n, str):
+                raise RuntimeError(f"embedding worker failed: {n}")
+            received += 1
+            yield items.pop(slot), self.slots[slot, :n]
+            free.put(slot)
+
+    def next_done(self, poll=1.0):
+        # A worker that dies (OOM kill, segfault in onnxruntime) never reports
+        # its batch, so don't wait on the queue forever.
+        while True:
+            try:
+                return self.done.get(timeout=poll)
+            except queue.Empty:
+                dead = [process for process in self.processes if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"embedding worker exited with code {dead[0].exitcode}")
+
+    def close(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        del self.slots
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def index_sections_parallel(notes, collection=SECTIONS_COLLECTION, workers=os.cpu_count(), batch_size=256):
+    """`index_sections` with embedding spread over `workers` processes."""
+    ensure_sections_collection(collection)
+    start = time.perf_counter()
+    total = 0
+    batches = (((ids, payloads), texts) for ids, texts, payloads in (zip(*batch) for batch in batched(section_points(notes), batch_size)))
+    with EmbeddingWorkers(workers, batch_size=batch_size) as pool:
+        for (ids, payloads), vectors in pool.embed(batches):
+            texts = [payload["text"] for payload in payloads]
+            clients.qdrant_client().upsert(collection, points=models.Batch(ids=list(ids), vectors=section_vectors(texts, vectors.tolist()), payloads=list(payloads)), wait=False)
+            total += len(ids)
+    print(f"indexed {total} sections with {workers} workers in {time.perf_counter() - start:.1f}s")
+    return total
@@ -0,0 +1,210 @@
+"""The SOAP note schema, and everything generated from it.
+
+`SOAP_NOTE` is the one definition of a note's JSON structure. The OpenAI
+function spec (`functions`), the blank JSON skeleton and `SOAPNote`, a compact
+class for holding lots of parsed notes in memory, are all derived from it.
+
+`SOAPNote` uses `__slots__` with every text field in its own slot and all of the
+numeric vitals packed into a single float64 `array` (NaN for null). It is
+built from the parsed function call arguments and writes its JSON from the
+slots; `from_json` and `to_dict` go through `json` like anything else.
+"""
+
+import json
+import math
+import re
+from array import array
+from collections import namedtuple
+
+# For objects, `required` means every child is required. Arrays have a single
+# child describing their items.
+Field = namedtuple("Field", "name type description children enum required", defaults=((), None, False))
+
+SOAP_NOTE = Field("note", "object", None, required=True, children=(
+    Field("subjective", "string", "The subjective information provided by the patient about their condition."),
+    Field("objective", "object", "Objective, measurable data collected during the patient's examination.", required=True, children=(
+        Field("temperature", "number", "The patient's body temperature."),
+        Field("pulse", "number", "The patient's pulse rate."),
+        Field("respiration", "number", "The patient's respiration rate."),
+        Field("bodyConditionScore", "integer", "Body Condition Score ( 1/9 – severely underweight, 9/9 severely overweight)", enum=[1, 2, 3, 4, 5, 6, 7, 8, 9]),
+        Field("weight", "number", "The patient's weight."),
+        Field("mucousMembranes", "string", "The condition of the patient's mucous membranes."),
+        Field("capillaryRefillTime", "number", "The time taken for color to return to an external capillary bed after pressure is applied."),
+        Field("hydrationStatus", "string", "The patient's hydration status."),
+        Field("EENT", "object", "Examination findings related to Eyes, Ears, Nose, and Throat.", children=(
+            Field("dental", "string", "Findings related to the dental examination."),
+            Field("ears", "string", "Findings related to the ear examination."),
+            Field("eyes", "string", "Findings related to the eye examination."),
+            Field("throat", "string", "Findings related to the throat examination."),
+            Field("nose", "string", "Findings related to the nose examination."),
+        )),
+        Field("peripheralLymphNodes", "string", "Findings related to the peripheral lymph nodes examination."),
+        Field("H/L", "object", "Findings related to the Heart and Lungs examination.", children=(
+            Field("heart", "string", "Findings related to the heart examination."),
+            Field("lungs", "string", "Findings related to the lungs examination."),
+        )),
+        Field("ABD", "object", "Findings related to the Abdomen and Rectum examination.", children=(
+            Field("abdomen", "string", "Findings related to the abdomen examination."),
+            Field("rectum", "string", "Findings related to the rectum examination."),
+        )),
+        Field("urogenital", "string", "Findings related to the urogenital examination."),
+        # TODO: add more criteria for full ortho exam
+        Field("MSI", "object", "Findings related to the Musculoskeletal and Integument examination.", children=(
+            Field("musculoskeletal", "string", "Findings related to the musculoskeletal examination."),
+            Field("integument", "string", "Findings related to the integument examination."),
+        )),
+        # TODO: add more criteria for full neuro exam
+        Field("neurologic", "object", "Findings related to the Neurologic examination.", children=(
+            Field("mentation", "string", "Findings related to the patient's mentation."),
+            Field("gait", "string", "Findings related to the patient's gait."),
+            Field("cranialNerves", "string", "Findings related to the cranial nerves examination."),
+            Field("reflexes", "string", "Findings related to the reflexes examination."),
+        )),
+    )),
+    Field("assessment", "array", "The clinician's assessments of the patient's condition.", children=(
+        Field("item", "string", None),
+    )),
+    Field("plan", "string", "The plan of action for treating the patient's condition."),
+))
+
+def json_schema(field):
+    schema = {"type": field.type}
+    if field.description is not None:
+        schema["description"] = field.description
+    if field.enum is not None:
+        schema["enum"] = field.enum
+    if field.type == "object":
+        schema["properties"] = {child.name: json_schema(child) for child in field.children}
+        if field.required:
+            schema["required"] = [child.name for child in field.children]
+    elif field.type == "array":
+        schema["items"] = json_schema(field.children[0])
+    return schema
+
+def json_skeleton(field):
+    if field.type == "object":
+        return {child.name: json_skeleton(child) for child in field.children}
+    if field.type == "array":
+        return [json_skeleton(field.children[0])]
+    return {"string": "", "number": 0.0, "integer": 0}[field.type]
+
+functions = [{
+    "name": "generate_SOAP_notes",
+    "description": "Generates human-readable SOAP notes from structured JSON data",
+    "parameters": json_schema(SOAP_NOTE),
+    "output": {
+        "type": "string",
+        "description": "The generated SOAP note in human-readable format.",
+    },
+}]
+
+def leaves(field, path=()):
+    """(path, field) for every non-object field below `field`, in schema order."""
+    for child in field.children:
+        if child.type == "object":
+            yield from leaves(child, path + (child.name,))
+        else:
+            yield path + (child.name,), child
+
+def attribute_name(path):
+    # ("objective", "H/L", "heart") -> "HL_heart", ("subjective",) -> "subjective"
+    if path[0] == "objective":
+        path = path[1:]
+    return "_".join(re.sub(r"\W", "", key) for key in path)
+
+VITALS = [(path, field) for path, field in leaves(SOAP_NOTE) if field.type in ("number", "integer")]
+TEXTS = [(path, field) for path, field in leaves(SOAP_NOTE) if field.type not in ("number", "integer")]
+
+def dig(note, path):
+    for key in path:
+        if not isinstance(note, dict):
+            return None
+        note = note.get(key)
+    return note
+
+def as_float(value):
+    # NaN stands for null. So do Infinity (which json.loads accepts) and ints too big for a float.
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return math.nan
+    try:
+        value = float(value)
+    except OverflowError:
+        return math.nan
+    return value if math.isfinite(value) else math.nan
+
+class SOAPNote:
+    """Compact SOAP note: vitals in one float64 array (NaN for null), every other leaf in its own slot.
+
+    Attributes are named after the leaf, prefixed with its exam group where it
+    has one (`temperature`, `mucousMembranes`, `EENT_dental`, `HL_heart`, ...).
+    `assessment` is a tuple.
+    """
+
+    __slots__ = ("vitals",) + tuple(attribute_name(path) for path, _ in TEXTS)
+
+    @classmethod
+    def from_dict(cls, note):
+        self = cls.__new__(cls)
+        self.vitals = array("d", [as_float(dig(note, path)) for path, _ in VITALS])
+        for path, field in TEXTS:
+            value = dig(note, path)
+            if field.type == "array" and value is not None:
+                # A lone string where a list was expected (e.g. one assessment), as in `validation`.
+                value = tuple(value) if isinstance(value, list) else (value,)
+            setattr(self, attribute_name(path), value)
+        return self
+
+    @classmethod
+    def from_json(cls, arguments):
+        """Parse `function_call.arguments` into a note."""
+        return cls.from_dict(json.loads(arguments))
+
+    def to_json(self):
+        """Function call JSON for this note, written directly from the slots."""
+        return "".join(self.encode(SOAP_NOTE, ()))
+
+    def encode(self, field, path):
+        if field.type == "object":
+            yield "{"
+            for i, child in enumerate(field.children):
+                yield ", " if i else ""
+                yield json.dumps(child.name) + ": "
+                yield from self.encode(child, path + (child.name,))
+            yield "}"
+        elif field.type in ("number", "integer"):
+            value = getattr(self, attribute_name(path))
+            yield "null" if value is None else json.dumps(value)
+        else:
+            yield json.dumps(getattr(self, attribute_name(path)))
+
+    def to_dict(self):
+        return json.loads(self.to_json())
+
+    def __repr__(self):
+        return f"SOAPNote(temperature={self.temperature}, pulse={self.pulse}, bodyConditionScore={self.bodyConditionScore}, assessment={self.assessment!r})"
+
+def vital_property(index, integer):
+    def get(self):
+        value = self.vitals[index]
+        if math.isnan(value):
+            return None
+        return int(value) if integer else value
+
+    def set(self, value):
+        self.vitals[index] = as_float(value)
+    return property(get, set)
+
+for index, (path, field) in enumerate(VITALS):
+    setattr(SOAPNote, attribute_name(path), vital_property(index, field.type == "integer"))
+
+def note_text(note):
+    """Flatten a note into one "path: value" line per filled-in field, e.g. "objective EENT dental: mild calculus"."""
+    lines = []
+    for path, field in leaves(SOAP_NOTE):
+        value = dig(note, path)
+        if value is None or value == "" or value == []:
+            continue
+        if field.type == "array":
+            value = "; ".join(map(str, value if isinstance(value, list) else [value]))
+        lines.append(f"{' '.join(path)}: {value}")
+    return "\n".join(lines)
@@ -0,0 +1,64 @@
+"""Per-section SOAP generation.
+
+Each of S, O, A and P is requested on its own, all four at once, with only the
+part of the VMTH instructions that applies to that section and a function spec
+for just that part of the `generate_SOAP_notes` schema. The answers are merged
+back into one note with the same shape as the single-call version, and the
+wall-clock time is set by the slowest section (usually O).
+"""
+
+import asyncio
+import json
+import re
+
+from . import config
+from .batch import throttled_completion
+from .cache import acached_completion
+from .prompts import SOAP_SYSTEM_MESSAGE, VMTH_SYSTEM_MESSAGE
+from .schema import functions
+
+SOAP_SECTIONS = ["subjective", "objective", "assessment", "plan"]
+
+def split_vmth_guide(message):
+    """Split the VMTH instructions into the shared preamble and one guide per SOAP section."""
+    parts = re.split(r"^(SUBJECTIVE|OBJECTIVE|ASSESSMENT|PLAN)$", message, flags=re.MULTILINE)
+    # NOTE: only the first line of the preamble (the scribe role) is useful to
+    # every section; the rest is general advice that the sections repeat.
+    preamble = parts[0].strip().splitlines()[0]
+    guides = {heading.lower(): (heading + text).strip() for heading, text in zip(parts[1::2], parts[2::2])}
+    return preamble, guides
+
+VMTH_PREAMBLE, VMTH_SECTION_GUIDES = split_vmth_guide(VMTH_SYSTEM_MESSAGE)
+
+def section_function(section):
+    """Function spec for one section, cut out of the full `generate_SOAP_notes` schema."""
+    return {
+        "name": f"generate_{section}",
+        "description": f"Generates the {section} section of SOAP notes from structured JSON data",
+        "parameters": {
+            "type": "object",
+            "properties": {section: functions[0]["parameters"]["properties"][section]},
+            "required": [section],
+        },
+    }
+
+SECTION_FUNCTIONS = {section: section_function(section) for section in SOAP_SECTIONS}
+
+async def agenerate_section(section, transcript_text):
+    response = await acached_completion(
+        throttled_completion,
+        model=config.SOAP_MODEL,
+        messages=[
+            {"role": "system", "content": "\n\n".join([VMTH_PREAMBLE, VMTH_SECTION_GUIDES[section], SOAP_SYSTEM_MESSAGE])},
+            {"role": "user", "content": f"Generate the {section.upper()} section of the SOAP notes for the following patient interaction:\n\n" + transcript_text},
+        ],
+        functions=[SECTION_FUNCTIONS[section]],
+        function_call={"name": SECTION_FUNCTIONS[section]["name"]},
+        temperature=0,
+    )
+    return json.loads(response.choices[0].message.function_call.arguments).get(section)
+
+async def agenerate_soap_sections(transcript_text):
+    """Generate S, O, A and P concurrently and merge them into one `generate_SOAP_notes` shaped note."""
+    sections = await asyncio.gather(*[agenerate_section(section, transcript_text) for section in SOAP_SECTIONS])
+    return dict(zip(SOAP_SECTIONS, sections))
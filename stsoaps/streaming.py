@@ -0,0 +1,117 @@
+"""Streaming SOAP generation.
+
+With `stream=True` the function call arguments arrive as a stream of text
+deltas. They go through a small incremental JSON parser that reports each field
+as soon as its closing quote/brace/bracket arrives, so a UI can render the note
+section by section while the rest is still being generated.
+"""
+
+import json
+
+from . import config
+from .batch import throttled_completion
+from .prompts import SOAP_SYSTEM_MESSAGE
+from .schema import functions
+
+class IncrementalJSONParser:
+    """Incremental JSON parser that reports values as they complete.
+
+    `feed(chunk)` returns a list of `(path, value)` pairs for every value that
+    closed within the chunk and sits at most `max_depth` levels below the root,
+    e.g. `(("objective", "EENT"), {...})` or `(("assessment", 0), "A1 - ...")`.
+    The root itself is reported last with path `()`. Each character is scanned
+    once, so the total cost is linear in the size of the document.
+    """
+
+    def __init__(self, max_depth=2):
+        self.max_depth = max_depth
+        self.text = ""
+        self.pos = 0
+        # One frame per open container: [kind, path, key/index, expecting_key, start].
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.scalar_start = None
+
+    def feed(self, chunk):
+        self.text += chunk
+        events = []
+        for i in range(self.pos, len(self.text)):
+            c = self.text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    self.close_string(i + 1, events)
+                continue
+            if self.scalar_start is not None:
+                if c not in ",}] \t\r\n":
+                    continue
+                self.close_value(self.child_path(), self.scalar_start, i, events)
+                self.scalar_start = None
+            if c in " \t\r\n":
+                continue
+            frame = self.stack[-1] if self.stack else None
+            if c == '"':
+                self.in_string = True
+                self.string_start = i
+            elif c in "{[":
+                kind = "object" if c == "{" else "array"
+                self.stack.append([kind, self.child_path(), 0 if kind == "array" else None, kind == "object", i])
+            elif c in "}]":
+                self.stack.pop()
+                self.close_value(frame[1], frame[4], i + 1, events)
+            elif c == ":":
+                frame[3] = False
+            elif c == ",":
+                if frame[0] == "object":
+                    frame[3] = True
+                else:
+                    frame[2] += 1
+            else:
+                self.scalar_start = i
+        self.pos = len(self.text)
+        return events
+
+    def child_path(self):
+        # Path of a value starting at the current position.
+        if not self.stack:
+            return ()
+        return self.stack[-1][1] + (self.stack[-1][2],)
+
+    def close_string(self, end, events):
+        frame = self.stack[-1] if self.stack else None
+        if frame is not None and frame[0] == "object" and frame[3]:
+            frame[2] = json.loads(self.text[self.string_start:end])
+        else:
+            self.close_value(self.child_path(), self.string_start, end, events)
+
+    def close_value(self, path, start, end, events):
+        if len(path) <= self.max_depth:
+            events.append((path, json.loads(self.text[start:end])))
+
+async def astream_soap(transcript_text):
+    """Stream a SOAP note, yielding `(path, value)` for each field as it completes and `((), note)` at the end."""
+    stream = await throttled_completion(
+        model=config.SOAP_MODEL,
+        messages=[
+            {"role": "system", "content": SOAP_SYSTEM_MESSAGE},
+            {"role": "user", "content": "Generate SOAP notes for the following patient interaction:\n\n" + transcript_text},
+        ],
+        functions=functions,
+        function_call={"name": "generate_SOAP_notes"},
+        temperature=0,
+        stream=True,
+    )
+    parser = IncrementalJSONParser()
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        function_call = chunk.choices[0].delta.function_call
+        if function_call is not None and function_call.arguments:
+            for event in parser.feed(function_call.arguments):
+                yield event
@@ -0,0 +1,167 @@
+"""Local stand-ins for the OpenAI API, for testing the transport and benchmarking.
+
+`StubServer` speaks just enough of the API to exercise retries and hedging, with
+injected latency and errors. `MockOpenAI` serves synthetic visits with
+per-endpoint log-normal latency and streamed function calls.
+"""
+
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import config
+from .schema import SOAP_NOTE, json_skeleton, note_text
+from .synthetic import synthetic_notes
+
+STUB_TRANSCRIPT = "Remy is a 4 year old neutered male lab mix. T 101.2, P 96, R 24, BW 31.5 kg, BCS 5/9. Vomiting since yesterday."
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, headers, body = self.server.stub.respond(self.path, request)
+        try:
+            self.send_response(status)
+            for name, value in {"Content-Type": "application/json", **headers}.items():
+                self.send_header(name, value)
+            if isinstance(body, bytes):
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            # Streamed (server-sent events): the body ends when the connection closes.
+            self.end_headers()
+            for chunk in body:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up first, e.g. the loser of a hedged call was cancelled.
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+class StubServer:
+    """Just enough of the OpenAI API on localhost, with injected latency and errors.
+
+    `latency()` returns the seconds to sleep before each response. A fraction
+    `error_rate` of requests fail with one of `error_statuses`, and 429s carry
+    `Retry-After`. Use it as a context manager and point `clients.using_openai` at `url`.
+    """
+
+    def __init__(self, latency=lambda: 0.0, error_rate=0.0, error_statuses=(429, 500, 503), retry_after=0.2, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = Counter()
+
+    def delay(self, path):
+        return self.latency()
+
+    def respond(self, path, request):
+        time.sleep(self.delay(path))
+        if self.random.random() < self.error_rate:
+            status = self.random.choice(self.error_statuses)
+            self.requests[path, status] += 1
+            headers = {"Retry-After": str(self.retry_after)} if status == 429 else {}
+            return status, headers, json.dumps({"error": {"message": "injected", "type": "stub"}}).encode()
+        self.requests[path, 200] += 1
+        if path.endswith("/audio/transcriptions"):
+            return 200, {}, json.dumps({"text": STUB_TRANSCRIPT}).encode()
+        if path.endswith("/chat/completions"):
+            return 200, {}, json.dumps(self.completion()).encode()
+        return 404, {}, b"{}"
+
+    def completion(self):
+        arguments = json.dumps(json_skeleton(SOAP_NOTE))
+        return {
+            "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": config.SOAP_MODEL,
+            "choices": [{"index": 0, "finish_reason": "function_call", "message": {
+                "role": "assistant", "content": None, "function_call": {"name": "generate_SOAP_notes", "arguments": arguments},
+            }}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.stub = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def lognormal(median, p95, rng=random):
+    """Latency sampler with the given median and 95th percentile."""
+    sigma = math.log(p95 / median) / 1.645
+    return lambda: rng.lognormvariate(math.log(median), sigma)
+
+# Roughly what we see from Colab: Whisper scales with audio length, GPT-4 with output length.
+MOCK_LATENCY = {
+    "/audio/transcriptions": (4.0, 12.0),
+    "/chat/completions": (8.0, 20.0),
+}
+
+class MockOpenAI(StubServer):
+    """`StubServer` serving synthetic visits, with per-endpoint latency and streaming.
+
+    `latency` maps an endpoint suffix to (median, p95) seconds and `scale`
+    multiplies every draw, so `scale=0.01` turns minutes of wall-clock into
+    seconds while keeping the shape of the distributions. Streamed completions
+    send the arguments in `chunk_chars` pieces, `token_latency` seconds apart.
+    """
+
+    def __init__(self, latency=None, scale=1.0, n_notes=200, chunk_chars=16, token_latency=0.002, error_rate=0.0, seed=0):
+        super().__init__(error_rate=error_rate, seed=seed)
+        self.samplers = {path: lognormal(*spec, rng=self.random) for path, spec in {**MOCK_LATENCY, **(latency or {})}.items()}
+        self.scale = scale
+        self.notes = [note for _, note, _ in synthetic_notes(n_notes, seed)]
+        self.next_note = itertools.count()
+        self.chunk_chars = chunk_chars
+        self.token_latency = token_latency
+
+    def delay(self, path):
+        for suffix, sample in self.samplers.items():
+            if path.endswith(suffix):
+                return sample() * self.scale
+        return 0.0
+
+    def respond(self, path, request):
+        status, headers, body = super().respond(path, request)
+        if status != 200:
+            return status, headers, body
+        note = self.notes[next(self.next_note) % len(self.notes)]
+        if path.endswith("/audio/transcriptions"):
+            return 200, {}, json.dumps({"text": note_text(note)}).encode()
+        if json.loads(request or b"{}").get("stream"):
+            return 200, {"Content-Type": "text/event-stream"}, self.stream(json.dumps(note))
+        completion = self.completion()
+        completion["choices"][0]["message"]["function_call"]["arguments"] = json.dumps(note)
+        return 200, {}, json.dumps(completion).encode()
+
+    def stream(self, arguments):
+        def event(delta, finish_reason=None):
+            chunk = {
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": config.SOAP_MODEL,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode()
+
+        yield event({"role": "assistant", "function_call": {"name": "generate_SOAP_notes", "arguments": ""}})
+        for i in range(0, len(arguments), self.chunk_chars):
+            time.sleep(self.token_latency * self.scale)
+            yield event({"function_call": {"arguments": arguments[i:i + self.chunk_chars]}})
+        yield event({}, "function_call")
+        yield b"data: [DONE]\n\n"
@@ -0,0 +1,39 @@
+"""Synthetic SOAP notes for the benchmarks and the mock OpenAI server.
+
+About a third of the sections mention one rare jargon term, so for each term the
+relevant set is known exactly.
+"""
+
+import random
+
+JARGON = [
+    "lepto", "distemper", "Hobin", "dolasetron", "maropitant", "parvovirus", "IVDD", "Addison's",
+    "pancreatitis", "pyometra", "cerenia", "gabapentin", "FeLV", "giardia", "bordetella", "cruciate",
+]
+SUBJECTIVES = ["BAR, eating and drinking normally", "QAR, mildly lethargic since yesterday", "Dull, decreased appetite for 2 days", "Bright and alert, owner reports intermittent coughing"]
+FINDINGS = ["no significant findings", "mild dental calculus", "soft, non-painful abdomen", "normal sinus rhythm, no murmurs", "mild otitis externa AU", "normal gait and mentation"]
+ASSESSMENTS = ["acute vomiting", "small bowel diarrhea", "lameness LH", "pruritus", "weight loss", "coughing"]
+PLANS = ["CBC and chemistry panel", "abdominal radiographs", "recheck in 2 weeks", "IV fluids", "NPO for 12 hours", "fecal flotation"]
+
+def synthetic_notes(n, seed=0):
+    """n synthetic (note_id, note, metadata) records; about a third of the sections mention one jargon term."""
+    rng = random.Random(seed)
+
+    def maybe_jargon(text):
+        return f"{text}, {rng.choice(JARGON)}" if rng.random() < 0.3 else text
+
+    for i in range(n):
+        note = {
+            "subjective": maybe_jargon(rng.choice(SUBJECTIVES)),
+            "objective": {
+                "temperature": round(rng.uniform(99.5, 104), 1),
+                "pulse": rng.randrange(60, 160, 4),
+                "weight": round(rng.uniform(2, 45), 1),
+                "bodyConditionScore": rng.randint(3, 7),
+                "EENT": {"dental": rng.choice(FINDINGS)},
+                "ABD": {"abdomen": maybe_jargon(rng.choice(FINDINGS))},
+            },
+            "assessment": [f"A{j + 1} - " + maybe_jargon(rng.choice(ASSESSMENTS)) + " - R/O " + rng.choice(ASSESSMENTS) for j in range(rng.randint(1, 3))],
+            "plan": maybe_jargon("; ".join(rng.sample(PLANS, 3))),
+        }
+        yield f"synthetic-{i}", note, {"species": rng.choice(["canine", "feline"]), "clinic": rng.choice(["UCD", "VMTH"])}
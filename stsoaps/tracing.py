@@ -0,0 +1,221 @@
+"""Spans for each pipeline stage, exported as OTLP/JSON, plus Prometheus metrics.
+
+A span is a name, a start and an end, a parent (tracked with a contextvar, so it
+follows asyncio tasks and `to_thread` calls), and attributes. Token and audio
+usage is priced with `PRICES`, and the cost is added up on the root span of each
+appointment.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# USD per 1k prompt/completion tokens, and per minute of audio for Whisper.
+PRICES = {
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-3.5-turbo-1106": (0.001, 0.002),
+    "whisper-1": 0.006,
+}
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    root: "Span" = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    error: str = None
+    deferred: bool = False
+
+class Metrics:
+    """Prometheus counters and histograms, rendered in the text exposition format."""
+
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = buckets
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[name, tuple(sorted(labels.items()))] += amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts, total, n = self.histograms.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.histograms[key] = (counts, total + value, n + 1)
+
+    def text(self):
+        def render(labels, **extra):
+            labels = [*labels, *extra.items()]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        for name in sorted({name for (name, _), _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            lines += [f"{name}{render(labels)} {value:g}" for (n, labels), value in counters if n == name]
+        for name in sorted({name for (name, _), _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (n, labels), (counts, total, count) in histograms:
+                if n != name:
+                    continue
+                lines += [f"{name}_bucket{render(labels, le=f'{bound:g}')} {c}" for bound, c in zip(self.buckets, counts)]
+                lines += [f"{name}_bucket{render(labels, le='+Inf')} {count:g}", f"{name}_sum{render(labels)} {total:g}", f"{name}_count{render(labels)} {count:g}"]
+        return "\n".join(lines) + "\n"
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    """Spans for each pipeline stage plus the Prometheus metrics derived from them."""
+
+    def __init__(self, service="stsoaps", max_spans=100_000):
+        self.service = service
+        self.spans = deque(maxlen=max_spans)
+        self.metrics = Metrics()
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        parent = current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+        span.root = parent.root if parent else span
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            self.metrics.inc("stsoaps_span_errors_total", span=name)
+            raise
+        finally:
+            current_span.reset(token)
+            if not span.deferred:
+                self.end(span)
+
+    def end(self, span):
+        """Finish `span`. A span whose `deferred` was set inside its `with` block has to be ended this way, e.g. once a stream is consumed."""
+        span.end_ns = time.time_ns()
+        self.metrics.observe("stsoaps_span_seconds", (span.end_ns - span.start_ns) / 1e9, span=span.name)
+        self.spans.append(span)
+
+    def set(self, **attributes):
+        """Set attributes on the current span, if there is one."""
+        span = current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    def add(self, span, **amounts):
+        for key, amount in amounts.items():
+            span.attributes[key] = span.attributes.get(key, 0) + amount
+
+    def charge(self, model, usd):
+        span = current_span.get()
+        if span is not None:
+            self.add(span.root, cost_usd=usd)
+        self.metrics.inc("stsoaps_cost_usd_total", usd, model=model)
+
+    def record_usage(self, model, usage):
+        """Token counts from a chat completion's `usage`."""
+        if usage is None:
+            return
+        self.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        self.metrics.inc("stsoaps_tokens_total", usage.prompt_tokens, model=model, kind="prompt")
+        self.metrics.inc("stsoaps_tokens_total", usage.completion_tokens, model=model, kind="completion")
+        prompt_price, completion_price = PRICES.get(model, (0, 0))
+        self.charge(model, (usage.prompt_tokens * prompt_price + usage.completion_tokens * completion_price) / 1000)
+
+    def record_audio(self, model, seconds):
+        """Audio billed by the minute (Whisper)."""
+        self.set(audio_seconds=seconds)
+        self.metrics.inc("stsoaps_audio_seconds_total", seconds, model=model)
+        self.charge(model, seconds / 60 * PRICES.get(model, 0))
+
+    def cache_lookup(self, cache, hits, misses):
+        span = current_span.get()
+        if span is not None:
+            self.add(span, **{f"cache.{cache}.hits": hits, f"cache.{cache}.misses": misses})
+        if hits:
+            self.metrics.inc("stsoaps_cache_requests_total", hits, cache=cache, result="hit")
+        if misses:
+            self.metrics.inc("stsoaps_cache_requests_total", misses, cache=cache, result="miss")
+
+    def retry(self, reason):
+        span = current_span.get()
+        if span is not None:
+            self.add(span, retries=1)
+        self.metrics.inc("stsoaps_retries_total", reason=str(reason))
+
+    def export_spans(self, path):
+        """Append and drop the finished spans as one OTLP/JSON line."""
+        spans = [self.spans.popleft() for _ in range(len(self.spans))]
+        if not spans:
+            return 0
+        request = {"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({"service.name": self.service})},
+            "scopeSpans": [{"scope": {"name": self.service}, "spans": [otlp_span(span) for span in spans]}],
+        }]}
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(request, separators=(",", ":")) + "\n")
+        return len(spans)
+
+    def export_metrics(self, path):
+        # Write then rename so a scraper never reads a half-written file.
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        Path(tmp).write_text(self.metrics.text())
+        os.replace(tmp, path)
+
+def otlp_attributes(attributes):
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+    return [{"key": k, "value": value(v)} for k, v in attributes.items() if v is not None]
+
+def otlp_span(span):
+    return {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": otlp_attributes(span.attributes),
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+
+tracer = Tracer()
+
+def export(trace_dir):
+    """Flush the finished spans and the current metrics to `trace_dir`, where the collector / node_exporter picks them up."""
+    exported = tracer.export_spans(Path(trace_dir) / "spans.jsonl")
+    tracer.export_metrics(Path(trace_dir) / "stsoaps.prom")
+    return exported
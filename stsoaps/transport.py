@@ -0,0 +1,182 @@
+"""Pooled, retrying HTTP transport for the OpenAI clients, and hedged calls.
+
+- Connection pool: a keep-alive pool per client (`POOL_LIMITS`).
+- Per-endpoint timeouts: `ENDPOINT_TIMEOUTS` is matched on the request path.
+- Retries: 429, 408 and 5xx responses and connection errors are retried with
+  full-jitter exponential backoff, waiting at least as long as `Retry-After` /
+  `retry-after-ms` asks. The SDK's own retries are off (`max_retries=0`).
+- Hedging: `hedged` starts a duplicate of a call once it has been outstanding
+  longer than the recent p95 latency and takes whichever answers first, within
+  a budget of 5% extra requests.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter, deque
+from email.utils import parsedate_to_datetime
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from .tracing import tracer
+
+POOL_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+DEFAULT_TIMEOUT = httpx.Timeout(60, connect=5)
+ENDPOINT_TIMEOUTS = {
+    "/audio/transcriptions": httpx.Timeout(180, connect=5),
+    "/chat/completions": httpx.Timeout(90, connect=5),
+    "/embeddings": httpx.Timeout(20, connect=5),
+}
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+def retry_after(response):
+    """Seconds the server asked us to wait, or None."""
+    if "retry-after-ms" in response.headers:
+        try:
+            return float(response.headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+class RetryTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Wraps an httpx transport with per-endpoint timeouts and jittered exponential backoff."""
+
+    def __init__(self, transport, attempts=5, base=0.5, cap=30.0, timeouts=ENDPOINT_TIMEOUTS):
+        self.transport = transport
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.timeouts = timeouts
+        self.retries = Counter()
+
+    def prepare(self, request):
+        for suffix, timeout in self.timeouts.items():
+            if request.url.path.endswith(suffix):
+                request.extensions = {**request.extensions, "timeout": timeout.as_dict()}
+                break
+
+    def backoff(self, attempt, reason, response=None):
+        self.retries[reason] += 1
+        tracer.retry(reason)
+        delay = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        wait = retry_after(response) if response is not None else None
+        return delay if wait is None else wait + random.uniform(0, self.base)
+
+    def handle_request(self, request):
+        self.prepare(request)
+        request.read()
+        for attempt in range(self.attempts):
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as e:
+                if attempt == self.attempts - 1:
+                    raise
+                time.sleep(self.backoff(attempt, type(e).__name__))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.attempts - 1:
+                return response
+            delay = self.backoff(attempt, response.status_code, response)
+            response.close()
+            time.sleep(delay)
+
+    async def handle_async_request(self, request):
+        self.prepare(request)
+        await request.aread()
+        for attempt in range(self.attempts):
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                if attempt == self.attempts - 1:
+                    raise
+                await asyncio.sleep(self.backoff(attempt, type(e).__name__))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.attempts - 1:
+                return response
+            delay = self.backoff(attempt, response.status_code, response)
+            await response.aclose()
+            await asyncio.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+def openai_clients(base_url=None, api_key=None, limits=POOL_LIMITS, **retry):
+    """Sync and async OpenAI clients, each on its own pooled, retrying transport."""
+    # NOTE: api_key=None lets the SDK read OPENAI_API_KEY from the environment.
+    sync = OpenAI(
+        api_key=api_key, base_url=base_url, max_retries=0, timeout=DEFAULT_TIMEOUT,
+        http_client=httpx.Client(transport=RetryTransport(httpx.HTTPTransport(limits=limits), **retry)),
+    )
+    async_ = AsyncOpenAI(
+        api_key=api_key, base_url=base_url, max_retries=0, timeout=DEFAULT_TIMEOUT,
+        http_client=httpx.AsyncClient(transport=RetryTransport(httpx.AsyncHTTPTransport(limits=limits), **retry)),
+    )
+    return sync, async_
+
+class LatencyTracker:
+    """Rolling window of call latencies, and a budget of hedges as a fraction of calls."""
+
+    def __init__(self, window=200, min_samples=20, budget=0.05):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.budget = budget
+        self.calls = 0
+        self.hedges = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def p95(self):
+        if len(self.samples) < self.min_samples:
+            return None
+        return statistics.quantiles(self.samples, n=20)[-1]
+
+    def can_hedge(self):
+        """Whether one more hedge keeps them within `budget` of calls."""
+        return self.hedges + 1 <= self.budget * self.calls
+
+async def hedged(call, latencies, max_hedges=1):
+    """Await `call()`, racing up to `max_hedges` duplicates once it runs past the p95 latency.
+
+    Only calls that finish without a hedge are recorded: a hedged call's own
+    latency is unknown, and the winner's would pull the p95 down over time.
+    """
+    latencies.calls += 1
+    start = time.perf_counter()
+    pending = {asyncio.ensure_future(call())}
+    hedges = 0
+    error = None
+    try:
+        while pending:
+            delay = latencies.p95() if hedges < max_hedges and latencies.can_hedge() else None
+            done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                latencies.hedges += 1
+                hedges += 1
+                pending.add(asyncio.ensure_future(call()))
+                continue
+            for task in done:
+                if task.exception() is None:
+                    if not hedges:
+                        latencies.record(time.perf_counter() - start)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+        # Wait for the losers to unwind (closing their connections) and collect their errors.
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,114 @@
+"""Validating generated notes against the `generate_SOAP_notes` schema.
+
+The schema is compiled once into a tree of small check functions, so checking a
+note is just a few function calls per field with no schema interpretation at
+run time. While checking, the common slips with numbers are fixed ("100.1F" ->
+100.1, "5/9" -> 5, "< 2 sec" -> 2) and everything that couldn't be fixed comes
+back as a list of errors with the path of the offending field. Fields set to
+`null` are accepted; missing required fields are errors.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+from .schema import functions
+
+# First number in a string like "100.1F", "5/9", "24.5 kg" or "< 2 sec".
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)")
+
+@dataclass
+class FieldError:
+    path: tuple
+    message: str
+
+def compile_schema(schema, path=(), index=None):
+    """Compile a JSON schema node into a `check(value, path, errors)` function returning the coerced value.
+
+    Every compiled node is also recorded in `index` under its schema path
+    (array items as "*") so single fields can be checked on their own.
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        properties = {key: compile_schema(sub, path + (key,), index) for key, sub in schema.get("properties", {}).items()}
+        required = schema.get("required", [])
+
+        def check(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(FieldError(path, f"expected object, got {type(value).__name__}"))
+                return value
+            for key in required:
+                if key not in value:
+                    errors.append(FieldError(path + (key,), "missing required field"))
+            return {
+                key: properties[key](item, path + (key,), errors) if key in properties and item is not None else item
+                for key, item in value.items()
+            }
+    elif kind == "array":
+        items = compile_schema(schema.get("items", {}), path + ("*",), index)
+
+        def check(value, path, errors):
+            if isinstance(value, str):
+                # A lone string where a list was expected (e.g. one assessment).
+                value = [value]
+            if not isinstance(value, list):
+                errors.append(FieldError(path, f"expected array, got {type(value).__name__}"))
+                return value
+            return [items(item, path + (i,), errors) if item is not None else item for i, item in enumerate(value)]
+    elif kind in ("number", "integer"):
+        integer = kind == "integer"
+        enum = set(schema["enum"]) if "enum" in schema else None
+
+        def check(value, path, errors):
+            if isinstance(value, str):
+                match = NUMBER.search(value)
+                if match is None:
+                    errors.append(FieldError(path, f"expected {kind}, got {value!r}"))
+                    return value
+                value = float(match.group())
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(FieldError(path, f"expected {kind}, got {type(value).__name__}"))
+                return value
+            if isinstance(value, float) and not math.isfinite(value):
+                # json.loads accepts NaN and Infinity.
+                errors.append(FieldError(path, f"expected a finite {kind}, got {value}"))
+                return value
+            if integer:
+                if value != int(value):
+                    errors.append(FieldError(path, f"expected integer, got {value}"))
+                    return value
+                value = int(value)
+            if enum is not None and value not in enum:
+                errors.append(FieldError(path, f"{value} is not one of {sorted(enum)}"))
+            return value
+    elif kind == "string":
+
+        def check(value, path, errors):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return str(value)
+            if not isinstance(value, str):
+                errors.append(FieldError(path, f"expected string, got {type(value).__name__}"))
+            return value
+    else:
+
+        def check(value, path, errors):
+            return value
+    if index is not None:
+        index[path] = check
+    return check
+
+SOAP_FIELD_CHECKS = {}
+check_soap_note = compile_schema(functions[0]["parameters"], index=SOAP_FIELD_CHECKS)
+
+def validate_note(note):
+    """Coerce and check a full note. Returns `(note, errors)`."""
+    errors = []
+    return check_soap_note(note, (), errors), errors
+
+def validate_field(path, value):
+    """Coerce and check a single field, e.g. `(("objective", "temperature"), "100.1F")`. Returns `(value, errors)`."""
+    check = SOAP_FIELD_CHECKS.get(tuple("*" if isinstance(key, int) else key for key in path))
+    if check is None or value is None:
+        return value, []
+    errors = []
+    return check(value, tuple(path), errors), errors
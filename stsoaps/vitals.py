@@ -0,0 +1,156 @@
+"""Deterministic vitals extraction.
+
+The numeric `objective` fields are almost always dictated in stock phrasings
+like "T 100.1, P 80, R pant, BW 24.5 kg, BCS 5/9, CRT < 2 sec". A few compiled
+regexes pick those out of the transcript locally, and `agenerate_soap_prefilled`
+drops them from the function spec for that call and writes them into the note
+itself: fewer output tokens, and no hallucinated numbers for the fields we're
+sure about.
+
+A value only counts when the transcript is unambiguous: every mention of the
+field that falls in a plausible range gives the same value. Weights in pounds
+are converted to kg.
+"""
+
+import json
+import math
+import re
+import time
+from collections import Counter
+
+from . import config
+from .batch import throttled_completion
+from .cache import acached_completion
+from .prompts import SOAP_SYSTEM_MESSAGE
+from .schema import SOAP_NOTE, functions
+
+NUM = r"(\d+(?:\.\d+)?)"
+LINK = r"(?:\s*(?:of|is|was|at|:|=|–|-)\s*|\s+)"
+VITAL_PATTERNS = {
+    "temperature": re.compile(r"\b(?:T|temp|temperature)" + LINK + r"?" + NUM + r"\s*(?:°\s*)?(?:F|degrees)?\b", re.IGNORECASE),
+    "pulse": re.compile(r"\b(?:P|pulse|HR|heart rate)" + LINK + r"?" + NUM + r"(?:\s*(?:bpm|beats))?", re.IGNORECASE),
+    "respiration": re.compile(r"\b(?:R|RR|resp|respirations?|respiratory rate)" + LINK + r"?" + NUM + r"(?:\s*(?:breaths|brpm))?", re.IGNORECASE),
+    "weight": re.compile(r"\b(?:BW|body\s*weight|weight|weighs|wt)" + LINK + r"?" + NUM + r"\s*(kg|kgs|kilos?|kilograms?|lbs?|pounds?)\b", re.IGNORECASE),
+    "bodyConditionScore": re.compile(r"\b(?:BCS|body condition(?: score)?)" + LINK + r"?(\d)(?:\s*(?:/|out of)\s*9)?\b", re.IGNORECASE),
+    "capillaryRefillTime": re.compile(r"\b(?:CRT|cap(?:illary)? refill(?: time)?)" + LINK + r"?(?:<|less than|under)?\s*" + NUM + r"\s*(?:s|sec|secs|seconds?)\b", re.IGNORECASE),
+}
+VITAL_RANGES = {
+    "temperature": (95, 108),
+    "pulse": (20, 300),
+    "respiration": (4, 200),
+    "weight": (0.05, 150),
+    "bodyConditionScore": (1, 9),
+    "capillaryRefillTime": (0, 5),
+}
+POUNDS = re.compile(r"lb|pound", re.IGNORECASE)
+
+def extract_vitals(text):
+    """{field: value} for every numeric objective field the transcript states unambiguously."""
+    vitals = {}
+    for field, pattern in VITAL_PATTERNS.items():
+        low, high = VITAL_RANGES[field]
+        values = set()
+        for match in pattern.finditer(text):
+            value = float(match.group(1))
+            if field == "weight" and POUNDS.match(match.group(2)):
+                value = round(value * 0.45359237, 1)
+            # NOTE: out-of-range matches ("T4 of 3.2", "recheck P 2 weeks") are other
+            # numbers that happen to follow the abbreviation, not a conflicting reading.
+            if low <= value <= high:
+                values.add(value)
+        if len(values) != 1:
+            continue
+        value = values.pop()
+        vitals[field] = int(value) if field == "bodyConditionScore" else value
+    return vitals
+
+def function_without(fields):
+    """The generate_SOAP_notes spec with `fields` dropped from `objective`."""
+    spec = json.loads(json.dumps(functions[0]))
+    objective = spec["parameters"]["properties"]["objective"]
+    for field in fields:
+        objective["properties"].pop(field, None)
+    objective["required"] = [field for field in objective["required"] if field not in fields]
+    return spec
+
+def merge_vitals(note, vitals):
+    objective = note.get("objective") if isinstance(note.get("objective"), dict) else {}
+    objective.update(vitals)
+    # Put the fields back in schema order.
+    order = [child.name for child in SOAP_NOTE.children[1].children]
+    note["objective"] = {**{key: objective[key] for key in order if key in objective}, **objective}
+    return note
+
+async def agenerate_soap_prefilled(transcript_text):
+    """`agenerate_soap`, but vitals found by `extract_vitals` are filled in locally instead of generated."""
+    vitals = extract_vitals(transcript_text)
+    response = await acached_completion(
+        throttled_completion,
+        model=config.SOAP_MODEL,
+        messages=[
+            {"role": "system", "content": SOAP_SYSTEM_MESSAGE},
+            {"role": "user", "content": "Generate SOAP notes for the following patient interaction:\n\n" + transcript_text},
+        ],
+        functions=[function_without(vitals)],
+        temperature=0,
+    )
+    return merge_vitals(json.loads(response.choices[0].message.function_call.arguments), vitals)
+
+# Labeled snippets for `evaluate_vitals`.
+VITALS_CORPUS = [
+    ("T 100.1 , P 80 , R pant; BW – 24.5 kg, BCS 5/9; m.m. pink, moist, CRT < 2sec, hydrated",
+     {"temperature": 100.1, "pulse": 80, "weight": 24.5, "bodyConditionScore": 5, "capillaryRefillTime": 2}),
+    ("Temperature is 101.5 degrees, heart rate 120, respiratory rate 30. She weighs 4.2 kilos.",
+     {"temperature": 101.5, "pulse": 120, "respiration": 30, "weight": 4.2}),
+    ("temp was 102.8, pulse of 96 bpm, resp 24, weight 55 lbs, body condition score 6 out of 9",
+     {"temperature": 102.8, "pulse": 96, "respiration": 24, "weight": 24.9, "bodyConditionScore": 6}),
+    ("Okay so his temp is 103.2 which is a little high. Heart rate's about 140. CRT is less than 2 seconds.",
+     {"temperature": 103.2, "capillaryRefillTime": 2}),
+    ("T: 99.8 P: 180 R: 40 Wt: 3.1 kg BCS: 4/9 CRT 1 sec",
+     {"temperature": 99.8, "pulse": 180, "respiration": 40, "weight": 3.1, "bodyConditionScore": 4, "capillaryRefillTime": 1}),
+    ("First temp was 101, recheck temp 102.5 after the walk. Pulse 88.",
+     {"pulse": 88}),
+    ("Body weight 32.6 kg, up from last visit. BCS 7/9. Panting in the room, couldn't get a resp rate.",
+     {"weight": 32.6, "bodyConditionScore": 7}),
+    ("No vitals yet, owner says she's been vomiting since Tuesday and isn't eating.",
+     {}),
+    ("HR 60, RR 12, temperature 100.5 F, weight 410 kg",
+     {"pulse": 60, "respiration": 12, "temperature": 100.5}),
+    ("We'll give 2.5 mg/kg of maropitant, weight of 18 kg, T 101.9, P 104, R 20, BCS 5",
+     {"weight": 18, "temperature": 101.9, "pulse": 104, "respiration": 20, "bodyConditionScore": 5}),
+    ("cap refill time 1.5 seconds, mucous membranes pink, temp 38.5",
+     {"capillaryRefillTime": 1.5}),
+    ("Dolasetron given at 1 mg/kg IV, recheck in 2 weeks.",
+     {}),
+    ("T4 of 3.2 on the last panel, so we'll keep the methimazole. Temp 102 today.",
+     {"temperature": 102}),
+    ("Recheck P 2 weeks. HR 80, RR 20.",
+     {"pulse": 80, "respiration": 20}),
+    ("Grade 2 out of 6 murmur, HR 150, R 36, BCS 3 out of 9, pulse of 150 on the femorals.",
+     {"pulse": 150, "respiration": 36, "bodyConditionScore": 3}),
+    ("Temp 101.2, on recheck temp 103. Weight 6 kg today, weight 6.4 kg in March.",
+     {}),
+]
+
+def evaluate_vitals(corpus=VITALS_CORPUS, repeats=2_000):
+    correct = Counter()
+    extracted = Counter()
+    expected = Counter()
+    for text, labels in corpus:
+        found = extract_vitals(text)
+        for field, value in found.items():
+            extracted[field] += 1
+            correct[field] += math.isclose(value, labels.get(field, math.nan), abs_tol=0.05)
+        for field in labels:
+            expected[field] += 1
+    for field in VITAL_PATTERNS:
+        precision = correct[field] / extracted[field] if extracted[field] else 1.0
+        recall = correct[field] / expected[field] if expected[field] else 1.0
+        print(f"{field:>20}: precision {precision:.2f}  recall {recall:.2f}  ({expected[field]} labeled)")
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text, _ in corpus:
+            extract_vitals(text)
+    elapsed = time.perf_counter() - start
+    words = sum(len(text.split()) for text, _ in corpus) * repeats
+    print(f"{len(corpus) * repeats / elapsed:,.0f} snippets/s, {words / elapsed:,.0f} words/s")
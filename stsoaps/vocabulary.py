@@ -0,0 +1,218 @@
+"""Transcript vocabulary correction.
+
+A lexicon of veterinary terms (drug names, breeds, exam terms, clinic-specific
+names like "Hobin") is loaded into a symmetric-delete index (the SymSpell trick,
+https://github.com/wolfgarbe/SymSpell), and every word of a transcript that is a
+near miss for a lexicon term gets replaced with the term. Multi-word terms
+("lymph nodes") are matched as whole phrases, never word by word. Lookups are
+memoized per distinct word, so a 15-minute transcript is corrected in one
+linear pass.
+
+To avoid "fixing" ordinary speech, only words of 4+ letters are considered, a
+1-edit miss is allowed up to 7 letters and 2 edits beyond that, and only words
+that are not in `known_words` (a general English word list plus `STOPWORDS`)
+are ever rewritten. Without a word list (`known_words=None`) we can't tell a
+misheard term from a real word, so only exact matches are normalized.
+"""
+
+import re
+import warnings
+from pathlib import Path
+
+from . import config
+
+STOPWORDS = {
+    "about", "after", "again", "also", "been", "before", "being", "came", "come", "could", "does", "doing", "down", "each",
+    "eating", "from", "good", "have", "having", "here", "into", "just", "know", "like", "look", "looks", "made", "make",
+    "more", "much", "okay", "only", "over", "really", "right", "said", "same", "some", "that", "their", "them", "then",
+    "there", "these", "they", "thing", "think", "this", "those", "through", "time", "very", "want", "well", "went", "were",
+    "what", "when", "where", "which", "while", "will", "with", "would", "yeah", "your",
+}
+WORD = re.compile(r"[A-Za-z][A-Za-z'-]*")
+
+def bounded_levenshtein(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 as soon as it must exceed `limit`.
+
+    Only the diagonal band |i - j| <= limit of the DP table can stay within the
+    limit, so that's all we compute.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+    if limit == 1:
+        # Most lookups only allow one edit: skip the table and compare around
+        # the first mismatch.
+        if len(a) > len(b):
+            a, b = b, a
+        i = 0
+        while i < len(a) and a[i] == b[i]:
+            i += 1
+        return 1 if a[i + (len(a) == len(b)):] == b[i + 1:] else 2
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        current[0] = row_min = i if i <= limit else over
+        ca = a[i - 1]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = previous[j - 1] + (ca != b[j - 1])
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+def deletes(word, distance):
+    """Every string made by deleting up to `distance` characters from `word` (including `word` itself)."""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+class VocabularyCorrector:
+    """Corrects near misses of lexicon terms in free text. `terms` may contain multi-word phrases."""
+
+    def __init__(self, terms, max_distance=2, prefix_length=7, known_words=None):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.fuzzy = known_words is not None
+        self.known_words = {word.lower() for word in known_words or ()} | STOPWORDS
+        # lowercase -> canonical spelling. Earlier terms win ties.
+        self.terms = {}
+        self.index = {}
+        # lowercase word -> [(phrase words, canonical words, position of the word in the phrase)]
+        self.phrases = {}
+        for term in terms:
+            words = WORD.findall(term)
+            if len(words) > 1:
+                lower = tuple(word.lower() for word in words)
+                for position, word in enumerate(lower):
+                    self.phrases.setdefault(word, []).append((lower, words, position))
+                continue
+            if not words:
+                continue
+            term = words[0]
+            key = term.lower()
+            if key in self.terms:
+                continue
+            self.terms[key] = term
+            for variant in deletes(key[:prefix_length], max_distance):
+                # Most variants belong to a single term, so store a bare string
+                # until there's a collision; that halves the index's memory.
+                existing = self.index.get(variant)
+                if existing is None:
+                    self.index[variant] = key
+                elif isinstance(existing, str):
+                    self.index[variant] = [existing, key]
+                else:
+                    existing.append(key)
+        self.memo = {}
+
+    def allowed_distance(self, word):
+        if len(word) < 4:
+            return 0
+        return 1 if len(word) <= 7 else min(2, self.max_distance)
+
+    def near_miss(self, word, term):
+        """Whether `word` (lowercase) may be rewritten to `term`: an unknown word within the allowed distance."""
+        limit = self.allowed_distance(word)
+        return self.fuzzy and limit > 0 and word not in self.known_words and bounded_levenshtein(word, term, limit) <= limit
+
+    def lookup(self, word):
+        """Canonical lexicon term for `word` (lowercase), or None."""
+        if word in self.terms:
+            return self.terms[word]
+        limit = self.allowed_distance(word)
+        if not self.fuzzy or limit == 0 or word in self.known_words:
+            return None
+        best, best_distance = None, limit + 1
+        seen = set()
+        for variant in deletes(word[:self.prefix_length], limit):
+            candidates = self.index.get(variant, ())
+            for candidate in (candidates,) if isinstance(candidates, str) else candidates:
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = bounded_levenshtein(word, candidate, best_distance - 1)
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+        return self.terms[best] if best is not None else None
+
+    def match_phrase(self, text, tokens, i):
+        """{token index: canonical word} for a lexicon phrase that token `i` is an exact word of, or None.
+
+        Every other word of the phrase must be the same word or a near miss for
+        it, and the words must be separated by whitespace only.
+        """
+        for lower, words, position in self.phrases.get(tokens[i].group().lower(), ()):
+            start = i - position
+            if start < 0 or start + len(lower) > len(tokens):
+                continue
+            span = tokens[start:start + len(lower)]
+            if any(text[a.end():b.start()].strip() for a, b in zip(span, span[1:])):
+                continue
+            if all(token.group().lower() == word or self.near_miss(token.group().lower(), word) for token, word in zip(span, lower)):
+                return {start + j: word for j, word in enumerate(words)}
+        return None
+
+    def corrected_word(self, word):
+        key = word.lower()
+        if key not in self.memo:
+            if len(self.memo) > 200_000:
+                self.memo.clear()
+            self.memo[key] = self.lookup(key)
+        return self.memo[key]
+
+    def correct(self, text):
+        tokens = list(WORD.finditer(text))
+        replacements = {}
+        if self.phrases:
+            for i in range(len(tokens)):
+                if i not in replacements:
+                    replacements.update(self.match_phrase(text, tokens, i) or {})
+        out = []
+        last = 0
+        for i, token in enumerate(tokens):
+            word = token.group()
+            term = replacements[i] if i in replacements else self.corrected_word(word)
+            out.append(text[last:token.start()])
+            # Keep the speaker's capitalization unless the term has its own (e.g. "Hobin", "IVDD").
+            if term is None:
+                term = word
+            elif term.islower() and word[0].isupper():
+                term = term.capitalize()
+            out.append(term)
+            last = token.end()
+        out.append(text[last:])
+        return "".join(out)
+
+def load_lexicon(*paths):
+    """Terms from one or more text files, one per line. A multi-word line ("lymph nodes") is one phrase."""
+    terms = []
+    for path in paths:
+        for line in Path(path).read_text().splitlines():
+            if line.strip() and not line.startswith("#"):
+                terms.append(line.strip())
+    return terms
+
+def english_words(path=None):
+    """Lowercase words of a system word list (STSOAPS_DICTIONARY, e.g. /usr/share/dict/words), or None if there isn't one."""
+    path = Path(path or config.DICTIONARY_PATH)
+    if not path.is_file():
+        warnings.warn(f"no English word list at {path}: vocabulary correction will only normalize exact lexicon matches")
+        return None
+    return {line.strip().lower() for line in path.read_text(errors="ignore").splitlines() if line.strip()}
+
+def lexicon_corrector(directory, dictionary=None):
+    """Corrector for the Whisper prompt terms plus every .txt lexicon in `directory`, leaving words of `dictionary` alone."""
+    prompt_terms = [term.strip() for term in config.WHISPER_PROMPT.split(",") if term.strip()]
+    return VocabularyCorrector(prompt_terms + load_lexicon(*sorted(Path(directory).glob("*.txt"))), known_words=english_words(dictionary))
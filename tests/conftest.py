@@ -0,0 +1,53 @@
+import hashlib
+import os
+import re
+import tempfile
+
+# Settings are read when `stsoaps` is first imported: keep the tests off the
+# real data folder, Qdrant and OpenAI.
+os.environ["STSOAPS_DATA_DIR"] = tempfile.mkdtemp(prefix="stsoaps_tests_")
+os.environ["QDRANT_PATH"] = ":memory:"
+for name in ["QDRANT_URL", "STSOAPS_CACHE_PATH", "STSOAPS_INPATIENT_PATH", "STSOAPS_ARCHIVE_DIR", "STSOAPS_TRACE_DIR", "STSOAPS_LEXICON_DIR"]:
+    os.environ.pop(name, None)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import uuid
+
+import pytest
+
+class HashingEmbedder:
+    """Stand-in for fastembed: bag-of-words vectors, so texts sharing words are close."""
+
+    dim = 64
+
+    def embed(self, texts, batch_size=256):
+        import numpy as np
+
+        for text in texts:
+            vector = np.zeros(self.dim, np.float32)
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                vector[int(hashlib.sha1(word.encode()).hexdigest(), 16) % self.dim] += 1
+            yield vector / max(np.linalg.norm(vector), 1e-6)
+
+    def query_embed(self, query):
+        return self.embed([query] if isinstance(query, str) else query)
+
+@pytest.fixture
+def embedder(monkeypatch):
+    from stsoaps import clients
+
+    fake = HashingEmbedder()
+    monkeypatch.setattr(clients, "embedder", lambda: fake)
+    monkeypatch.setattr(clients, "embedding_dim", lambda: fake.dim)
+    return fake
+
+@pytest.fixture
+def collection():
+    """A fresh collection name in the shared in-memory Qdrant, dropped afterwards."""
+    pytest.importorskip("qdrant_client")
+    from stsoaps import clients
+
+    name = f"test_{uuid.uuid4().hex[:8]}"
+    yield name
+    if clients.qdrant_client().collection_exists(name):
+        clients.qdrant_client().delete_collection(name)
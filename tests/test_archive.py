@@ -0,0 +1,53 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from stsoaps import archive
+from stsoaps.archive import ArchiveWriter, archive_notes, export_parquet, filter_notes, open_archive, vital_counts
+
+def note(temperature, bcs, assessment="Gastroenteritis"):
+    return {"subjective": "Vomiting.", "objective": {"temperature": temperature, "bodyConditionScore": bcs}, "assessment": assessment, "plan": "Fluids."}
+
+NOTES = [
+    ("a", note("103.5 F", 5), {"species": "Canine", "clinic": "Davis", "visit_date": "2024-03-01"}),
+    ("b", note(101.0, 7, ["R/O pancreatitis"]), {"species": "feline", "clinic": "Davis", "visit_date": "2024-03-02T10:00:00Z"}),
+    ("c", note(None, 200), {"species": "canine", "clinic": "Sacramento"}),
+]
+
+def test_round_trip(tmp_path):
+    assert archive_notes(NOTES, tmp_path, batch_size=2) == 3
+    assert [path.suffix for path in tmp_path.iterdir()] == [".arrow"]
+    table = open_archive(tmp_path)
+    assert table["note_id"].to_pylist() == ["a", "b", "c"]
+    assert table["temperature"].to_pylist() == [103.5, 101.0, None]
+    # A lone string assessment is one item, and a BCS validation rejects is null.
+    assert table["assessment"].to_pylist() == [["Gastroenteritis"], ["R/O pancreatitis"], ["Gastroenteritis"]]
+    assert table["bodyConditionScore"].to_pylist() == [5, 7, None]
+
+def test_queries(tmp_path):
+    archive_notes(NOTES, tmp_path)
+    table = open_archive(tmp_path)
+    assert filter_notes(table, species="CANINE")["note_id"].to_pylist() == ["a", "c"]
+    assert filter_notes(table, until="2024-03-01", above={"temperature": 102})["note_id"].to_pylist() == ["a"]
+    assert vital_counts(table).to_pylist() == [
+        {"clinic": "Davis", "bodyConditionScore": 5, "notes": 1},
+        {"clinic": "Davis", "bodyConditionScore": 7, "notes": 1},
+    ]
+    assert export_parquet(tmp_path / "notes.parquet", tmp_path) == 3
+
+def test_empty_archive(tmp_path):
+    assert open_archive(tmp_path).num_rows == 0
+
+def test_failed_write_leaves_no_file(tmp_path, monkeypatch):
+    # A value that slips past vital_value fails the int8 column when the batch is written.
+    monkeypatch.setattr(archive, "vital_value", lambda path, value, integer: 200 if integer else None)
+    with pytest.raises(pa.ArrowInvalid):
+        archive_notes(NOTES, tmp_path, batch_size=2)
+    assert list(tmp_path.iterdir()) == []
+
+def test_error_in_block_discards_file(tmp_path):
+    with pytest.raises(RuntimeError):
+        with ArchiveWriter(tmp_path, batch_size=1) as writer:
+            writer.append(*NOTES[0])
+            raise RuntimeError("stop")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,86 @@
+import asyncio
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from stsoaps import audio
+from stsoaps.audio import SAMPLE_RATE, PreparedAudio, encode_audio, preprocess_audio, speech_segments, stitch
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+def talk_pause_talk(pause=5.0, rng=np.random.default_rng(0)):
+    # Two 2 s bursts of speech-like noise around `pause` seconds of near silence.
+    burst = (0.2 * rng.standard_normal(2 * SAMPLE_RATE)).astype(np.float32)
+    silence = (1e-4 * rng.standard_normal(int(pause * SAMPLE_RATE))).astype(np.float32)
+    return np.concatenate([burst, silence, burst])
+
+def test_speech_segments_drop_long_pause():
+    segments = speech_segments(talk_pause_talk())
+    assert len(segments) == 2
+    assert segments[0][0] == 0
+    assert segments[1][0] / SAMPLE_RATE == pytest.approx(7.0, abs=0.4)
+
+def test_original_time():
+    prepared = PreparedAudio("trim.webm", "visit.m4a", [(0.0, 0.0, 2.3), (2.3, 6.7, 2.3)], 9.0, 4.6)
+    assert prepared.original_time(1.0) == 1.0
+    assert prepared.original_time(3.0) == pytest.approx(7.4)
+    assert prepared.original_time(100) == pytest.approx(9.0)
+
+def test_stitch_drops_overlap():
+    assert stitch("the dog is bright and alert", "bright and alert, heart sounds normal") == "the dog is bright and alert heart sounds normal"
+    assert stitch("", "first chunk") == "first chunk"
+
+@needs_ffmpeg
+def test_preprocess_trims_silence(tmp_path):
+    source = encode_audio(talk_pause_talk(), tmp_path / "visit.webm")
+    prepared = preprocess_audio(source, tmp_path)
+    assert prepared.original_seconds == pytest.approx(9.0, abs=0.1)
+    assert prepared.seconds < 6
+    assert prepared.original_time(prepared.segments[1][0] + 0.5) == pytest.approx(prepared.segments[1][1] + 0.5)
+
+@needs_ffmpeg
+def test_timestamps_mapped_to_original(tmp_path, monkeypatch):
+    source = encode_audio(talk_pause_talk(), tmp_path / "visit.webm")
+    calls = []
+
+    async def fake_atranscribe(path, seconds=None, timestamps=False):
+        calls.append(timestamps)
+        # One segment per burst, in trimmed-file time.
+        return [[0.0, 2.0, "bright and alert"], [seconds - 2.0, seconds, "heart sounds normal"]]
+
+    monkeypatch.setattr(audio, "atranscribe", fake_atranscribe)
+    segments = asyncio.run(audio.atranscribe_preprocessed(source, timestamps=True))
+    assert calls == [True]
+    assert [text for _, _, text in segments] == ["bright and alert", "heart sounds normal"]
+    assert segments[0][0] == 0.0
+    assert segments[1][0] == pytest.approx(7.0, abs=0.5)
+    assert segments[1][1] == pytest.approx(9.0, abs=0.1)
+    # Cached on the source recording.
+    assert asyncio.run(audio.atranscribe_preprocessed(source, timestamps=True)) == segments
+    assert calls == [True]
+
+@needs_ffmpeg
+@pytest.mark.parametrize("limit, reencoded", [(audio.WHISPER_MAX_BYTES, False), (1000, True)])
+def test_chunked_short_recording_over_limit_is_reencoded(tmp_path, monkeypatch, limit, reencoded):
+    source = tmp_path / "visit.wav"
+    pcm = (talk_pause_talk() * 32767).astype(np.int16).tobytes()
+    audio.subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "-", str(source)],
+                         input=pcm, check=True)
+    uploads = []
+
+    async def fake_atranscribe(path, seconds=None):
+        # The re-encoded file is gone once the call returns, so size it now.
+        uploads.append((Path(path), Path(path).stat().st_size))
+        return "bright and alert"
+
+    monkeypatch.setattr(audio, "WHISPER_MAX_BYTES", limit)
+    monkeypatch.setattr(audio, "atranscribe", fake_atranscribe)
+    assert asyncio.run(audio.atranscribe_chunked(source)) == "bright and alert"
+    [(path, size)] = uploads
+    if reencoded:
+        assert path.suffix == ".webm"
+        assert size < source.stat().st_size
+    else:
+        assert path == source
@@ -0,0 +1,64 @@
+import asyncio
+import csv
+import json
+import time
+
+from stsoaps import clients
+from stsoaps.batch import TokenBucket, load_recordings, note_id, run_batch, write_results
+from stsoaps.stub import STUB_TRANSCRIPT, StubServer
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate=20, capacity=2)
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    assert 0.08 <= asyncio.run(run()) < 0.5
+    # The bucket is shared across `asyncio.run` calls, each on its own loop.
+    assert asyncio.run(run()) >= 0.08
+
+def test_load_recordings(tmp_path):
+    for name in ["b.m4a", "a.wav", "notes.txt"]:
+        (tmp_path / name).touch()
+    assert [path.name for path, _ in load_recordings(tmp_path)] == ["a.wav", "b.m4a"]
+    (tmp_path / "day.csv").write_text("path,patient,visit_date\na.wav,remy,2024-03-01\n")
+    assert load_recordings(tmp_path / "day.csv") == [(tmp_path / "a.wav", {"patient": "remy", "visit_date": "2024-03-01"})]
+    (tmp_path / "day.txt").write_text("# skipped\nb.m4a\n\n")
+    assert load_recordings(tmp_path / "day.txt") == [(tmp_path / "b.m4a", {})]
+
+def test_note_id_unique_per_path(tmp_path):
+    assert note_id(tmp_path / "a" / "remy.m4a").startswith("remy-")
+    assert note_id(tmp_path / "a" / "remy.m4a") != note_id(tmp_path / "b" / "remy.m4a")
+
+def test_run_batch_against_stub(tmp_path):
+    for name in ["remy.m4a", "bella.m4a", "broken.m4a"]:
+        (tmp_path / name).touch()
+
+    async def transcribe(path):
+        if path.stem == "broken":
+            raise ValueError("unreadable audio")
+        return STUB_TRANSCRIPT + " " + path.stem
+
+    async def run(client):
+        try:
+            return await run_batch(tmp_path, concurrency=2, transcribe=transcribe)
+        finally:
+            await client.close()
+
+    with StubServer() as stub, clients.using_openai(stub.url, "stub") as (_, client):
+        results = asyncio.run(run(client))
+    assert [r.path for r in results] == sorted(str(tmp_path / name) for name in ["remy.m4a", "bella.m4a", "broken.m4a"])
+    broken = next(r for r in results if r.error)
+    assert broken.error == "ValueError: unreadable audio"
+    assert all(r.soap_note is not None for r in results if r is not broken)
+
+    out = tmp_path / "out"
+    write_results(results, out)
+    assert len(list(out.glob("*.json"))) == 2
+    note = json.loads((out / (note_id(tmp_path / "remy.m4a") + ".json")).read_text())
+    assert note["transcript"].endswith("remy")
+    with open(out / "summary.csv", newline="") as f:
+        assert sorted(row["status"] for row in csv.DictReader(f)) == ["failed", "ok", "ok"]
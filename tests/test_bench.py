@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from stsoaps import bench, clients
+
+@pytest.fixture
+def fresh_collections():
+    yield
+    for collection in ["bench_sections", "bench_float32", "bench_scalar", "bench_binary"]:
+        if clients.qdrant_client().collection_exists(collection):
+            clients.qdrant_client().delete_collection(collection)
+
+def test_ram_per_million():
+    assert bench.ram_per_million(None, dim=384) == 1_000_000 * (384 * 4 + 128)
+    assert bench.ram_per_million("binary", dim=384) < bench.ram_per_million("scalar", dim=384) < bench.ram_per_million(None, dim=384)
+
+def test_benchmark_search(embedder, fresh_collections, capsys):
+    bench.benchmark_search(n_notes=40, repeats=1)
+    out = capsys.readouterr().out
+    assert "bm25: recall@10" in out and "hybrid: recall@10" in out
+
+def test_benchmark_quantization(embedder, fresh_collections, capsys):
+    bench.benchmark_quantization(n_notes=40, n_queries=5)
+    out = capsys.readouterr().out
+    assert out.count("(estimated)") == 5
+    # Local mode searches float32 exactly whatever the config says.
+    assert "recall@10 1.000" in out
+
+def test_peak_rss_is_megabytes():
+    assert 1 < bench.peak_rss_mb() < 100_000
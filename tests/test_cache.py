@@ -0,0 +1,91 @@
+import threading
+
+from stsoaps import cache
+from stsoaps.cache import SQLiteCache, bypass_caches
+
+def test_put_get_and_lru_eviction(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"), "things", max_bytes=1000)
+    for i in range(10):
+        store.put(f"k{i}", "x" * 100)
+    store.get("k0")
+    store.put("k10", "x" * 100)
+    # Down to the low-water mark, least recently used first; k0 was just read.
+    assert store.size <= 1000 * cache.LOW_WATER
+    assert store.get("k0") is not None
+    assert store.get("k1") is None
+    assert store.get("k10") is not None
+
+def test_get_many_keeps_order(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"), "things", max_bytes=10_000)
+    store.put_many([("a", "1"), ("b", "2")])
+    assert store.get_many(["b", "missing", "a"]) == ["2", None, "1"]
+
+def test_ttl(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"), "things", max_bytes=10_000, ttl=-1)
+    store.put("a", "1")
+    assert store.get("a") is None
+    assert store.size == 0
+
+def test_threads_share_the_connection(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"), "things", max_bytes=10**6)
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(50):
+                store.put_many([(f"{n}-{i}-{j}", "v") for j in range(5)])
+                store.get_many([f"{n}-{i}-{j}" for j in range(5)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert store.get_many(["7-49-4"]) == ["v"]
+
+def test_eviction_counts_other_writers(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = SQLiteCache(path, "things", max_bytes=1000)
+    second = SQLiteCache(path, "things", max_bytes=1000)
+    first.put("seed", "x")
+    second.put("seed2", "x")
+    for i in range(9):
+        first.put(f"a{i}", "x" * 100)
+    for i in range(9):
+        second.put(f"b{i}", "x" * 100)
+    # Neither cache saw the other one's writes, but both recount the table as they go.
+    assert first.stored_size(first.db) <= 1000
+
+def test_bypass(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"), "things", max_bytes=10_000)
+    store.put("a", "1")
+    with bypass_caches():
+        assert store.get("a") is None
+        store.put("b", "2")
+    assert store.get("b") is None
+    assert store.get("a") == "1"
+
+def test_completion_key_is_canonical():
+    assert cache.completion_key({"model": "m", "temperature": 0}) == cache.completion_key({"temperature": 0, "model": "m"})
+    assert cache.cacheable({"temperature": 0})
+    assert not cache.cacheable({"temperature": 0.7})
+    assert not cache.cacheable({"temperature": 0, "stream": True})
+
+def test_cached_completion_against_stub():
+    from stsoaps import clients, config
+    from stsoaps.stub import StubServer
+
+    request = dict(model=config.SOAP_MODEL, messages=[{"role": "user", "content": "T 101.2, P 96"}])
+    chat = "/v1/chat/completions", 200
+    with StubServer() as stub, clients.using_openai(stub.url, "stub") as (client, _):
+        first = cache.cached_completion(client.chat.completions.create, temperature=0, **request)
+        again = cache.cached_completion(client.chat.completions.create, temperature=0, **request)
+        assert stub.requests[chat] == 1
+        assert again.choices[0].message.function_call.arguments == first.choices[0].message.function_call.arguments
+        cache.cached_completion(client.chat.completions.create, temperature=0.7, **request)
+        cache.cached_completion(client.chat.completions.create, temperature=0, bypass=True, **request)
+        assert stub.requests[chat] == 3
+        client.close()
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from stsoaps import cascade, config
+from stsoaps.cascade import agenerate_soap_cascade, cascade_summary, completeness_problems
+from stsoaps.schema import SOAP_NOTE, json_skeleton
+
+TRANSCRIPT = "Remy has been vomiting since yesterday. T 103.1, HR 120."
+
+def good_note():
+    note = json_skeleton(SOAP_NOTE)
+    note["subjective"] = "Vomiting since yesterday."
+    note["objective"].update(temperature=103.1, pulse=120, bodyConditionScore=5)
+    note["assessment"] = ["R/O pancreatitis"]
+    note["plan"] = "cPL, maropitant."
+    return note
+
+def completion(arguments):
+    message = {"role": "assistant", "content": None}
+    if arguments is None:
+        message["content"] = "Here are the SOAP notes: ..."
+    else:
+        message["function_call"] = {"name": "generate_SOAP_notes", "arguments": json.dumps(arguments)}
+    return ChatCompletion.model_validate({
+        "id": "test", "object": "chat.completion", "created": 0, "model": "test",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+    })
+
+@pytest.fixture(autouse=True)
+def fresh_counts(monkeypatch):
+    monkeypatch.setattr(cascade, "cascade_paths", cascade.Counter())
+    monkeypatch.setattr(cascade, "escalation_reasons", cascade.Counter())
+
+def run_cascade(fast_note):
+    models = []
+
+    async def create(**kwargs):
+        models.append(kwargs["model"])
+        return completion(fast_note if kwargs["model"] == config.FAST_SOAP_MODEL else good_note())
+
+    # Each case gets its own transcript, so the completion cache never answers for another case.
+    note = asyncio.run(agenerate_soap_cascade(f"{TRANSCRIPT} ({json.dumps(fast_note)})", create=create))
+    return note, models
+
+def test_completeness_problems():
+    assert completeness_problems(good_note(), TRANSCRIPT) == []
+    note = good_note()
+    note["objective"]["pulse"] = None
+    note["assessment"] = []
+    assert completeness_problems(note, TRANSCRIPT) == ["no assessment items", "missing stated vital pulse"]
+    assert completeness_problems("prose", TRANSCRIPT) == ["schema:  expected object, got str"]
+
+def test_fast_note_kept():
+    note, models = run_cascade(good_note())
+    assert note == good_note()
+    assert models == [config.FAST_SOAP_MODEL]
+    assert cascade_summary()["paths"] == {"fast": 1.0}
+
+@pytest.mark.parametrize("fast_note, reason", [
+    ({**good_note(), "plan": ""}, "empty plan"),
+    ({**good_note(), "objective": {**good_note()["objective"], "bodyConditionScore": 12}}, "schema"),
+    (None, "unparseable"),  # prose instead of a function call
+])
+def test_escalates(fast_note, reason):
+    note, models = run_cascade(fast_note)
+    assert note == good_note()
+    assert models == [config.FAST_SOAP_MODEL, config.SOAP_MODEL]
+    summary = cascade_summary()
+    assert summary["paths"] == {"escalated": 1.0}
+    assert list(summary["escalation_reasons"]) == [reason]
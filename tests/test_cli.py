@@ -0,0 +1,40 @@
+import csv
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from stsoaps import __version__, clients
+from stsoaps.cli import main, parser
+from stsoaps.stub import STUB_TRANSCRIPT, StubServer
+
+def test_soap_path_imports_no_search_stack():
+    # `stsoaps soap` workers must not pay for Qdrant, fastembed or ONNX.
+    code = (
+        "import sys; from stsoaps import cli, batch, sections, vitals, cascade, inpatient; cli.parser(); "
+        "print(sorted(m for m in ('qdrant_client', 'fastembed', 'onnxruntime', 'pyarrow') if m in sys.modules))"
+    )
+    run = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parents[1], capture_output=True, text=True, check=True)
+    assert run.stdout.strip() == "[]"
+
+def test_version(capsys):
+    with pytest.raises(SystemExit):
+        parser().parse_args(["--version"])
+    assert capsys.readouterr().out.strip() == f"stsoaps {__version__}"
+
+def test_soap_mode_choices():
+    args = parser().parse_args(["soap", "recordings", "--out", "notes", "--mode", "cascade", "--trim"])
+    assert (args.mode, args.trim, args.chunked) == ("cascade", True, False)
+    with pytest.raises(SystemExit):
+        parser().parse_args(["soap", "recordings", "--out", "notes", "--mode", "fast"])
+
+def test_transcribe_and_soap_against_stub(tmp_path, capsys):
+    (tmp_path / "remy.m4a").write_bytes(b"not really audio")
+    with StubServer() as stub, clients.using_openai(stub.url, "stub"):
+        assert main(["transcribe", str(tmp_path / "remy.m4a"), "--json"]) == 0
+        assert json.loads(capsys.readouterr().out) == {"path": str(tmp_path / "remy.m4a"), "transcript": STUB_TRANSCRIPT}
+        assert main(["soap", str(tmp_path), "--out", str(tmp_path / "notes")]) == 0
+    with open(tmp_path / "notes" / "summary.csv", newline="") as f:
+        assert [row["status"] for row in csv.DictReader(f)] == ["ok"]
@@ -0,0 +1,15 @@
+import pytest
+
+from stsoaps import clients
+
+def test_using_openai_restores_the_shared_pair():
+    shared = clients.openai_pair()
+    with clients.using_openai("http://127.0.0.1:9/v1", "stub") as (sync, async_):
+        assert clients.openai_client() is sync and clients.async_openai_client() is async_
+        assert str(sync.base_url) == "http://127.0.0.1:9/v1/"
+        assert sync.max_retries == 0
+    assert clients.openai_pair() is shared
+
+def test_qdrant_client_is_shared():
+    pytest.importorskip("qdrant_client")
+    assert clients.qdrant_client() is clients.qdrant_client()
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from stsoaps import config
+
+def settings(**environ):
+    code = "from stsoaps import config; print(config.CACHE_PATH, config.CHAT_RPM, config.TRACE_DIR)"
+    env = {**os.environ, **environ}
+    run = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parents[1], env=env, capture_output=True, text=True, check=True)
+    return run.stdout.split()
+
+def test_env_defaults_and_casts(monkeypatch):
+    monkeypatch.setenv("STSOAPS_TEST_NUMBER", "12")
+    monkeypatch.setenv("STSOAPS_TEST_EMPTY", "")
+    assert config.env("STSOAPS_TEST_NUMBER", 5, int) == 12
+    assert config.env("STSOAPS_TEST_EMPTY", "default") == "default"
+    assert config.env("STSOAPS_TEST_MISSING") is None
+
+def test_paths_follow_data_dir(tmp_path):
+    assert settings(STSOAPS_DATA_DIR=str(tmp_path), STSOAPS_CHAT_RPM="60") == [str(tmp_path / "cache.sqlite"), "60", "None"]
+    assert settings(STSOAPS_CACHE_PATH=str(tmp_path / "c.sqlite"))[0] == str(tmp_path / "c.sqlite")
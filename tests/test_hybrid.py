@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from stsoaps import clients
+from stsoaps.hybrid import lexical_ranking, reciprocal_rank_fusion, search
+from stsoaps.index import ensure_collection, ensure_sections_collection, index_sections, point_id, sparse_query, sparse_vector, sync_sections
+
+NOTES = [
+    (f"n{i}", {"subjective": text, "plan": plan}, {"species": species, "clinic": clinic})
+    for i, (text, plan, species, clinic) in enumerate([
+        ("Possible lepto exposure at the lake", "Lepto titer and urinalysis", "dog", "north"),
+        ("Vomiting twice since yesterday", "Bland diet", "dog", "south"),
+        ("Sneezing and ocular discharge", "Doxycycline", "cat", "north"),
+        ("Lepto vaccine reaction, facial swelling", "Diphenhydramine", "dog", "south"),
+    ])
+]
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]])
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+
+def test_sparse_vectors():
+    vector = sparse_vector("lepto lepto titer")
+    assert len(vector.indices) == 2
+    assert max(vector.values) > min(vector.values)
+    assert sparse_query("Lepto, lepto!").indices == sparse_query("lepto").indices
+
+def test_lexical_ranking_filters_before_ranking(embedder, collection):
+    index_sections(NOTES, collection=collection)
+    assert set(lexical_ranking("lepto", 10, collection)) == {point_id(f"n{i}/{s}/0") for i, s in [(0, "subjective"), (0, "plan"), (3, "subjective")]}
+    # Only one clinic's lepto note: found however far down the unfiltered ranking it is.
+    assert lexical_ranking("lepto", 1, collection, clinic="south") == [point_id("n3/subjective/0")]
+    assert lexical_ranking("...", 10, collection) == []
+
+def test_search_reflects_sync(embedder, collection):
+    sync_sections(NOTES, collection=collection)
+    hits = search("lepto", k=3, collection=collection)
+    assert {payload["note_id"] for _, payload in hits} == {"n0", "n3"}
+    assert {payload["note_id"] for _, payload in search("lepto", k=3, collection=collection, species="cat")} <= {"n2"}
+    sync_sections([("n3", {"subjective": "Facial swelling after vaccine", "plan": "Diphenhydramine"}, NOTES[3][2])], collection=collection)
+    lexical = lexical_ranking("lepto", 10, collection)
+    assert point_id("n3/subjective/0") not in lexical and point_id("n0/plan/0") in lexical
+
+def test_old_collection_is_rejected(embedder, collection):
+    ensure_collection(collection)
+    with pytest.raises(ValueError, match="sparse"):
+        ensure_sections_collection(collection)
+    assert clients.qdrant_client().collection_exists(collection)
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from stsoaps import clients
+from stsoaps.index import index_notes, indexed_points, index_sections, iter_notes, point_id, search_sections, section_chunks, section_points, sync_sections
+
+NOTES = [
+    ("n1", {"subjective": "Vomiting since yesterday", "objective": {"temperature": 103.1}, "assessment": ["R/O pancreatitis"], "plan": "Start maropitant"},
+     {"species": "dog", "patient": "Rex", "clinic": "north", "visit_date": "2024-03-01"}),
+    ("n2", {"subjective": "Coughing at night", "assessment": "Kennel cough", "plan": "Doxycycline for two weeks"},
+     {"species": "dog", "patient": "Bella", "clinic": "south", "visit_date": "2024-05-10"}),
+    ("n3", {"subjective": "Not eating, hiding", "assessment": ["Hepatic lipidosis", "dehydration"], "plan": "Feeding tube and fluids"},
+     {"species": "cat", "patient": "Tom", "clinic": "north", "visit_date": "2024-06-02"}),
+]
+
+def test_index_notes_is_idempotent(embedder, collection):
+    assert index_notes(NOTES, collection=collection, batch_size=2) == 3
+    assert index_notes(NOTES[:1], collection=collection) == 1
+    qdrant = clients.qdrant_client()
+    assert qdrant.count(collection).count == 3
+    [point] = qdrant.retrieve(collection, [point_id("n3")], with_payload=True)
+    assert point.payload["note_id"] == "n3" and "Hepatic lipidosis" in point.payload["text"]
+
+def test_section_chunks():
+    chunks = list(section_chunks(NOTES[0][1]))
+    assert [section for section, _, _ in chunks] == ["subjective", "objective", "assessment", "plan"]
+    assert "temperature: 103.1" in chunks[1][2]
+    # A lone string assessment is one section, not one per character.
+    assert [text for section, _, text in section_chunks(NOTES[1][1]) if section == "assessment"] == ["Kennel cough"]
+
+def test_search_sections_filters(embedder, collection):
+    index_sections(NOTES, collection=collection)
+    hits = search_sections("maropitant", k=3, collection=collection)
+    assert hits[0].payload["note_id"] == "n1" and hits[0].payload["section"] == "plan"
+    hits = search_sections("fluids", k=10, collection=collection, species="cat", section="plan")
+    assert [(hit.payload["note_id"], hit.payload["section"]) for hit in hits] == [("n3", "plan")]
+    hits = search_sections("cough", k=10, collection=collection, since="2024-05-01", until="2024-05-31")
+    assert {hit.payload["note_id"] for hit in hits} == {"n2"}
+    assert search_sections("cough", collection=collection, clinic="nowhere") == []
+
+def test_sync_only_touches_given_notes(embedder, collection):
+    assert sync_sections(NOTES, collection=collection) == (len(list(section_points(NOTES))), 0)
+    # Unchanged notes are skipped; an edited note replaces its sections.
+    edited = [("n2", {"subjective": "Coughing at night", "plan": "Rest"}, NOTES[1][2])]
+    assert sync_sections(edited, collection=collection) == (1, 1)
+    remaining = {payload["note_id"] for _, payload in indexed_points(collection, fields=["note_id"])}
+    assert remaining == {"n1", "n2", "n3"}
+    # Pruning drops the notes that weren't passed in.
+    sync_sections(edited, collection=collection, prune=True)
+    assert {payload["note_id"] for _, payload in indexed_points(collection, fields=["note_id"])} == {"n2"}
+
+def test_iter_notes_jsonl(tmp_path):
+    path = tmp_path / "notes.jsonl"
+    path.write_text("\n".join(json.dumps({"id": note_id, "soap_note": note, "metadata": metadata}) for note_id, note, metadata in NOTES))
+    assert [note_id for note_id, _, _ in iter_notes(path)] == ["n1", "n2", "n3"]
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from stsoaps import inpatient
+from stsoaps.batch import RecordingResult, current_recording
+from stsoaps.inpatient import NoteStore, PatchError, PatientLocks, agenerate_soap_inpatient, apply_patch, without_vitals
+from stsoaps.schema import SOAP_NOTE, json_skeleton
+
+def full_note():
+    note = json_skeleton(SOAP_NOTE)
+    note["subjective"] = "Day 1 of hospitalization for vomiting."
+    note["objective"].update(temperature=103.1, pulse=120, respiration=30, bodyConditionScore=5, weight=24.5, capillaryRefillTime=2)
+    note["objective"]["EENT"]["eyes"] = "normal"
+    note["assessment"] = ["Gastroenteritis"]
+    note["plan"] = "IV fluids."
+    return note
+
+NOTE = full_note()
+
+def completion(name, arguments):
+    return ChatCompletion.model_validate({
+        "id": "test", "object": "chat.completion", "created": 0, "model": "test",
+        "choices": [{"index": 0, "finish_reason": "function_call", "message": {
+            "role": "assistant", "content": None, "function_call": {"name": name, "arguments": json.dumps(arguments)},
+        }}],
+    })
+
+def test_apply_patch():
+    patched = apply_patch(NOTE, [
+        {"op": "replace", "path": "/subjective", "value": "Day 2, eating."},
+        {"op": "add", "path": "/assessment/-", "value": "R/O pancreatitis"},
+        {"op": "remove", "path": "/objective/EENT/eyes"},
+    ])
+    assert patched["subjective"] == "Day 2, eating."
+    assert patched["assessment"] == ["Gastroenteritis", "R/O pancreatitis"]
+    assert patched["objective"]["EENT"]["eyes"] is None
+    assert NOTE["assessment"] == ["Gastroenteritis"]
+
+@pytest.mark.parametrize("operation", [
+    {"op": "move", "path": "/plan"},
+    {"op": "replace", "path": "/owner", "value": "x"},
+    {"op": "replace", "path": "/assessment/5", "value": "x"},
+    {"op": "add", "path": "/plan"},
+])
+def test_apply_patch_rejects(operation):
+    with pytest.raises(PatchError):
+        apply_patch(NOTE, [operation])
+
+def test_without_vitals():
+    objective = without_vitals(NOTE)["objective"]
+    assert objective["temperature"] is objective["bodyConditionScore"] is None
+    assert objective["EENT"]["eyes"] == "normal"
+
+def test_patient_locks_per_loop_and_released():
+    locks = PatientLocks()
+    order = []
+
+    async def visit(patient, i):
+        async with locks.hold(patient):
+            order.append((patient, i, "start"))
+            await asyncio.sleep(0.01)
+            order.append((patient, i, "end"))
+
+    async def run():
+        await asyncio.gather(visit("remy", 1), visit("remy", 2), visit("bella", 1))
+        return dict(locks.locks)
+
+    # A second `asyncio.run` gets a new loop; a lock from the first would fail there.
+    for _ in range(2):
+        order.clear()
+        assert asyncio.run(run()) == {}
+        remy = [step for patient, *step in order if patient == "remy"]
+        assert remy == [[1, "start"], [1, "end"], [2, "start"], [2, "end"]]
+
+def test_inpatient_patches_second_day(tmp_path, monkeypatch):
+    store = NoteStore(str(tmp_path / "inpatient.sqlite"))
+    monkeypatch.setattr(inpatient, "update_paths", inpatient.Counter())
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs["functions"][0]["name"])
+        if kwargs["functions"][0]["name"] == "update_SOAP_notes":
+            return completion("update_SOAP_notes", {"patch": [{"op": "replace", "path": "/subjective", "value": "Day 2, eating."}]})
+        return completion("generate_SOAP_notes", NOTE)
+
+    async def visit(day):
+        current_recording.set(RecordingResult(path="rounds.m4a", metadata={"patient": "remy", "visit_date": day}))
+        return await agenerate_soap_inpatient("Remy is doing better.", create=create, store=store)
+
+    first = asyncio.run(visit("2024-03-01"))
+    second = asyncio.run(visit("2024-03-02"))
+    assert first == NOTE
+    assert second["subjective"] == "Day 2, eating."
+    assert second["objective"]["temperature"] is None
+    assert requests == ["generate_SOAP_notes", "update_SOAP_notes"]
+    assert inpatient.update_paths == {"first_day": 1, "patched": 1}
+    assert store.previous("remy", "2024-03-03")[0] == "2024-03-02"
@@ -0,0 +1,90 @@
+import asyncio
+import shutil
+
+import numpy as np
+import pytest
+
+from stsoaps import live
+from stsoaps.audio import SAMPLE_RATE
+from stsoaps.live import LiveSession, affected_sections, live_scribe, pcm_frames
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+PIECES = ["Owner says he's been vomiting since yesterday.", "T 101.5, heart sounds normal.", "R/O pancreatitis, start maropitant."]
+
+def visit(seconds=9, rng=np.random.default_rng(0)):
+    # 1.5 s bursts of speech-like noise, each followed by a 0.5 s pause, in 0.5 s frames.
+    samples = np.zeros(seconds * SAMPLE_RATE, np.float32)
+    for start in range(0, len(samples), 2 * SAMPLE_RATE):
+        burst = 0.2 * rng.standard_normal(int(1.5 * SAMPLE_RATE)).astype(np.float32)
+        samples[start:start + len(burst)] = burst[:len(samples) - start]
+    frame = SAMPLE_RATE // 2
+    return [samples[i:i + frame] for i in range(0, len(samples), frame)]
+
+async def frames_of(frames):
+    for frame in frames:
+        yield frame
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    # Each Whisper call returns the next of `pieces` (the last one from then on); None fails the call.
+    calls = {"transcribe": [], "sections": [], "pieces": list(PIECES)}
+
+    async def atranscribe(path, prompt=None, seconds=None):
+        calls["transcribe"].append(prompt)
+        pieces = calls["pieces"]
+        piece = pieces[min(len(calls["transcribe"]), len(pieces)) - 1]
+        if piece is None:
+            raise RuntimeError("upload failed")
+        return piece
+
+    async def agenerate_section(section, transcript):
+        calls["sections"].append(section)
+        return f"{section} from {len(transcript.split())} words"
+
+    monkeypatch.setattr(live, "atranscribe", atranscribe)
+    monkeypatch.setattr(live, "agenerate_section", agenerate_section)
+    return calls
+
+def test_affected_sections():
+    assert affected_sections(PIECES[0]) == {"subjective"}
+    assert affected_sections(PIECES[1]) == {"objective"}
+    assert affected_sections(PIECES[2]) == {"assessment", "plan"}
+    assert affected_sections("Okay, let's see.") == {"subjective"}
+
+def test_pcm_frames_keep_odd_bytes():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data((np.array([1000, -1000, 32767], "<i2").tobytes())[:3])
+        reader.feed_data(np.array([1000, -1000, 32767], "<i2").tobytes()[3:])
+        reader.feed_eof()
+        return np.concatenate([frame async for frame in pcm_frames(reader)])
+
+    assert np.allclose(asyncio.run(run()) * 32768, [1000, -1000, 32767])
+
+@needs_ffmpeg
+def test_live_scribe(fake_api):
+    note = asyncio.run(live_scribe(frames_of(visit()), window_seconds=3))
+    assert len(fake_api["transcribe"]) >= 3
+    # Each window is prompted with the transcript so far.
+    assert "vomiting" in fake_api["transcribe"][1]
+    assert set(note) == {"subjective", "objective", "assessment", "plan"}
+    assert all(value is not None for value in note.values())
+
+@needs_ffmpeg
+def test_failed_window_is_skipped(fake_api):
+    fake_api["pieces"] = [PIECES[0], None, None, PIECES[2]]
+
+    async def run():
+        session = LiveSession(window_seconds=3)
+        for frame in visit():
+            await session.feed(frame)
+        return session, await session.finish()
+
+    session, note = asyncio.run(run())
+    # The second window fails on both attempts and is skipped; the rest go on.
+    [(start, seconds, error)] = session.skipped
+    assert 0 < start < 9 and 0 < seconds <= 5
+    assert error == "RuntimeError: upload failed"
+    assert "vomiting" in session.transcript and "maropitant" in session.transcript
+    assert note["plan"] is not None
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from stsoaps import clients
+from stsoaps.index import index_sections, indexed_points
+from stsoaps.parallel import EmbeddingWorkers, index_sections_parallel
+
+NOTES = [
+    (f"n{i}", {"subjective": f"Visit {i}, vomiting", "assessment": ["Gastritis"], "plan": "Maropitant"}, {"species": "dog"})
+    for i in range(5)
+]
+
+def test_dead_worker_is_reported():
+    with EmbeddingWorkers(workers=1, batch_size=2, dim=4) as pool:
+        pool.processes[0].kill()
+        with pytest.raises(RuntimeError, match="embedding worker"):
+            list(pool.embed([("a", ["vomiting"])]))
+
+def test_matches_index_sections(collection):
+    pytest.importorskip("fastembed")
+    serial = collection + "_serial"
+    try:
+        assert index_sections_parallel(NOTES, collection=collection, workers=2, batch_size=4) == index_sections(NOTES, collection=serial)
+        assert dict(indexed_points(collection)) == dict(indexed_points(serial))
+    finally:
+        clients.qdrant_client().delete_collection(serial)
@@ -0,0 +1,50 @@
+import json
+import math
+
+from stsoaps.schema import SOAP_NOTE, SOAPNote, VITALS, as_float, attribute_name, functions, json_skeleton, note_text
+
+NOTE = {
+    "subjective": "Vomiting since yesterday.",
+    "objective": {"temperature": 102.5, "bodyConditionScore": 5, "H/L": {"heart": "no murmur"}, "EENT": {"dental": "mild calculus"}},
+    "assessment": ["R/O pancreatitis", "gastritis"],
+    "plan": "Maropitant 1 mg/kg SQ.",
+}
+
+def test_function_spec_matches_schema():
+    parameters = functions[0]["parameters"]
+    assert parameters["required"] == [child.name for child in SOAP_NOTE.children]
+    assert parameters["properties"]["objective"]["properties"]["bodyConditionScore"]["enum"] == list(range(1, 10))
+    assert json_skeleton(SOAP_NOTE)["assessment"] == [""]
+
+def test_round_trip():
+    note = SOAPNote.from_json(json.dumps(NOTE))
+    assert note.temperature == 102.5
+    assert note.bodyConditionScore == 5
+    assert note.pulse is None
+    assert note.HL_heart == "no murmur"
+    assert note.assessment == ("R/O pancreatitis", "gastritis")
+    back = note.to_dict()
+    assert back["objective"]["EENT"]["dental"] == "mild calculus"
+    assert back["assessment"] == NOTE["assessment"]
+    assert set(back) == {child.name for child in SOAP_NOTE.children}
+
+def test_string_assessment_is_one_item():
+    note = SOAPNote.from_dict({"assessment": "A1 foo"})
+    assert note.assessment == ("A1 foo",)
+    assert "assessment: A1 foo" in note_text({"assessment": "A1 foo"})
+
+def test_non_finite_vitals_are_null():
+    note = SOAPNote.from_json('{"objective": {"temperature": Infinity, "bodyConditionScore": NaN}}')
+    assert note.temperature is None and note.bodyConditionScore is None
+    assert json.loads(note.to_json())["objective"]["temperature"] is None
+    assert math.isnan(as_float(10 ** 400))
+    assert math.isnan(as_float(True))
+
+def test_attribute_names():
+    assert [attribute_name(path) for path, _ in VITALS][:2] == ["temperature", "pulse"]
+    assert attribute_name(("objective", "H/L", "heart")) == "HL_heart"
+
+def test_note_text():
+    text = note_text(NOTE)
+    assert "objective EENT dental: mild calculus" in text
+    assert "assessment: R/O pancreatitis; gastritis" in text
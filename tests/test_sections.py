@@ -0,0 +1,28 @@
+import asyncio
+
+from stsoaps import clients
+from stsoaps.schema import SOAP_NOTE, json_skeleton
+from stsoaps.sections import SECTION_FUNCTIONS, SOAP_SECTIONS, VMTH_PREAMBLE, VMTH_SECTION_GUIDES, agenerate_soap_sections
+from stsoaps.stub import STUB_TRANSCRIPT, StubServer
+
+def test_vmth_guide_split():
+    assert list(VMTH_SECTION_GUIDES) == SOAP_SECTIONS
+    assert all(guide.startswith(section.upper()) for section, guide in VMTH_SECTION_GUIDES.items())
+    assert "\n" not in VMTH_PREAMBLE
+
+def test_section_functions():
+    objective = SECTION_FUNCTIONS["objective"]
+    assert objective["name"] == "generate_objective"
+    assert list(objective["parameters"]["properties"]) == ["objective"]
+
+def test_sections_merged_against_stub():
+    async def run(client):
+        try:
+            return await agenerate_soap_sections(STUB_TRANSCRIPT)
+        finally:
+            await client.close()
+
+    with StubServer() as stub, clients.using_openai(stub.url, "stub") as (_, client):
+        note = asyncio.run(run(client))
+        assert stub.requests["/v1/chat/completions", 200] == 4
+    assert note == json_skeleton(SOAP_NOTE)
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from stsoaps import clients
+from stsoaps.streaming import IncrementalJSONParser, astream_soap
+from stsoaps.stub import STUB_TRANSCRIPT, MockOpenAI
+from stsoaps.synthetic import synthetic_notes
+
+DOCUMENT = {
+    "subjective": 'Owner says "he\'s off" since Tuesday \\ not eating.',
+    "objective": {"temperature": 102.5, "pulse": 120, "EENT": {"eyes": "clear"}, "hydrationStatus": None},
+    "assessment": ["R/O pancreatitis", "gastritis"],
+    "plan": "Maropitant 1 mg/kg SQ.",
+}
+
+def parse(text, size):
+    parser = IncrementalJSONParser()
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+def test_same_events_however_the_text_is_split():
+    text = json.dumps(DOCUMENT, indent=1)
+    whole = parse(text, len(text))
+    assert parse(text, 1) == parse(text, 7) == whole
+    assert dict(whole)[()] == DOCUMENT
+    paths = [path for path, _ in whole]
+    assert paths[:3] == [("subjective",), ("objective", "temperature"), ("objective", "pulse")]
+    assert ("objective", "EENT", "eyes") not in paths
+    assert (("assessment", 1), "gastritis") in whole
+
+def test_value_reported_as_soon_as_it_closes():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"subjective": "Vomiting') == []
+    assert parser.feed('.", "objective": {"pulse": 12') == [(("subjective",), "Vomiting.")]
+    assert parser.feed("0}") == [(("objective", "pulse"), 120), (("objective",), {"pulse": 120})]
+
+def test_astream_soap_against_mock():
+    async def run(client):
+        try:
+            return [event async for event in astream_soap(STUB_TRANSCRIPT)]
+        finally:
+            await client.close()
+
+    with MockOpenAI(scale=0, n_notes=1, chunk_chars=5) as mock, clients.using_openai(mock.url, "stub") as (_, client):
+        events = asyncio.run(run(client))
+    [(_, expected, _)] = synthetic_notes(1, 0)
+    assert events[-1] == ((), expected)
+    assert events[0][0] == ("subjective",)
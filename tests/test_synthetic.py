@@ -0,0 +1,16 @@
+from stsoaps.index import section_chunks
+from stsoaps.synthetic import JARGON, synthetic_notes
+from stsoaps.validation import validate_note
+
+def test_deterministic_and_valid():
+    notes = list(synthetic_notes(50, seed=3))
+    assert notes == list(synthetic_notes(50, seed=3))
+    assert notes != list(synthetic_notes(50, seed=4))
+    assert [note_id for note_id, _, _ in notes[:2]] == ["synthetic-0", "synthetic-1"]
+    # Sparse like real notes (no respiration, no H/L, ...), but every value they do have is valid.
+    assert {error.message for _, note, _ in notes for error in validate_note(note)[1]} == {"missing required field"}
+
+def test_about_a_third_of_sections_mention_jargon():
+    sections = [text for _, note, _ in synthetic_notes(300) for _, _, text in section_chunks(note)]
+    share = sum(any(term in text for term in JARGON) for text in sections) / len(sections)
+    assert 0.2 < share < 0.5
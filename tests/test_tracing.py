@@ -0,0 +1,69 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from stsoaps.tracing import PRICES, Tracer
+
+def test_nested_spans_follow_tasks():
+    tracer = Tracer()
+
+    async def transcribe():
+        with tracer.span("transcribe"):
+            await asyncio.sleep(0)
+
+    def encode():
+        with tracer.span("encode"):
+            pass
+
+    async def appointment():
+        with tracer.span("appointment") as root:
+            await asyncio.gather(transcribe(), asyncio.to_thread(encode))
+        return root
+
+    root = asyncio.run(appointment())
+    stages = [span for span in tracer.spans if span is not root]
+    assert sorted(span.name for span in stages) == ["encode", "transcribe"]
+    assert all(span.parent_id == root.span_id and span.trace_id == root.trace_id and span.root is root for span in stages)
+
+def test_usage_is_charged_to_the_root():
+    tracer = Tracer()
+    with tracer.span("appointment") as root:
+        with tracer.span("chat"):
+            tracer.record_usage("gpt-4-1106-preview", SimpleNamespace(prompt_tokens=1000, completion_tokens=1000))
+        with tracer.span("transcribe"):
+            tracer.record_audio("whisper-1", 120)
+    assert root.attributes["cost_usd"] == pytest.approx(0.04 + 2 * PRICES["whisper-1"])
+    metrics = tracer.metrics.text()
+    assert 'stsoaps_tokens_total{kind="prompt",model="gpt-4-1106-preview"} 1000' in metrics
+    assert 'stsoaps_span_seconds_count{span="chat"} 1' in metrics
+
+def test_errors_and_deferred_spans():
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span("generate"):
+            raise ValueError("bad json")
+    assert tracer.spans[-1].error == "ValueError: bad json"
+    assert tracer.metrics.counters["stsoaps_span_errors_total", (("span", "generate"),)] == 1
+    with tracer.span("stream") as stream:
+        stream.deferred = True
+    assert stream not in tracer.spans
+    tracer.end(stream)
+    assert tracer.spans[-1] is stream and stream.end_ns >= stream.start_ns
+
+def test_export(tmp_path):
+    tracer = Tracer()
+    with tracer.span("appointment", path="remy.m4a"):
+        with tracer.span("chat"):
+            tracer.retry(429)
+    assert tracer.export_spans(tmp_path / "spans.jsonl") == 2
+    assert tracer.export_spans(tmp_path / "spans.jsonl") == 0
+    [line] = (tmp_path / "spans.jsonl").read_text().splitlines()
+    spans = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    chat, appointment = spans
+    assert chat["parentSpanId"] == appointment["spanId"]
+    assert {"key": "retries", "value": {"intValue": "1"}} in chat["attributes"]
+    assert {"key": "path", "value": {"stringValue": "remy.m4a"}} in appointment["attributes"]
+    tracer.export_metrics(tmp_path / "stsoaps.prom")
+    assert 'stsoaps_retries_total{reason="429"} 1' in (tmp_path / "stsoaps.prom").read_text()
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from stsoaps import clients, config
+from stsoaps.stub import StubServer
+from stsoaps.transport import LatencyTracker, hedged, retry_after
+
+REQUEST = dict(model=config.SOAP_MODEL, messages=[{"role": "user", "content": "T 101.2, P 96"}], temperature=0)
+
+def complete(retry, **stub):
+    """Time one chat completion against a `StubServer(**stub)`, with `retry` passed to the transport."""
+
+    async def run(client):
+        start = time.perf_counter()
+        try:
+            return await client.chat.completions.create(**REQUEST), time.perf_counter() - start
+        finally:
+            await client.close()
+
+    with StubServer(**stub) as server, clients.using_openai(server.url, "stub", **retry) as (_, client):
+        try:
+            return (*asyncio.run(run(client)), server.requests)
+        except openai.APIStatusError as e:
+            return e, time.perf_counter(), server.requests
+
+def test_retry_after_header():
+    assert retry_after(httpx.Response(429, headers={"retry-after-ms": "250"})) == 0.25
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+    assert retry_after(httpx.Response(503)) is None
+
+def test_retry_after_is_honored():
+    # Every request is a 429 asking for 0.3 s: two attempts take at least that long.
+    start = time.perf_counter()
+    error, _, requests = complete(dict(attempts=2, base=0.01), error_rate=1.0, error_statuses=(429,), retry_after=0.3)
+    assert isinstance(error, openai.RateLimitError)
+    assert time.perf_counter() - start >= 0.3
+    assert requests[("/v1/chat/completions", 429)] == 2
+
+def test_retries_exhausted():
+    error, _, requests = complete(dict(attempts=3, base=0.01), error_rate=1.0, error_statuses=(503,))
+    assert isinstance(error, openai.InternalServerError)
+    assert requests[("/v1/chat/completions", 503)] == 3
+
+def test_retries_recover():
+    response, _, requests = complete(dict(attempts=10, base=0.01), error_rate=0.5, error_statuses=(500, 503), seed=1)
+    assert response.choices[0].message.function_call.name == "generate_SOAP_notes"
+    assert requests[("/v1/chat/completions", 200)] == 1
+
+def warm_tracker(seconds=0.02, calls=100, **kwargs):
+    latencies = LatencyTracker(**kwargs)
+    for _ in range(calls):
+        latencies.record(seconds)
+    latencies.calls = calls
+    return latencies
+
+def test_hedge_races_slow_call_and_awaits_loser():
+    latencies = warm_tracker()
+    finished = []
+
+    async def call(delays=iter([1.0, 0.01])):
+        try:
+            await asyncio.sleep(next(delays))
+        except asyncio.CancelledError:
+            finished.append("cancelled")
+            raise
+        finished.append("done")
+        return "note"
+
+    async def run():
+        start = time.perf_counter()
+        result = await hedged(call, latencies)
+        # `asyncio.run` would cancel a leftover task itself, so check before it returns.
+        return result, time.perf_counter() - start, list(finished)
+
+    result, elapsed, finished_by_then = asyncio.run(run())
+    assert result == "note"
+    assert elapsed < 0.5
+    assert latencies.hedges == 1
+    assert finished_by_then == ["done", "cancelled"]
+    # The hedged call's latency isn't recorded.
+    assert len(latencies.samples) == 100
+
+def test_hedge_budget():
+    latencies = warm_tracker(calls=19, budget=0.05)
+
+    async def call():
+        await asyncio.sleep(0.1)
+        return "note"
+
+    async def run():
+        return [await hedged(call, latencies) for _ in range(3)]
+
+    assert asyncio.run(run()) == ["note"] * 3
+    # 22 calls at 5% allow a single hedge.
+    assert latencies.hedges == 1
+    assert latencies.calls == 22
+
+def test_hedge_against_stub():
+    latencies = warm_tracker()
+    delays = iter([1.0])
+
+    async def run(client):
+        try:
+            return await hedged(lambda: client.chat.completions.create(**REQUEST), latencies)
+        finally:
+            await client.close()
+
+    with StubServer(latency=lambda: next(delays, 0.0)) as server, clients.using_openai(server.url, "stub") as (_, client):
+        start = time.perf_counter()
+        response = asyncio.run(run(client))
+        assert time.perf_counter() - start < 0.8
+    assert response.choices[0].message.function_call.name == "generate_SOAP_notes"
+    assert latencies.hedges == 1
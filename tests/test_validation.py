@@ -0,0 +1,52 @@
+import json
+import math
+
+import pytest
+
+from stsoaps.schema import SOAP_NOTE, json_skeleton
+from stsoaps.validation import FieldError, validate_field, validate_note
+
+def test_skeleton_only_fails_bcs():
+    note, errors = validate_note(json_skeleton(SOAP_NOTE))
+    assert errors == [FieldError(("objective", "bodyConditionScore"), "0 is not one of [1, 2, 3, 4, 5, 6, 7, 8, 9]")]
+
+def test_numbers_coerced():
+    note = json_skeleton(SOAP_NOTE)
+    note["objective"].update(temperature="100.1F", bodyConditionScore="5/9", capillaryRefillTime="< 2 sec", weight=24)
+    note["assessment"] = "Gastroenteritis"
+    note["plan"] = 3
+    note, errors = validate_note(note)
+    assert errors == []
+    assert note["objective"]["temperature"] == 100.1
+    assert note["objective"]["bodyConditionScore"] == 5
+    assert note["objective"]["capillaryRefillTime"] == 2
+    assert note["assessment"] == ["Gastroenteritis"]
+    assert note["plan"] == "3"
+
+def test_missing_and_wrong_types():
+    _, errors = validate_note({"subjective": ["x"], "objective": {}, "assessment": [None, 4]})
+    messages = {error.path: error.message for error in errors}
+    assert messages[("plan",)] == "missing required field"
+    assert messages[("subjective",)] == "expected string, got list"
+    assert messages[("objective", "temperature")] == "missing required field"
+    assert ("assessment", 1) not in messages
+
+@pytest.mark.parametrize("path, value, expected, error", [
+    (("objective", "pulse"), "HR 120 bpm", 120, None),
+    (("objective", "bodyConditionScore"), 5.5, 5.5, "expected integer, got 5.5"),
+    (("objective", "bodyConditionScore"), 200, 200, "200 is not one of [1, 2, 3, 4, 5, 6, 7, 8, 9]"),
+    (("objective", "temperature"), "pant", "pant", "expected number, got 'pant'"),
+    (("objective", "temperature"), True, True, "expected number, got bool"),
+    (("assessment", 3), "R/O pancreatitis", "R/O pancreatitis", None),
+    (("objective", "temperature"), None, None, None),
+    (("owner",), "anything", "anything", None),
+])
+def test_validate_field(path, value, expected, error):
+    value, errors = validate_field(path, value)
+    assert value == expected
+    assert [e.message for e in errors] == ([error] if error else [])
+
+def test_non_finite_numbers_rejected():
+    value, errors = validate_field(("objective", "temperature"), json.loads("NaN"))
+    assert math.isnan(value)
+    assert errors[0].message == "expected a finite number, got nan"
@@ -0,0 +1,25 @@
+import pytest
+
+from stsoaps.vitals import VITALS_CORPUS, extract_vitals, function_without, merge_vitals
+
+@pytest.mark.parametrize("text, labels", VITALS_CORPUS)
+def test_corpus(text, labels):
+    assert extract_vitals(text) == pytest.approx(labels, abs=0.05)
+
+def test_out_of_range_match_does_not_cancel():
+    assert extract_vitals("T4 of 3.2, temp 102") == {"temperature": 102}
+    assert extract_vitals("recheck P 2 weeks. HR 80") == {"pulse": 80}
+
+def test_conflicting_readings_are_dropped():
+    assert extract_vitals("temp 101, recheck temp 102.5") == {}
+
+def test_pounds_converted():
+    assert extract_vitals("weighs 10 lbs") == {"weight": 4.5}
+
+def test_prefilled_fields_removed_and_merged():
+    spec = function_without({"temperature": 101.0})
+    objective = spec["parameters"]["properties"]["objective"]
+    assert "temperature" not in objective["properties"]
+    assert "temperature" not in objective["required"]
+    note = merge_vitals({"objective": {"pulse": 80, "EENT": {}}}, {"temperature": 101.0})
+    assert list(note["objective"])[:2] == ["temperature", "pulse"]
@@ -0,0 +1,43 @@
+import pytest
+
+from stsoaps.vocabulary import VocabularyCorrector, bounded_levenshtein, deletes, lexicon_corrector
+
+KNOWN = {"the", "dog", "has", "been", "given", "exam", "showed", "mild", "nodes", "were", "normal", "seen", "by", "doctor", "cough", "heart"}
+TERMS = ["maropitant", "Hobin", "cerenia", "lymph nodes", "IVDD"]
+
+@pytest.mark.parametrize("a, b, limit, expected", [
+    ("maropitant", "maropitant", 2, 0),
+    ("maropitent", "maropitant", 2, 1),
+    ("maropiten", "maropitant", 2, 2),
+    ("marapiten", "maropitant", 2, 3),
+    ("hobbin", "hobin", 1, 1),
+    ("hoben", "hobin", 1, 1),
+    ("hobn", "hobin", 1, 1),
+    ("hbbn", "hobin", 1, 2),
+    ("cat", "maropitant", 2, 3),
+])
+def test_bounded_levenshtein(a, b, limit, expected):
+    assert bounded_levenshtein(a, b, limit) == expected
+
+def test_deletes():
+    assert deletes("abc", 1) == {"abc", "bc", "ac", "ab"}
+
+def test_corrects_near_misses_only():
+    corrector = VocabularyCorrector(TERMS, known_words=KNOWN)
+    text = "The dog has been given maropitent and Serenia, seen by Doctor Hoben. Limph nodes were normal, ivdd."
+    assert corrector.correct(text) == "The dog has been given maropitant and Cerenia, seen by Doctor Hobin. Lymph nodes were normal, IVDD."
+    # Known words, short words and a lone phrase word are left alone.
+    assert corrector.correct("mild heart cough, limph") == "mild heart cough, limph"
+
+def test_exact_only_without_word_list():
+    corrector = VocabularyCorrector(TERMS)
+    assert corrector.correct("maropitent, MAROPITANT") == "maropitent, Maropitant"
+
+def test_lexicon_corrector(tmp_path):
+    (tmp_path / "clinic.txt").write_text("# clinic names\nHobin\nlymph nodes\n")
+    (tmp_path / "words").write_text("the\nexam\n")
+    corrector = lexicon_corrector(tmp_path, dictionary=tmp_path / "words")
+    assert corrector.correct("the exam by hobbin, limph nodes") == "the exam by Hobin, lymph nodes"
+    with pytest.warns(UserWarning, match="no English word list"):
+        corrector = lexicon_corrector(tmp_path, dictionary=tmp_path / "missing")
+    assert corrector.correct("hobbin") == "hobbin"